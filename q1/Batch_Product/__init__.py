@@ -0,0 +1,155 @@
+import azure.functions as func
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from azure.cosmos import exceptions
+from cosmos_client import get_container, product_cache
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "10000"))
+
+# Cosmos DB allows at most 100 operations per transactional batch
+MAX_OPS_PER_BATCH = 100
+OPS = ("create", "upsert", "delete")
+
+
+def parse_entries(req):
+    """Body is either a JSON array or NDJSON (one entry per line).
+
+    An entry is {"op": "create"|"upsert", "item": {...}}, {"op": "delete",
+    "id": "..."} or a bare product document, which is upserted.
+    """
+    raw = req.get_body().decode("utf-8")
+    content_type = req.headers.get("content-type", "")
+    if "ndjson" in content_type or not raw.lstrip().startswith("["):
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+    return json.loads(raw)
+
+
+def to_operation(index, entry):
+    """Returns (index, op, id, batch operation) or a failed result dict."""
+    if not isinstance(entry, dict):
+        return {"index": index, "statusCode": 400, "error": "Entry must be a JSON object"}
+
+    op = entry.get("op", "upsert")
+    if op not in OPS:
+        return {"index": index, "statusCode": 400, "error": f"Unsupported op '{op}'"}
+
+    if op == "delete":
+        id = entry.get("id")
+        args = (id,)
+    else:
+        item = entry.get("item") if "op" in entry else entry
+        if not isinstance(item, dict):
+            return {"index": index, "op": op, "statusCode": 400, "error": "Missing 'item'"}
+        id = item.get("id")
+        args = (item,)
+
+    if not id:
+        return {"index": index, "op": op, "statusCode": 400, "error": "Missing 'id'"}
+    return (index, op, str(id), (op, args))
+
+
+def group_by_partition(operations):
+    # Products are partitioned by their id, so the id is the partition key
+    # value and a group only has several operations when an id repeats
+    groups = {}
+    for operation in operations:
+        groups.setdefault(operation[2], []).append(operation)
+
+    for pk, ops in groups.items():
+        for start in range(0, len(ops), MAX_OPS_PER_BATCH):
+            yield pk, ops[start:start + MAX_OPS_PER_BATCH]
+
+
+def write_single(container, pk, operation):
+    """One operation as a plain point write, which costs less than a batch of one."""
+    _, op, id, (_, args) = operation
+    if op == "create":
+        container.create_item(body=args[0])
+        return {"statusCode": 201}
+    if op == "upsert":
+        container.upsert_item(body=args[0])
+        return {"statusCode": 200}
+    container.delete_item(item=id, partition_key=pk)
+    return {"statusCode": 204}
+
+
+def run_batch(container, pk, ops):
+    try:
+        if len(ops) == 1:
+            responses = [write_single(container, pk, ops[0])]
+        else:
+            responses = container.execute_item_batch(
+                batch_operations=[o[3] for o in ops],
+                partition_key=pk
+            )
+        error = None
+    except exceptions.CosmosBatchOperationError as e:
+        responses = e.operation_responses
+        error = e.message
+    except exceptions.CosmosHttpResponseError as e:
+        responses = [{"statusCode": e.status_code}] * len(ops)
+        error = e.message
+    except Exception as e:
+        # Fail only this group's entries; other groups may already be written
+        logging.exception(f"Batch for partition {pk} failed")
+        responses = [{"statusCode": 500}] * len(ops)
+        error = str(e)
+    finally:
+        # After the write, so a read racing it can't re-cache the old item
+        product_cache.invalidate(pk)
+
+    results = []
+    for (index, op, id, _), response in zip(ops, responses):
+        result = {"index": index, "id": id, "op": op, "statusCode": response.get("statusCode")}
+        if error and result["statusCode"] and result["statusCode"] >= 400:
+            result["error"] = error
+        results.append(result)
+    return results
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        entries = parse_entries(req)
+    except ValueError:
+        return func.HttpResponse("Invalid JSON or NDJSON body", status_code=400)
+
+    if not isinstance(entries, list) or not entries:
+        return func.HttpResponse("Body must contain at least one entry", status_code=400)
+    if len(entries) > BATCH_MAX_ITEMS:
+        return func.HttpResponse(f"At most {BATCH_MAX_ITEMS} entries per request", status_code=413)
+
+    results = []
+    operations = []
+    for index, entry in enumerate(entries):
+        parsed = to_operation(index, entry)
+        if isinstance(parsed, dict):
+            results.append(parsed)
+        else:
+            operations.append(parsed)
+
+    container = get_container()
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(run_batch, container, pk, ops)
+            for pk, ops in group_by_partition(operations)
+        ]
+        for future in futures:
+            results.extend(future.result())
+
+    results.sort(key=lambda r: r["index"])
+    failed = sum(1 for r in results if not r["statusCode"] or r["statusCode"] >= 400)
+    summary = {
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
+    return func.HttpResponse(
+        json.dumps(summary),
+        mimetype="application/json",
+        status_code=207 if failed else 200
+    )
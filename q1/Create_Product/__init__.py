@@ -1,6 +1,6 @@
 import azure.functions as func
 import json
-from cosmos_client import get_container
+from cosmos_client import get_container, product_cache
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
@@ -13,6 +13,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
     container = get_container()
     created = container.create_item(body)
+    product_cache.put(created)
 
     return func.HttpResponse(
         json.dumps(created),
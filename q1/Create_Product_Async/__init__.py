@@ -0,0 +1,23 @@
+import azure.functions as func
+import json
+from cosmos_client import product_cache
+from cosmos_client_aio import get_container
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        body = req.get_json()
+    except:
+        return func.HttpResponse("Invalid JSON", status_code=400)
+
+    if not body or "id" not in body:
+        return func.HttpResponse("Missing 'id' in body", status_code=400)
+
+    container = await get_container()
+    created = await container.create_item(body)
+    product_cache.put(created)
+
+    return func.HttpResponse(
+        json.dumps(created),
+        mimetype="application/json",
+        status_code=201
+    )
@@ -1,5 +1,5 @@
 import azure.functions as func
-from cosmos_client import get_container
+from cosmos_client import get_container, product_cache
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     id = req.route_params.get("ID")
@@ -12,6 +12,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         container.delete_item(item=id, partition_key=id)
     except:
+        product_cache.invalidate(id)
         return func.HttpResponse("Item not found", status_code=404)
 
+    # After the delete, so a read racing it can't re-cache the item
+    product_cache.invalidate(id)
+
     return func.HttpResponse("Deleted Successfully", status_code=200)
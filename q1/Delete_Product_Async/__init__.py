@@ -0,0 +1,22 @@
+import azure.functions as func
+from cosmos_client import product_cache
+from cosmos_client_aio import get_container
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    id = req.route_params.get("id")
+
+    if not id:
+        return func.HttpResponse("ID missing", status_code=400)
+
+    container = await get_container()
+
+    try:
+        await container.delete_item(item=id, partition_key=id)
+    except:
+        product_cache.invalidate(id)
+        return func.HttpResponse("Item not found", status_code=404)
+
+    # After the delete, so a read racing it can't re-cache the item
+    product_cache.invalidate(id)
+
+    return func.HttpResponse("Deleted Successfully", status_code=200)
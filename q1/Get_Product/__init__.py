@@ -1,11 +1,15 @@
 import azure.functions as func
 import json
-from cosmos_client import get_container
+from cosmos_client import read_item
 
 def main(req: func.HttpRequest, ID: str) -> func.HttpResponse:
-    container = get_container()
-    try:
-        item = container.read_item(item=ID, partition_key=ID)
-        return func.HttpResponse(json.dumps(item), mimetype="application/json", status_code=200)
-    except Exception as e:
+    item = read_item(ID)
+    if item is None:
         return func.HttpResponse("Product not found", status_code=404)
+
+    etag = item.get("_etag")
+    headers = {"ETag": etag} if etag else {}
+    if etag and req.headers.get("If-None-Match") == etag:
+        return func.HttpResponse(status_code=304, headers=headers)
+
+    return func.HttpResponse(json.dumps(item), mimetype="application/json", headers=headers, status_code=200)
@@ -1,15 +1,68 @@
 import azure.functions as func
 import json
+import re
+from azure.cosmos import exceptions
 from cosmos_client import get_container
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def build_query(fields):
+    if not fields:
+        return "SELECT * FROM c"
+    return "SELECT " + ", ".join(f"c.{f}" for f in fields) + " FROM c"
+
+
+def serialize_items(items):
+    # The page as a JSON array, encoded one document at a time
+    yield "["
+    for i, item in enumerate(items):
+        if i:
+            yield ","
+        yield json.dumps(item)
+    yield "]"
+
+
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        page_size = int(req.params.get("maxItemCount", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return func.HttpResponse("maxItemCount must be an integer", status_code=400)
+    if page_size < 1:
+        return func.HttpResponse("maxItemCount must be positive", status_code=400)
+    page_size = min(page_size, MAX_PAGE_SIZE)
+
+    fields = [f.strip() for f in req.params.get("fields", "").split(",") if f.strip()]
+    if any(not FIELD_NAME.match(f) for f in fields):
+        return func.HttpResponse("Invalid field name in 'fields'", status_code=400)
+
+    continuation = req.params.get("continuation") or req.headers.get("x-ms-continuation")
+
     container = get_container()
-    items = list(container.query_items(
-        query="SELECT * FROM c",
-        enable_cross_partition_query=True
-    ))
+    pager = container.query_items(
+        query=build_query(fields),
+        enable_cross_partition_query=True,
+        max_item_count=page_size
+    ).by_page(continuation)
+
+    try:
+        page = next(pager)
+    except StopIteration:
+        page = []
+    except exceptions.CosmosHttpResponseError as e:
+        if e.status_code == 400 and continuation:
+            return func.HttpResponse("Invalid continuation token", status_code=400)
+        raise
+    body = "".join(serialize_items(page))
+
+    headers = {}
+    if pager.continuation_token:
+        headers["x-ms-continuation"] = pager.continuation_token
 
     return func.HttpResponse(
-        json.dumps(items),
-        mimetype="application/json"
-    )
\ No newline at end of file
+        body,
+        mimetype="application/json",
+        headers=headers
+    )
@@ -0,0 +1,45 @@
+import azure.functions as func
+from azure.cosmos import exceptions
+from cosmos_client_aio import get_container
+from List_Product import DEFAULT_PAGE_SIZE, FIELD_NAME, MAX_PAGE_SIZE, build_query, serialize_items
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        page_size = int(req.params.get("maxItemCount", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return func.HttpResponse("maxItemCount must be an integer", status_code=400)
+    if page_size < 1:
+        return func.HttpResponse("maxItemCount must be positive", status_code=400)
+    page_size = min(page_size, MAX_PAGE_SIZE)
+
+    fields = [f.strip() for f in req.params.get("fields", "").split(",") if f.strip()]
+    if any(not FIELD_NAME.match(f) for f in fields):
+        return func.HttpResponse("Invalid field name in 'fields'", status_code=400)
+
+    continuation = req.params.get("continuation") or req.headers.get("x-ms-continuation")
+
+    container = await get_container()
+    pager = container.query_items(
+        query=build_query(fields),
+        max_item_count=page_size
+    ).by_page(continuation)
+
+    try:
+        page = [item async for item in await pager.__anext__()]
+    except StopAsyncIteration:
+        page = []
+    except exceptions.CosmosHttpResponseError as e:
+        if e.status_code == 400 and continuation:
+            return func.HttpResponse("Invalid continuation token", status_code=400)
+        raise
+    body = "".join(serialize_items(page))
+
+    headers = {}
+    if pager.continuation_token:
+        headers["x-ms-continuation"] = pager.continuation_token
+
+    return func.HttpResponse(
+        body,
+        mimetype="application/json",
+        headers=headers
+    )
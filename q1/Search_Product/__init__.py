@@ -0,0 +1,139 @@
+import azure.functions as func
+import logging
+import math
+from azure.cosmos import exceptions
+from cosmos_client import get_container
+from List_Product import DEFAULT_PAGE_SIZE, FIELD_NAME, MAX_PAGE_SIZE, build_query, serialize_items
+
+# Each is backed by a composite index (field, id) in PRODUCT_INDEXING_POLICY
+ORDER_FIELDS = ("name", "price")
+
+
+def parse_search(params):
+    """Returns the search options, or an error message string."""
+    try:
+        page_size = int(params.get("maxItemCount", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return "maxItemCount must be an integer"
+    if page_size < 1:
+        return "maxItemCount must be positive"
+
+    fields = [f.strip() for f in params.get("fields", "").split(",") if f.strip()]
+    if any(not FIELD_NAME.match(f) for f in fields):
+        return "Invalid field name in 'fields'"
+
+    prices = {}
+    for name in ("minPrice", "maxPrice"):
+        if params.get(name):
+            try:
+                prices[name] = float(params[name])
+            except ValueError:
+                return f"{name} must be a number"
+            if not math.isfinite(prices[name]):
+                return f"{name} must be a number"
+    if "minPrice" in prices and "maxPrice" in prices and prices["minPrice"] > prices["maxPrice"]:
+        return "minPrice must not be greater than maxPrice"
+
+    order_by = params.get("orderBy")
+    if order_by and order_by not in ORDER_FIELDS:
+        return f"orderBy must be one of {', '.join(ORDER_FIELDS)}"
+    order = params.get("order", "asc").lower()
+    if order not in ("asc", "desc"):
+        return "order must be asc or desc"
+
+    return {
+        "page_size": min(page_size, MAX_PAGE_SIZE),
+        "fields": fields,
+        "name_prefix": params.get("namePrefix") or None,
+        "min_price": prices.get("minPrice"),
+        "max_price": prices.get("maxPrice"),
+        "order_by": order_by,
+        "order": order.upper()
+    }
+
+
+def build_search_query(options):
+    """Parameterized query for the options; the values never end up in the SQL text."""
+    conditions = []
+    parameters = []
+    if options["name_prefix"] is not None:
+        # Case-sensitive STARTSWITH is answered from the range index
+        conditions.append("STARTSWITH(c.name, @namePrefix)")
+        parameters.append({"name": "@namePrefix", "value": options["name_prefix"]})
+    if options["min_price"] is not None:
+        conditions.append("c.price >= @minPrice")
+        parameters.append({"name": "@minPrice", "value": options["min_price"]})
+    if options["max_price"] is not None:
+        conditions.append("c.price <= @maxPrice")
+        parameters.append({"name": "@maxPrice", "value": options["max_price"]})
+
+    query = build_query(options["fields"])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if options["order_by"]:
+        # id breaks ties so pages are stable across continuations
+        order = options["order"]
+        query += f" ORDER BY c.{options['order_by']} {order}, c.id {order}"
+    return query, parameters
+
+
+class RequestCharge:
+    """response_hook summing the RUs of every backend request of a query."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.index_metrics = None
+
+    def __call__(self, headers, _):
+        self.total += float(headers.get("x-ms-request-charge", 0) or 0)
+        self.index_metrics = headers.get("x-ms-cosmos-index-utilization", self.index_metrics)
+
+    def headers(self):
+        headers = {"x-ms-request-charge": f"{self.total:.2f}"}
+        if self.index_metrics:
+            headers["x-ms-cosmos-index-utilization"] = self.index_metrics
+        return headers
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    options = parse_search(req.params)
+    if isinstance(options, str):
+        return func.HttpResponse(options, status_code=400)
+    query, parameters = build_search_query(options)
+
+    continuation = req.params.get("continuation") or req.headers.get("x-ms-continuation")
+    # ?indexMetrics=true returns which indexes the query used, for tuning
+    index_metrics = req.params.get("indexMetrics", "").lower() == "true"
+
+    charge = RequestCharge()
+    container = get_container()
+    pager = container.query_items(
+        query=query,
+        parameters=parameters,
+        enable_cross_partition_query=True,
+        max_item_count=options["page_size"],
+        populate_index_metrics=index_metrics,
+        response_hook=charge
+    ).by_page(continuation)
+
+    try:
+        page = list(next(pager))
+    except StopIteration:
+        page = []
+    except exceptions.CosmosHttpResponseError as e:
+        if e.status_code == 400 and continuation:
+            return func.HttpResponse("Invalid continuation token", status_code=400)
+        raise
+    body = "".join(serialize_items(page))
+
+    logging.info(f"Product search returned {len(page)} items for {charge.total:.2f} RU: {query}")
+
+    headers = charge.headers()
+    if pager.continuation_token:
+        headers["x-ms-continuation"] = pager.continuation_token
+
+    return func.HttpResponse(
+        body,
+        mimetype="application/json",
+        headers=headers
+    )
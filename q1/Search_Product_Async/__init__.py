@@ -0,0 +1,47 @@
+import azure.functions as func
+import logging
+from azure.cosmos import exceptions
+from cosmos_client_aio import get_container
+from List_Product import serialize_items
+from Search_Product import RequestCharge, build_search_query, parse_search
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    options = parse_search(req.params)
+    if isinstance(options, str):
+        return func.HttpResponse(options, status_code=400)
+    query, parameters = build_search_query(options)
+
+    continuation = req.params.get("continuation") or req.headers.get("x-ms-continuation")
+    index_metrics = req.params.get("indexMetrics", "").lower() == "true"
+
+    charge = RequestCharge()
+    container = await get_container()
+    pager = container.query_items(
+        query=query,
+        parameters=parameters,
+        max_item_count=options["page_size"],
+        populate_index_metrics=index_metrics,
+        response_hook=charge
+    ).by_page(continuation)
+
+    try:
+        page = [item async for item in await pager.__anext__()]
+    except StopAsyncIteration:
+        page = []
+    except exceptions.CosmosHttpResponseError as e:
+        if e.status_code == 400 and continuation:
+            return func.HttpResponse("Invalid continuation token", status_code=400)
+        raise
+    body = "".join(serialize_items(page))
+
+    logging.info(f"Product search returned {len(page)} items for {charge.total:.2f} RU: {query}")
+
+    headers = charge.headers()
+    if pager.continuation_token:
+        headers["x-ms-continuation"] = pager.continuation_token
+
+    return func.HttpResponse(
+        body,
+        mimetype="application/json",
+        headers=headers
+    )
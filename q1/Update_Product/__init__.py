@@ -1,6 +1,41 @@
 import azure.functions as func
 import json
-from cosmos_client import get_container
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+from cosmos_client import get_container, product_cache
+
+# Cosmos DB accepts at most 10 operations in one patch request
+MAX_PATCH_OPERATIONS = 10
+
+
+def build_patch_operations(body):
+    # id and system properties (_etag, _ts, ...) are never client-writable
+    ops = []
+    for key, value in body.items():
+        if key == "id" or key.startswith("_"):
+            continue
+        path = "/" + key.replace("~", "~0").replace("/", "~1")
+        ops.append({"op": "set", "path": path, "value": value})
+    return ops
+
+
+def conditional_replace(container, id, body, etag):
+    item = container.read_item(item=id, partition_key=id)
+    if etag and etag != item["_etag"]:
+        raise exceptions.CosmosAccessConditionFailedError(message="ETag mismatch")
+
+    for key, value in body.items():
+        if key == "id" or key.startswith("_"):
+            continue
+        item[key] = value
+
+    return container.replace_item(
+        item=id,
+        body=item,
+        etag=item["_etag"],
+        match_condition=MatchConditions.IfNotModified
+    )
+
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     id = req.route_params.get("id")
@@ -13,20 +48,44 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     except:
         return func.HttpResponse("Invalid JSON", status_code=400)
 
+    if not isinstance(body, dict):
+        return func.HttpResponse("Body must be a JSON object", status_code=400)
+
+    etag = req.headers.get("If-Match")
+    if etag == "*":
+        etag = None
+
     container = get_container()
+    ops = build_patch_operations(body)
 
     try:
-        item = container.read_item(item=id, partition_key=id)
-    except:
+        if not ops:
+            updated = container.read_item(item=id, partition_key=id)
+            if etag and etag != updated["_etag"]:
+                raise exceptions.CosmosAccessConditionFailedError(message="ETag mismatch")
+        elif len(ops) <= MAX_PATCH_OPERATIONS:
+            # Single round trip, only the changed fields travel to the server
+            updated = container.patch_item(
+                item=id,
+                partition_key=id,
+                patch_operations=ops,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified if etag else None
+            )
+        else:
+            updated = conditional_replace(container, id, body, etag)
+    except exceptions.CosmosResourceNotFoundError:
+        product_cache.invalidate(id)
         return func.HttpResponse("Item not found", status_code=404)
+    except exceptions.CosmosAccessConditionFailedError:
+        product_cache.invalidate(id)
+        return func.HttpResponse("Item was modified by another request", status_code=412)
 
-    for key, value in body.items():
-        item[key] = value
-
-    updated = container.replace_item(item=id, body=item)
+    product_cache.put(updated)
 
     return func.HttpResponse(
         json.dumps(updated),
         mimetype="application/json",
+        headers={"ETag": updated["_etag"]},
         status_code=200
     )
@@ -0,0 +1,78 @@
+import azure.functions as func
+import json
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+from cosmos_client import product_cache
+from cosmos_client_aio import get_container
+from Update_Product import MAX_PATCH_OPERATIONS, build_patch_operations
+
+
+async def conditional_replace(container, id, body, etag):
+    item = await container.read_item(item=id, partition_key=id)
+    if etag and etag != item["_etag"]:
+        raise exceptions.CosmosAccessConditionFailedError(message="ETag mismatch")
+
+    for key, value in body.items():
+        if key == "id" or key.startswith("_"):
+            continue
+        item[key] = value
+
+    return await container.replace_item(
+        item=id,
+        body=item,
+        etag=item["_etag"],
+        match_condition=MatchConditions.IfNotModified
+    )
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    id = req.route_params.get("id")
+
+    if not id:
+        return func.HttpResponse("ID missing", status_code=400)
+
+    try:
+        body = req.get_json()
+    except:
+        return func.HttpResponse("Invalid JSON", status_code=400)
+
+    if not isinstance(body, dict):
+        return func.HttpResponse("Body must be a JSON object", status_code=400)
+
+    etag = req.headers.get("If-Match")
+    if etag == "*":
+        etag = None
+
+    container = await get_container()
+    ops = build_patch_operations(body)
+
+    try:
+        if not ops:
+            updated = await container.read_item(item=id, partition_key=id)
+            if etag and etag != updated["_etag"]:
+                raise exceptions.CosmosAccessConditionFailedError(message="ETag mismatch")
+        elif len(ops) <= MAX_PATCH_OPERATIONS:
+            updated = await container.patch_item(
+                item=id,
+                partition_key=id,
+                patch_operations=ops,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified if etag else None
+            )
+        else:
+            updated = await conditional_replace(container, id, body, etag)
+    except exceptions.CosmosResourceNotFoundError:
+        product_cache.invalidate(id)
+        return func.HttpResponse("Item not found", status_code=404)
+    except exceptions.CosmosAccessConditionFailedError:
+        product_cache.invalidate(id)
+        return func.HttpResponse("Item was modified by another request", status_code=412)
+
+    product_cache.put(updated)
+
+    return func.HttpResponse(
+        json.dumps(updated),
+        mimetype="application/json",
+        headers={"ETag": updated["_etag"]},
+        status_code=200
+    )
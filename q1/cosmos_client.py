@@ -1,27 +1,249 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from azure.core import MatchConditions
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
 
 COSMOS_CONNECTION = os.environ.get("COSMOS_CONN_STRING")
 COSMOS_DB = os.environ.get("COSMOS_DB", "ProductsDB")
 COSMOS_CONTAINER = os.environ.get("COSMOS_CONTAINER", "Products")
+COSMOS_THROUGHPUT = int(os.environ.get("COSMOS_THROUGHPUT", "400"))
+
+# Set to "false" when the database/container are provisioned out of band
+# (IaC, portal) so the worker never issues control-plane calls.
+COSMOS_PROVISION = os.environ.get("COSMOS_PROVISION", "true").lower() == "true"
+
+# Replace the indexing policy of an existing container when it differs from
+# PRODUCT_INDEXING_POLICY. Off by default: the change starts a background
+# reindex of the whole container.
+COSMOS_UPDATE_INDEXING_POLICY = os.environ.get("COSMOS_UPDATE_INDEXING_POLICY", "false").lower() == "true"
+
+# Large, never-filtered fields kept out of the index to cut write RUs
+PRODUCT_INDEX_EXCLUDED_PATHS = [
+    p.strip() for p in
+    os.environ.get("PRODUCT_INDEX_EXCLUDED_PATHS", "/description/*,/images/*,/reviews/*").split(",")
+    if p.strip()
+]
+
+# Composite indexes back the search endpoint's ORDER BY <field>, id (and
+# its exact reverse); without them a two-property ORDER BY fails.
+PRODUCT_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "automatic": True,
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": '/"_etag"/?'}] + [{"path": p} for p in PRODUCT_INDEX_EXCLUDED_PATHS],
+    "compositeIndexes": [
+        [{"path": "/name", "order": "ascending"}, {"path": "/id", "order": "ascending"}],
+        [{"path": "/price", "order": "ascending"}, {"path": "/id", "order": "ascending"}]
+    ]
+}
+
+# Read-through product cache, per worker process. Size 0 disables it.
+PRODUCT_CACHE_SIZE = int(os.environ.get("PRODUCT_CACHE_SIZE", "1024"))
+PRODUCT_CACHE_TTL = float(os.environ.get("PRODUCT_CACHE_TTL", "30"))
 
 if not COSMOS_CONNECTION:
     raise Exception("COSMOS_CONNECTION env variable missing")
 
-client = CosmosClient.from_connection_string(COSMOS_CONNECTION)
+# Client and proxies are created once per worker process and reused across
+# invocations (warm starts). Proxies are local objects: getting them costs
+# no round trip, only provision() talks to the control plane.
+_lock = threading.RLock()
+_client = None
+_container = None
+_provisioned = False
+_metadata_calls = 0
 
-def get_container():
-    db = client.create_database_if_not_exists(id=COSMOS_DB)
-    container = db.create_container_if_not_exists(
-        id=COSMOS_CONTAINER,
+
+def _count_metadata_call():
+    global _metadata_calls
+    with _lock:
+        _metadata_calls += 1
+
+
+def metadata_call_count():
+    """Number of database/container metadata calls made by this process.
+
+    Sample it before and after a request to get the per-request count;
+    on a warm worker it should not move.
+    """
+    return _metadata_calls
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = CosmosClient.from_connection_string(COSMOS_CONNECTION)
+    return _client
+
+
+def provision():
+    """Create the database and container if missing. Runs once per process."""
+    global _provisioned
+    if _provisioned:
+        return
+    with _lock:
+        if _provisioned:
+            return
+        db = get_client().create_database_if_not_exists(id=COSMOS_DB)
+        _count_metadata_call()
+        db.create_container_if_not_exists(
+            id=COSMOS_CONTAINER,
+            partition_key=PartitionKey(path="/ID"),
+            indexing_policy=PRODUCT_INDEXING_POLICY,
+            offer_throughput=COSMOS_THROUGHPUT
+        )
+        _count_metadata_call()
+        if COSMOS_UPDATE_INDEXING_POLICY:
+            ensure_indexing_policy()
+        _provisioned = True
+
+
+def indexing_policy_matches(policy):
+    """True if policy has every composite index and excluded path of PRODUCT_INDEXING_POLICY."""
+    def composites(p):
+        return {
+            tuple((c["path"], c.get("order", "ascending").lower()) for c in index)
+            for index in p.get("compositeIndexes", [])
+        }
+
+    def excluded(p):
+        return {e["path"] for e in p.get("excludedPaths", [])}
+
+    return (composites(PRODUCT_INDEXING_POLICY) <= composites(policy)
+            and excluded(PRODUCT_INDEXING_POLICY) <= excluded(policy))
+
+
+def ensure_indexing_policy():
+    """Replace the container's indexing policy if it lacks ours. Returns True if it was replaced."""
+    db = get_client().get_database_client(COSMOS_DB)
+    properties = db.get_container_client(COSMOS_CONTAINER).read()
+    _count_metadata_call()
+    if indexing_policy_matches(properties.get("indexingPolicy", {})):
+        return False
+    db.replace_container(
+        COSMOS_CONTAINER,
         partition_key=PartitionKey(path="/ID"),
-        offer_throughput=400
+        indexing_policy=PRODUCT_INDEXING_POLICY
     )
-    return container
+    _count_metadata_call()
+    return True
+
+
+def get_container():
+    global _container
+    if _container is None:
+        with _lock:
+            if _container is None:
+                if COSMOS_PROVISION:
+                    provision()
+                db = get_client().get_database_client(COSMOS_DB)
+                _container = db.get_container_client(COSMOS_CONTAINER)
+    return _container
+
+
+class ProductCache:
+    """Bounded LRU of product documents with a per-entry TTL.
+
+    Entries past their TTL are kept so they can be revalidated with their
+    ETag instead of being fetched again in full. Writes made by this worker
+    update or invalidate entries; writes made by other workers become
+    visible once the TTL has passed.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    def get(self, id):
+        """Returns (item, fresh). item is None on a miss."""
+        with self._lock:
+            entry = self._items.get(id)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._items.move_to_end(id)
+            expires_at, item = entry
+            if expires_at < time.monotonic():
+                self.misses += 1
+                return item, False
+            self.hits += 1
+            return item, True
+
+    def put(self, item, revalidated=False):
+        if self.max_size <= 0 or not item or "id" not in item:
+            return
+        with self._lock:
+            if revalidated:
+                self.revalidations += 1
+            self._items[item["id"]] = (time.monotonic() + self.ttl, item)
+            self._items.move_to_end(item["id"])
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, id):
+        with self._lock:
+            self._items.pop(id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "maxSize": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations
+            }
+
+
+product_cache = ProductCache(PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+
 
 def read_item(ID):
+    """Read-through product lookup. Returns None if the product does not exist."""
+    cached, fresh = product_cache.get(ID)
+    if fresh:
+        return cached
+
     container = get_container()
     try:
-        return container.read_item(item=ID, partition_key=ID)
+        if cached is not None:
+            # Conditional read: Cosmos answers 304 with an empty body when
+            # the document still has this ETag.
+            item = container.read_item(
+                item=ID,
+                partition_key=ID,
+                etag=cached["_etag"],
+                match_condition=MatchConditions.IfModified
+            )
+            if not item:
+                product_cache.put(cached, revalidated=True)
+                return cached
+        else:
+            item = container.read_item(item=ID, partition_key=ID)
     except exceptions.CosmosResourceNotFoundError:
-        return None
\ No newline at end of file
+        product_cache.invalidate(ID)
+        return None
+
+    product_cache.put(item)
+    return item
+
+
+if __name__ == "__main__":
+    # Explicit provisioning step for deployments that run with
+    # COSMOS_PROVISION=false: python cosmos_client.py
+    provision()
+    print(f"Provisioned {COSMOS_DB}/{COSMOS_CONTAINER}")
+    if ensure_indexing_policy():
+        print("Indexing policy replaced; the container is reindexed in the background")
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import aiohttp
+from azure.core import MatchConditions
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.cosmos import PartitionKey, exceptions
+from azure.cosmos.aio import CosmosClient
+from cosmos_client import (
+    COSMOS_CONNECTION,
+    COSMOS_CONTAINER,
+    COSMOS_DB,
+    COSMOS_PROVISION,
+    COSMOS_THROUGHPUT,
+    PRODUCT_INDEXING_POLICY,
+    _count_metadata_call,
+    product_cache
+)
+
+# Connection pool limits for the shared aiohttp session
+COSMOS_POOL_LIMIT = int(os.environ.get("COSMOS_POOL_LIMIT", "100"))
+COSMOS_POOL_LIMIT_PER_HOST = int(os.environ.get("COSMOS_POOL_LIMIT_PER_HOST", "0"))
+
+# One async client per process, created on first use inside the worker's
+# event loop (aiohttp sessions are bound to the loop they are created in).
+_lock = asyncio.Lock()
+_client = None
+_container = None
+
+
+async def get_client():
+    global _client
+    if _client is None:
+        async with _lock:
+            if _client is None:
+                connector = aiohttp.TCPConnector(
+                    limit=COSMOS_POOL_LIMIT,
+                    limit_per_host=COSMOS_POOL_LIMIT_PER_HOST,
+                    ttl_dns_cache=300
+                )
+                session = aiohttp.ClientSession(connector=connector)
+                _client = CosmosClient.from_connection_string(
+                    COSMOS_CONNECTION,
+                    transport=AioHttpTransport(session=session, session_owner=False)
+                )
+    return _client
+
+
+async def get_container():
+    global _container
+    if _container is None:
+        client = await get_client()
+        async with _lock:
+            if _container is None:
+                if COSMOS_PROVISION:
+                    db = await client.create_database_if_not_exists(id=COSMOS_DB)
+                    _count_metadata_call()
+                    await db.create_container_if_not_exists(
+                        id=COSMOS_CONTAINER,
+                        partition_key=PartitionKey(path="/ID"),
+                        indexing_policy=PRODUCT_INDEXING_POLICY,
+                        offer_throughput=COSMOS_THROUGHPUT
+                    )
+                    _count_metadata_call()
+                db = client.get_database_client(COSMOS_DB)
+                _container = db.get_container_client(COSMOS_CONTAINER)
+    return _container
+
+
+async def read_item(ID):
+    """Async read_item, sharing the process-wide product cache."""
+    cached, fresh = product_cache.get(ID)
+    if fresh:
+        return cached
+
+    container = await get_container()
+    try:
+        if cached is not None:
+            item = await container.read_item(
+                item=ID,
+                partition_key=ID,
+                etag=cached["_etag"],
+                match_condition=MatchConditions.IfModified
+            )
+            if not item:
+                product_cache.put(cached, revalidated=True)
+                return cached
+        else:
+            item = await container.read_item(item=ID, partition_key=ID)
+    except exceptions.CosmosResourceNotFoundError:
+        product_cache.invalidate(ID)
+        return None
+
+    product_cache.put(item)
+    return item
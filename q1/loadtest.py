@@ -0,0 +1,94 @@
+"""Local load test for the sync and async Get_Product handlers.
+
+Both handlers run against a stubbed Cosmos container that only sleeps for
+the configured latency, so the numbers show how many requests one worker
+can keep in flight rather than how fast Cosmos is.
+
+    python loadtest.py --requests 2000 --latency-ms 20 --threads 8 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("COSMOS_CONN_STRING", "AccountEndpoint=https://localhost:8081/;AccountKey=c3R1Yg==;")
+os.environ["COSMOS_PROVISION"] = "false"
+# Measure the I/O path, not the cache
+os.environ["PRODUCT_CACHE_SIZE"] = "0"
+
+import azure.functions as func
+import cosmos_client
+import cosmos_client_aio
+import Get_Product
+import Get_Product_Async
+
+
+class StubContainer:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def read_item(self, item, partition_key, **kwargs):
+        time.sleep(self.latency)
+        return {"id": item, "name": f"product {item}", "price": 1.0, "_etag": "stub"}
+
+
+class AsyncStubContainer:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def read_item(self, item, partition_key, **kwargs):
+        await asyncio.sleep(self.latency)
+        return {"id": item, "name": f"product {item}", "price": 1.0, "_etag": "stub"}
+
+
+def make_request(i):
+    return func.HttpRequest(method="GET", url=f"/api/products/{i}", body=b"", route_params={"ID": str(i)})
+
+
+def run_sync(requests, threads):
+    def call(i):
+        return Get_Product.main(make_request(i), str(i)).status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(call, range(requests)))
+
+
+async def run_async(requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i):
+        async with semaphore:
+            response = await Get_Product_Async.main(make_request(i), str(i))
+            return response.status_code
+
+    return await asyncio.gather(*(call(i) for i in range(requests)))
+
+
+def report(name, started, statuses):
+    elapsed = time.perf_counter() - started
+    ok = sum(1 for s in statuses if s == 200)
+    print(f"{name:<6} {len(statuses):>7} requests  {elapsed:7.2f}s  {len(statuses) / elapsed:9.1f} req/s  ({ok} ok)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--threads", type=int, default=8, help="sync worker threads (PYTHON_THREADPOOL_THREAD_COUNT)")
+    parser.add_argument("--concurrency", type=int, default=100, help="async requests in flight (COSMOS_POOL_LIMIT)")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    cosmos_client._container = StubContainer(latency)
+    cosmos_client_aio._container = AsyncStubContainer(latency)
+
+    started = time.perf_counter()
+    report("sync", started, run_sync(args.requests, args.threads))
+
+    started = time.perf_counter()
+    report("async", started, asyncio.run(run_async(args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The function folders import the shared modules by their bare names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# cosmos_client requires it at import; the tests never connect
+os.environ.setdefault("COSMOS_CONN_STRING", "AccountEndpoint=https://localhost:8081/;AccountKey=dGVzdA==;")
@@ -0,0 +1,77 @@
+from azure.cosmos import exceptions
+from Batch_Product import group_by_partition, run_batch, to_operation
+
+
+class FakeContainer:
+    def __init__(self, fail_ids=(), crash_ids=()):
+        self.calls = []
+        self.fail_ids = set(fail_ids)
+        self.crash_ids = set(crash_ids)
+
+    def _check(self, id):
+        if id in self.crash_ids:
+            raise ValueError("connection reset")
+        if id in self.fail_ids:
+            raise exceptions.CosmosHttpResponseError(status_code=409, message="Conflict")
+
+    def create_item(self, body):
+        self.calls.append(("create_item", body["id"]))
+        self._check(body["id"])
+
+    def upsert_item(self, body):
+        self.calls.append(("upsert_item", body["id"]))
+        self._check(body["id"])
+
+    def delete_item(self, item, partition_key):
+        self.calls.append(("delete_item", item))
+        self._check(item)
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        self.calls.append(("execute_item_batch", partition_key, len(batch_operations)))
+        self._check(partition_key)
+        return [{"statusCode": 200} for _ in batch_operations]
+
+
+def operations(entries):
+    return [to_operation(index, entry) for index, entry in enumerate(entries)]
+
+
+def test_to_operation_rejects_bad_entries():
+    assert to_operation(0, "x")["statusCode"] == 400
+    assert to_operation(1, {"op": "merge", "item": {"id": "1"}})["error"] == "Unsupported op 'merge'"
+    assert to_operation(2, {"op": "delete"})["error"] == "Missing 'id'"
+    assert to_operation(3, {"id": 7, "name": "bare"}) == (3, "upsert", "7", ("upsert", ({"id": 7, "name": "bare"},)))
+
+
+def test_single_operation_groups_are_point_writes():
+    container = FakeContainer()
+    ops = operations([{"op": "create", "item": {"id": "a"}}, {"id": "b"}, {"op": "delete", "id": "c"}])
+    results = [r for pk, group in group_by_partition(ops) for r in run_batch(container, pk, group)]
+
+    assert container.calls == [("create_item", "a"), ("upsert_item", "b"), ("delete_item", "c")]
+    assert [r["statusCode"] for r in results] == [201, 200, 204]
+
+
+def test_repeated_ids_go_out_as_one_batch():
+    container = FakeContainer()
+    ops = operations([{"op": "create", "item": {"id": "a"}}, {"op": "delete", "id": "a"}])
+    groups = list(group_by_partition(ops))
+    assert len(groups) == 1
+
+    results = run_batch(container, *groups[0])
+    assert container.calls == [("execute_item_batch", "a", 2)]
+    assert [r["index"] for r in results] == [0, 1]
+
+
+def test_cosmos_errors_fail_only_their_entries():
+    container = FakeContainer(fail_ids={"a"})
+    result, = run_batch(container, "a", operations([{"op": "create", "item": {"id": "a"}}]))
+    assert result["statusCode"] == 409
+    assert "Conflict" in result["error"]
+
+
+def test_other_errors_fail_the_group_instead_of_the_request():
+    container = FakeContainer(crash_ids={"a"})
+    results = run_batch(container, "a", operations([{"id": "a"}, {"op": "delete", "id": "a"}]))
+    assert [r["statusCode"] for r in results] == [500, 500]
+    assert results[0]["error"] == "connection reset"
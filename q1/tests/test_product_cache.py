@@ -0,0 +1,153 @@
+import types
+import azure.functions as func
+import pytest
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+import cosmos_client
+import Delete_Product
+import Get_Product
+from cosmos_client import ProductCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeContainer:
+    def __init__(self, *items):
+        self.items = {item["id"]: dict(item) for item in items}
+        self.calls = []
+
+    def read_item(self, item, partition_key, etag=None, match_condition=None):
+        self.calls.append(("read_item", item, etag, match_condition))
+        if item not in self.items:
+            raise exceptions.CosmosResourceNotFoundError(message="NotFound")
+        if match_condition == MatchConditions.IfModified and self.items[item]["_etag"] == etag:
+            # 304 Not Modified: no body
+            return {}
+        return dict(self.items[item])
+
+    def delete_item(self, item, partition_key):
+        self.calls.append(("delete_item", item))
+        if self.items.pop(item, None) is None:
+            raise exceptions.CosmosResourceNotFoundError(message="NotFound")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cosmos_client, "time", types.SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def cache(monkeypatch, clock):
+    cache = ProductCache(max_size=2, ttl=30)
+    for module in (cosmos_client, Delete_Product):
+        monkeypatch.setattr(module, "product_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def container(monkeypatch, cache):
+    container = FakeContainer({"id": "1", "name": "Widget", "_etag": '"e1"'})
+    for module in (cosmos_client, Delete_Product):
+        monkeypatch.setattr(module, "get_container", lambda: container)
+    return container
+
+
+def product(id, etag='"e1"'):
+    return {"id": id, "_etag": etag}
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity(cache):
+    cache.put(product("a"))
+    cache.put(product("b"))
+    cache.get("a")
+    cache.put(product("c"))
+
+    assert cache.get("b") == (None, False)
+    assert cache.get("a")[1] and cache.get("c")[1]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_cache_size_zero_disables_it(clock):
+    cache = ProductCache(max_size=0, ttl=30)
+    cache.put(product("a"))
+    assert cache.get("a") == (None, False)
+
+
+def test_fresh_entry_is_served_without_a_read(container, cache):
+    assert cosmos_client.read_item("1")["name"] == "Widget"
+    assert cosmos_client.read_item("1")["name"] == "Widget"
+    assert len(container.calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entry_is_revalidated_with_its_etag(container, cache, clock):
+    first = cosmos_client.read_item("1")
+    clock.now += 31
+
+    assert cosmos_client.read_item("1") is first
+    assert container.calls[-1] == ("read_item", "1", '"e1"', MatchConditions.IfModified)
+    assert cache.stats()["revalidations"] == 1
+
+    # The 304 made it fresh again
+    cosmos_client.read_item("1")
+    assert len(container.calls) == 2
+
+
+def test_changed_etag_replaces_the_entry(container, cache, clock):
+    cosmos_client.read_item("1")
+    container.items["1"].update(name="Gadget", _etag='"e2"')
+    clock.now += 31
+
+    assert cosmos_client.read_item("1")["name"] == "Gadget"
+    item, fresh = cache.get("1")
+    assert fresh and item["_etag"] == '"e2"'
+
+
+def test_deleted_product_is_dropped_from_the_cache(container, cache, clock):
+    cosmos_client.read_item("1")
+    del container.items["1"]
+    clock.now += 31
+    assert cosmos_client.read_item("1") is None
+    assert cache.stats()["size"] == 0
+
+
+def get(id, headers=None):
+    return Get_Product.main(func.HttpRequest("GET", f"/api/products/{id}", headers=headers or {}, body=b""), id)
+
+
+def test_get_product_answers_if_none_match_with_304(container):
+    response = get("1")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"e1"'
+
+    response = get("1", {"If-None-Match": '"e1"'})
+    assert response.status_code == 304
+    assert response.get_body() == b""
+    assert response.headers["ETag"] == '"e1"'
+
+    assert get("1", {"If-None-Match": '"e0"'}).status_code == 200
+    assert get("2").status_code == 404
+
+
+def delete(id):
+    return Delete_Product.main(func.HttpRequest("DELETE", f"/api/products/{id}", route_params={"ID": id}, body=b""))
+
+
+def test_delete_invalidates_the_entry(container, cache):
+    cosmos_client.read_item("1")
+    assert delete("1").status_code == 200
+    assert cache.get("1") == (None, False)
+
+    # Also on 404: the cached copy is known to be stale
+    cache.put(product("2"))
+    assert delete("2").status_code == 404
+    assert cache.get("2") == (None, False)
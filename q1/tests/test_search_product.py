@@ -0,0 +1,126 @@
+import json
+import azure.functions as func
+import pytest
+from azure.cosmos import exceptions
+import Search_Product
+from Search_Product import RequestCharge, build_search_query, parse_search
+
+
+@pytest.mark.parametrize("params, error", [
+    ({"maxItemCount": "ten"}, "maxItemCount must be an integer"),
+    ({"maxItemCount": "0"}, "maxItemCount must be positive"),
+    ({"fields": "name,price;DROP"}, "Invalid field name in 'fields'"),
+    ({"minPrice": "cheap"}, "minPrice must be a number"),
+    ({"maxPrice": "nan"}, "maxPrice must be a number"),
+    ({"minPrice": "-inf"}, "minPrice must be a number"),
+    ({"minPrice": "10", "maxPrice": "5"}, "minPrice must not be greater than maxPrice"),
+    ({"orderBy": "description"}, "orderBy must be one of name, price"),
+    ({"orderBy": "price", "order": "up"}, "order must be asc or desc"),
+])
+def test_parse_search_rejects_bad_parameters(params, error):
+    assert parse_search(params) == error
+
+
+def test_parse_search_defaults():
+    assert parse_search({}) == {
+        "page_size": 100, "fields": [], "name_prefix": None,
+        "min_price": None, "max_price": None, "order_by": None, "order": "ASC"
+    }
+    assert parse_search({"maxItemCount": "5000", "minPrice": ""})["page_size"] == 1000
+
+
+def test_query_is_parameterized():
+    options = parse_search({
+        "fields": "id, name,price", "namePrefix": "Wid' OR 1=1 --",
+        "minPrice": "5", "maxPrice": "20.5", "orderBy": "price", "order": "DESC"
+    })
+    query, parameters = build_search_query(options)
+    assert query == (
+        "SELECT c.id, c.name, c.price FROM c"
+        " WHERE STARTSWITH(c.name, @namePrefix) AND c.price >= @minPrice AND c.price <= @maxPrice"
+        " ORDER BY c.price DESC, c.id DESC"
+    )
+    assert parameters == [
+        {"name": "@namePrefix", "value": "Wid' OR 1=1 --"},
+        {"name": "@minPrice", "value": 5.0},
+        {"name": "@maxPrice", "value": 20.5},
+    ]
+
+
+def test_query_without_filters():
+    assert build_search_query(parse_search({})) == ("SELECT * FROM c", [])
+    query, _ = build_search_query(parse_search({"maxPrice": "3", "orderBy": "name"}))
+    assert query == "SELECT * FROM c WHERE c.price <= @maxPrice ORDER BY c.name ASC, c.id ASC"
+
+
+class FakePager:
+    def __init__(self, pages, continuation, hook):
+        self.pages = pages
+        self.continuation = continuation
+        self.position = int(continuation) if (continuation or "").isdigit() else 0
+        self.hook = hook
+        self.continuation_token = None
+
+    def __next__(self):
+        if self.continuation and not self.continuation.isdigit():
+            raise exceptions.CosmosHttpResponseError(status_code=400, message="Invalid continuation token")
+        if self.position >= len(self.pages):
+            raise StopIteration
+        self.hook({"x-ms-request-charge": "2.5"}, None)
+        self.hook({"x-ms-request-charge": "1.25", "x-ms-cosmos-index-utilization": "eyJ9"}, None)
+        page = self.pages[self.position]
+        self.position += 1
+        self.continuation_token = str(self.position) if self.position < len(self.pages) else None
+        return iter(page)
+
+
+class FakeContainer:
+    def __init__(self, pages):
+        self.pages = pages
+        self.queries = []
+
+    def query_items(self, query, parameters, response_hook, **kwargs):
+        self.queries.append((query, parameters, kwargs))
+        pages = self.pages
+        return type("ItemPaged", (), {
+            "by_page": lambda _, continuation=None: FakePager(pages, continuation, response_hook)
+        })()
+
+
+def search(params, headers=None):
+    return Search_Product.main(func.HttpRequest("GET", "/api/products/search", params=params, headers=headers or {}, body=b""))
+
+
+def test_search_returns_a_page_with_charge_and_continuation(monkeypatch):
+    container = FakeContainer([[{"id": "1"}, {"id": "2"}], [{"id": "3"}]])
+    monkeypatch.setattr(Search_Product, "get_container", lambda: container)
+
+    response = search({"namePrefix": "W", "maxItemCount": "2", "indexMetrics": "true"})
+    assert json.loads(response.get_body()) == [{"id": "1"}, {"id": "2"}]
+    assert response.headers["x-ms-request-charge"] == "3.75"
+    assert response.headers["x-ms-cosmos-index-utilization"] == "eyJ9"
+    assert response.headers["x-ms-continuation"] == "1"
+    query, parameters, kwargs = container.queries[0]
+    assert kwargs["max_item_count"] == 2 and kwargs["populate_index_metrics"] is True
+
+    response = search({}, headers={"x-ms-continuation": "1"})
+    assert json.loads(response.get_body()) == [{"id": "3"}]
+    assert "x-ms-continuation" not in response.headers
+
+
+def test_search_errors(monkeypatch):
+    container = FakeContainer([])
+    monkeypatch.setattr(Search_Product, "get_container", lambda: container)
+    response = search({"order": "sideways"})
+    assert (response.status_code, response.get_body()) == (400, b"order must be asc or desc")
+    assert container.queries == []
+
+    response = search({"continuation": "garbage"})
+    assert (response.status_code, response.get_body()) == (400, b"Invalid continuation token")
+    assert json.loads(search({}).get_body()) == []
+
+
+def test_request_charge_without_headers():
+    charge = RequestCharge()
+    charge({}, None)
+    assert charge.headers() == {"x-ms-request-charge": "0.00"}
@@ -0,0 +1,123 @@
+import json
+import azure.functions as func
+import pytest
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+import Update_Product
+from cosmos_client import ProductCache
+from Update_Product import MAX_PATCH_OPERATIONS, build_patch_operations
+
+
+class FakeContainer:
+    def __init__(self, item):
+        self.item = dict(item)
+        self.calls = []
+        self.version = 1
+
+    def _check(self, id, etag, match_condition):
+        if id != self.item["id"]:
+            raise exceptions.CosmosResourceNotFoundError(message="NotFound")
+        if match_condition == MatchConditions.IfNotModified and etag != self.item["_etag"]:
+            raise exceptions.CosmosAccessConditionFailedError(message="PreconditionFailed")
+
+    def _write(self, values):
+        self.item.update(values)
+        self.version += 1
+        self.item["_etag"] = f'"e{self.version}"'
+        return dict(self.item)
+
+    def read_item(self, item, partition_key):
+        self.calls.append(("read_item", item))
+        self._check(item, None, None)
+        return dict(self.item)
+
+    def patch_item(self, item, partition_key, patch_operations, etag=None, match_condition=None):
+        self.calls.append(("patch_item", item, len(patch_operations), etag, match_condition))
+        self._check(item, etag, match_condition)
+        return self._write({op["path"][1:]: op["value"] for op in patch_operations})
+
+    def replace_item(self, item, body, etag=None, match_condition=None):
+        self.calls.append(("replace_item", item, etag, match_condition))
+        self._check(item, etag, match_condition)
+        return self._write(body)
+
+
+@pytest.fixture
+def container(monkeypatch):
+    container = FakeContainer({"id": "1", "name": "Widget", "price": 5, "_etag": '"e1"'})
+    monkeypatch.setattr(Update_Product, "get_container", lambda: container)
+    return container
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ProductCache(max_size=10, ttl=30)
+    monkeypatch.setattr(Update_Product, "product_cache", cache)
+    return cache
+
+
+def update(id, body, etag=None):
+    return Update_Product.main(func.HttpRequest(
+        "PUT", f"/api/products/{id}", route_params={"id": id},
+        headers={"If-Match": etag} if etag else {}, body=json.dumps(body).encode()
+    ))
+
+
+def test_patch_operations_skip_id_and_system_properties():
+    assert build_patch_operations({"id": "1", "_etag": "x", "_ts": 1, "name": "W", "a/b~c": 2}) == [
+        {"op": "set", "path": "/name", "value": "W"},
+        {"op": "set", "path": "/a~1b~0c", "value": 2},
+    ]
+
+
+def test_small_update_is_one_conditional_patch(container, cache):
+    response = update("1", {"name": "Gadget", "price": 7}, etag='"e1"')
+    assert response.status_code == 200
+    assert container.calls == [("patch_item", "1", 2, '"e1"', MatchConditions.IfNotModified)]
+    assert response.headers["ETag"] == '"e2"'
+    assert json.loads(response.get_body())["name"] == "Gadget"
+
+
+def test_patch_without_if_match_is_unconditional(container, cache):
+    assert update("1", {"name": "Gadget"}, etag="*").status_code == 200
+    assert container.calls == [("patch_item", "1", 1, None, None)]
+
+
+def test_large_update_falls_back_to_a_conditional_replace(container, cache):
+    body = {f"field{i}": i for i in range(MAX_PATCH_OPERATIONS + 1)}
+    response = update("1", body, etag='"e1"')
+    assert response.status_code == 200
+    # Replaced at the ETag it was read at, so a concurrent write gets a 412
+    assert container.calls == [("read_item", "1"), ("replace_item", "1", '"e1"', MatchConditions.IfNotModified)]
+    assert json.loads(response.get_body())["field10"] == 10
+    assert container.item["name"] == "Widget"
+
+
+@pytest.mark.parametrize("body", [{"name": "Gadget"}, {f"field{i}": i for i in range(MAX_PATCH_OPERATIONS + 1)}, {"id": "1"}])
+def test_if_match_mismatch_is_412_and_writes_nothing(container, cache, body):
+    cache.put(dict(container.item))
+    response = update("1", body, etag='"stale"')
+    assert response.status_code == 412
+    assert container.version == 1
+    assert not any(call[0] == "replace_item" for call in container.calls)
+    assert cache.get("1") == (None, False)
+
+
+def test_update_refreshes_the_cached_product(container, cache):
+    cache.put(dict(container.item))
+    update("1", {"price": 9})
+    item, fresh = cache.get("1")
+    assert fresh and item["price"] == 9 and item["_etag"] == '"e2"'
+
+
+def test_missing_product_is_404_and_invalidated(container, cache):
+    cache.put({"id": "2", "_etag": '"e1"'})
+    assert update("2", {"name": "x"}).status_code == 404
+    assert cache.get("2") == (None, False)
+
+
+def test_bad_bodies_are_rejected(container):
+    assert update("1", [1, 2]).status_code == 400
+    response = Update_Product.main(func.HttpRequest("PUT", "/api/products/1", route_params={"id": "1"}, body=b"{"))
+    assert response.status_code == 400
+    assert container.calls == []
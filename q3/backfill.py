@@ -0,0 +1,222 @@
+"""
+Backfill or reindex the blob metadata index.
+
+Lists the containers page by page and indexes every blob with the same
+code as the Event Grid trigger (indexer.build_document), --concurrency
+blobs at a time, then upserts each page's documents in grouped batches.
+After every page the listing continuation token is saved to the
+checkpoint file, so an interrupted run resumes where it stopped. Blobs
+that failed to index are recorded in the checkpoint too and retried first
+on the next run. Blobs already indexed at their current ETag are skipped,
+unless --force.
+
+    python backfill.py                                  # every container
+    python backfill.py --containers documents --prefix 2025/ --concurrency 16
+    python backfill.py --force                          # after extraction changes
+    python backfill.py --dry-run --output documents.jsonl
+
+Settings (BLOB_CONN_STR, COSMOS_*) come from the environment, else from
+local.settings.json like the function app. Against Azurite:
+--connection-string UseDevelopmentStorage=true
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceNotFoundError
+
+import indexer
+from indexer import INDEX_CONCURRENCY, build_document, upsert_documents
+
+DEFAULT_CHECKPOINT = ".backfill-checkpoint.json"
+
+
+def load_settings(path):
+    """Put the Values of a local.settings.json into the environment, without overriding it."""
+    if not path or not os.path.exists(path):
+        return
+    with open(path) as f:
+        values = json.load(f).get("Values", {})
+    for name, value in values.items():
+        os.environ.setdefault(name, str(value))
+
+
+def load_checkpoint(path, args):
+    if args.reset or not os.path.exists(path):
+        return {"prefix": args.prefix, "containers": {}}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("prefix") != args.prefix:
+        raise Exception(f"{path} is for prefix {checkpoint.get('prefix')!r}; use --reset to start over")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    checkpoint["updatedOn"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def next_page(pages):
+    """([(blob name, etag)], continuation token after them) of the next listing page, or None at the end."""
+    page = next(pages, None)
+    if page is None:
+        return None
+    return [(blob.name, blob.etag) for blob in page], pages.continuation_token
+
+
+async def index_blobs(container_client, blobs, args, stats):
+    """Documents of the (name, etag) blobs that need (re)indexing, and the names of those that failed."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failed = []
+    missing = 0
+
+    async def index_one(name, etag):
+        nonlocal missing
+        async with semaphore:
+            url = container_client.get_blob_client(name).url
+            try:
+                # The listed ETag lets unchanged blobs skip the properties call
+                return await asyncio.to_thread(build_document, url, etag, args.force)
+            except ResourceNotFoundError:
+                # Deleted since it was listed
+                missing += 1
+                return None
+            except Exception as e:
+                failed.append(name)
+                logging.error(f"Error indexing {url}: {e}")
+                return None
+
+    results = await asyncio.gather(*(index_one(name, etag) for name, etag in blobs))
+    documents = [document for document in results if document is not None]
+    stats["failed"] += len(failed)
+    stats["missing"] += missing
+    stats["unchanged"] += len(blobs) - len(documents) - len(failed) - missing
+    return documents, failed
+
+
+async def write_documents(documents, args, write_pool, output):
+    if documents and not args.dry_run:
+        await asyncio.to_thread(upsert_documents, documents, write_pool)
+    if output:
+        for document in documents:
+            output.write(json.dumps(document) + "\n")
+
+
+async def backfill_container(blob_service, name, checkpoint, args, write_pool, output, stats):
+    state = checkpoint["containers"].setdefault(name, {"continuation": None, "done": False, "failed": []})
+    container_client = blob_service.get_container_client(name)
+    if state.get("failed"):
+        # Failed on an earlier run, on pages the continuation is already past
+        retry = state["failed"]
+        documents, state["failed"] = await index_blobs(container_client, [(blob, None) for blob in retry], args, stats)
+        await write_documents(documents, args, write_pool, output)
+        stats["retried"] += len(retry)
+        stats["indexed"] += len(documents)
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, checkpoint)
+        logging.warning(f"{name}: retried {len(retry)} failed blobs, {len(state['failed'])} still failing")
+    if state["done"]:
+        logging.info(f"{name}: already done")
+        return
+
+    pages = container_client.list_blobs(
+        name_starts_with=args.prefix,
+        results_per_page=args.page_size
+    ).by_page(continuation_token=state["continuation"])
+
+    listing = asyncio.create_task(asyncio.to_thread(next_page, pages))
+    while True:
+        page = await listing
+        if page is None:
+            break
+        blobs, continuation = page
+        # List the next page while this one is indexed
+        listing = asyncio.create_task(asyncio.to_thread(next_page, pages))
+
+        started = time.perf_counter()
+        documents, failed = await index_blobs(container_client, blobs, args, stats)
+        await write_documents(documents, args, write_pool, output)
+        stats["listed"] += len(blobs)
+        stats["indexed"] += len(documents)
+        stats["pages"] += 1
+
+        # Saved with the continuation, so the next run retries them
+        state["failed"] = state.get("failed", []) + failed
+        state["continuation"] = continuation
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, checkpoint)
+        logging.warning(
+            f"{name}: page of {len(blobs)} blobs, {len(documents)} indexed in "
+            f"{time.perf_counter() - started:.2f}s ({stats['listed']} listed so far)"
+        )
+
+    state["done"] = True
+    if not args.dry_run:
+        save_checkpoint(args.checkpoint, checkpoint)
+
+
+async def backfill(args):
+    blob_service = indexer.get_blob_service()
+    containers = args.containers or [container.name for container in blob_service.list_containers()]
+    checkpoint = load_checkpoint(args.checkpoint, args)
+
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=args.concurrency + 2, thread_name_prefix="backfill")
+    )
+    stats = {"listed": 0, "indexed": 0, "unchanged": 0, "missing": 0, "failed": 0, "retried": 0, "pages": 0}
+    started = time.perf_counter()
+    output = open(args.output, "a") if args.output else None
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="write") as write_pool:
+            for name in containers:
+                await backfill_container(blob_service, name, checkpoint, args, write_pool, output, stats)
+    finally:
+        if output:
+            output.close()
+        elapsed = time.perf_counter() - started
+        stats["elapsedSeconds"] = round(elapsed, 2)
+        stats["blobsPerSecond"] = round(stats["listed"] / elapsed, 1) if elapsed else None
+        print(json.dumps(stats))
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--containers", nargs="+", help="containers to index (default: all)")
+    parser.add_argument("--prefix", default=None, help="only blobs whose name starts with this")
+    parser.add_argument("--concurrency", type=int, default=INDEX_CONCURRENCY, help="blobs indexed at once")
+    parser.add_argument("--page-size", type=int, default=500, help="blobs per listing page (and checkpoint)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--force", action="store_true", help="reindex blobs even if their ETag is unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="extract but write nothing to Cosmos or the checkpoint")
+    parser.add_argument("--output", help="also append the documents to this NDJSON file")
+    parser.add_argument("--connection-string", help="storage connection string (default: BLOB_CONN_STR)")
+    parser.add_argument("--settings", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "local.settings.json"))
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(asctime)s %(message)s")
+    if args.connection_string:
+        os.environ["BLOB_CONN_STR"] = args.connection_string
+    load_settings(args.settings)
+    if args.concurrency < 1 or args.page_size < 1:
+        raise Exception("--concurrency and --page-size must be at least 1")
+    if args.dry_run and not os.getenv("COSMOS_URL"):
+        # Nothing to compare against
+        args.force = True
+
+    stats = asyncio.run(backfill(args))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Content extractors for the metadata index.
+
+Each extractor declares which blobs it handles (content types, file
+extensions) and how many leading bytes it needs. The indexer fetches
+exactly that with one ranged GET and passes the bytes to the extractor;
+extractors that need the whole blob (header_bytes None) get an iterator
+of chunks instead and must keep their memory constant.
+
+Extractors return a dict of fields merged into the metadata document.
+The first registered extractor that matches a blob is used, so specific
+types are registered before the generic text one.
+"""
+import codecs
+import collections
+import csv
+import json
+import os
+import re
+import struct
+from text_stats import analyze_chunks
+
+JSON_MAX_BYTES = int(os.getenv("JSON_MAX_BYTES", str(1024 * 1024)))
+PDF_HEADER_BYTES = int(os.getenv("PDF_HEADER_BYTES", str(64 * 1024)))
+# JPEG keeps its dimensions after the EXIF/ICC segments, which can be large
+IMAGE_HEADER_BYTES = int(os.getenv("IMAGE_HEADER_BYTES", str(64 * 1024)))
+CSV_SNIFF_CHARS = 64 * 1024
+
+Extractor = collections.namedtuple("Extractor", "name content_types extensions header_bytes extract")
+
+EXTRACTORS = []
+
+
+def register(name, content_types=(), extensions=(), header_bytes=None):
+    """
+    Decorator adding extract(data) to the registry. data is the first
+    header_bytes bytes of the blob (all of it if smaller), or, with
+    header_bytes None, an iterable of the blob's chunks.
+    """
+    def decorator(extract):
+        EXTRACTORS.append(Extractor(name, tuple(content_types), tuple(extensions), header_bytes, extract))
+        return extract
+    return decorator
+
+
+def find_extractor(content_type, blob_name):
+    """The extractor for a blob, or None."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    extension = os.path.splitext(blob_name)[1].lower()
+    for extractor in EXTRACTORS:
+        if extension in extractor.extensions:
+            return extractor
+        for pattern in extractor.content_types:
+            # "image/" matches every image type, "text" any type containing it
+            if content_type == pattern or (pattern.endswith("/") and content_type.startswith(pattern)) \
+                    or (pattern == "text" and "text" in content_type):
+                return extractor
+    return None
+
+
+def _iter_lines(chunks):
+    """Lines (with their newline) of UTF-8 chunks, decoded incrementally."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+@register("json", content_types=("application/json", "text/json"), extensions=(".json",), header_bytes=JSON_MAX_BYTES)
+def extract_json(data):
+    text = data.decode("utf-8-sig", errors="replace")
+    first = text.lstrip()[:1]
+    root = {"{": "object", "[": "array"}.get(first, "value" if first else None)
+    fields = {"jsonType": root}
+    try:
+        value = json.loads(text)
+    except ValueError:
+        # Larger than JSON_MAX_BYTES (or invalid): only the root type is known
+        return fields
+    if isinstance(value, dict):
+        fields["keyCount"] = len(value)
+        fields["keys"] = list(value)[:50]
+        if isinstance(value.get("title"), str):
+            fields["title"] = value["title"]
+    elif isinstance(value, list):
+        fields["itemCount"] = len(value)
+    return fields
+
+
+@register("csv", content_types=("text/csv", "application/csv"), extensions=(".csv", ".tsv"))
+def extract_csv(chunks):
+    lines = _iter_lines(chunks)
+    sample = []
+    sample_chars = 0
+    for line in lines:
+        sample.append(line)
+        sample_chars += len(line)
+        if sample_chars >= CSV_SNIFF_CHARS:
+            break
+    try:
+        dialect = csv.Sniffer().sniff("".join(sample), delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+
+    def all_lines():
+        yield from sample
+        yield from lines
+
+    # csv joins quoted fields that span lines, so rows are records, not lines
+    reader = csv.reader(all_lines(), dialect)
+    columns = next(reader, None)
+    row_count = sum(1 for row in reader if row)
+    return {"columns": columns, "columnCount": len(columns) if columns else 0, "rowCount": row_count}
+
+
+def _text(chunks):
+    title, word_count = analyze_chunks(chunks)
+    return {"title": title, "wordCount": word_count}
+
+
+register("markdown", content_types=("text/markdown", "text/x-markdown"), extensions=(".md", ".markdown"))(_text)
+register("text", content_types=("text",), extensions=(".txt", ".log"))(_text)
+
+
+@register("pdf", content_types=("application/pdf",), extensions=(".pdf",), header_bytes=PDF_HEADER_BYTES)
+def extract_pdf(data):
+    fields = {}
+    version = re.match(rb"%PDF-(\d+\.\d+)", data)
+    if version:
+        fields["pdfVersion"] = version.group(1).decode()
+    # Linearized (web-optimized) files start with a dictionary holding the page count
+    linearized = re.search(rb"/Linearized\b[^>]*?/N\s+(\d+)", data)
+    if linearized:
+        fields["pageCount"] = int(linearized.group(1))
+    # First page size in points, if its dictionary is in the header range
+    number = rb"\s*(-?\d+(?:\.\d+)?)"
+    box = re.search(rb"/MediaBox\s*\[" + number * 4 + rb"\s*\]", data)
+    if box:
+        x1, y1, x2, y2 = (float(v) for v in box.groups())
+        fields["width"] = abs(x2 - x1)
+        fields["height"] = abs(y2 - y1)
+    return fields
+
+
+def _jpeg_size(data):
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        # Start of frame (not DHT, JPG or DAC, which share the range)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + struct.unpack(">H", data[offset + 2:offset + 4])[0]
+    return None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return (int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1)
+    return None
+
+
+def _image_size(data):
+    """(format, (width, height) or None) from the leading bytes of an image."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return "png", struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return "gif", struct.unpack("<HH", data[6:10])
+    if data.startswith(b"\xff\xd8"):
+        return "jpeg", _jpeg_size(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp", _webp_size(data)
+    if data.startswith(b"BM") and len(data) >= 26:
+        width, height = struct.unpack("<ii", data[18:26])
+        return "bmp", (width, abs(height))
+    return None, None
+
+
+@register("image", content_types=("image/",), extensions=(".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"),
+          header_bytes=IMAGE_HEADER_BYTES)
+def extract_image(data):
+    image_format, size = _image_size(data)
+    fields = {"imageFormat": image_format}
+    if size:
+        fields["width"], fields["height"] = size
+    return fields
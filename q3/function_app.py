@@ -1,12 +1,16 @@
 import logging
-import os
+import json
+import time
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
-from azure.cosmos import CosmosClient
-from datetime import datetime
+from azure.core.exceptions import ResourceNotFoundError
+from concurrent.futures import ThreadPoolExecutor
+from indexer import INDEX_CONCURRENCY, build_document, get_metadata_container, upsert_documents
 
 app = func.FunctionApp()
 
+# Shared by the invocations of this worker process
+index_pool = ThreadPoolExecutor(max_workers=INDEX_CONCURRENCY, thread_name_prefix="index")
+
 @app.event_grid_trigger(arg_name="azeventgrid")
 def EventGridTrigger(azeventgrid: func.EventGridEvent):
 
@@ -18,87 +22,17 @@ def EventGridTrigger(azeventgrid: func.EventGridEvent):
         blob_url = data["url"]
         logging.info(f"Blob URL: {blob_url}")
 
-        #  CONNECT TO BLOB STG
-     
-        blob_conn = os.environ["BLOB_CONN_STR"]
-        blob_service = BlobServiceClient.from_connection_string(blob_conn)
-
-        # container + blob name
-        parts = blob_url.replace("https://", "").split("/", 2)
-        container_name = parts[1]
-        blob_name = parts[2]
-        logging.info(f"Container: {container_name}, Blob: {blob_name}")
-
-        blob_client = blob_service.get_blob_client(container=container_name, blob=blob_name)
-
-        # Blob properties
-        props = blob_client.get_blob_properties()
-
-        size = props.size
-        content_type = props.content_settings.content_type
-
-    
-        #  READ BLOB 
-    
-        title = None
-        word_count = None
-
-        if "text" in content_type or blob_name.endswith(".txt") or blob_name.endswith(".md"):
-            try:
-                blob_bytes = blob_client.download_blob().readall()
-                blob_text = blob_bytes.decode("utf-8", errors="ignore")
-
-                # Extract title:
-            
-                for line in blob_text.splitlines():
-                    stripped = line.strip()
-                    if stripped.startswith("# "):   
-                        title = stripped[2:].strip()
-                        break
-
-                
-                if not title:
-                    title = blob_text.splitlines()[0].strip() if blob_text else "(empty file)"
-
-                # Count words
-                word_count = len(blob_text.split())
-
-            except Exception as e:
-                logging.error(f"Error reading blob content: {e}")
-                title = None
-                word_count = None
-        else:
-            logging.info("Blob is not a text file. Skipping content extraction.")
-
-        
-        # COSMOS DB
-        
-        document = {
-            "id": blob_name,
-            "blobName": blob_name,
-            "container": container_name,
-            "url": blob_url,
-            "size": size,
-            "contentType": content_type,
-            "title": title,
-            "wordCount": word_count,
-            "uploadedOn": datetime.utcnow().isoformat()
-        }
+        document = build_document(blob_url, etag=data.get("eTag"))
+        if document is None:
+            # Already indexed at this version (duplicate or no-op event)
+            return None
 
         logging.info(f"Document to insert: {document}")
 
 
         # INSERT TO COSMOS DB
-        
-        cosmos_client = CosmosClient(
-            os.environ["COSMOS_URL"],
-            credential=os.environ["COSMOS_KEY"]
-        )
-
-        database = cosmos_client.get_database_client(os.environ["COSMOS_DB"])
-        container = database.get_container_client(os.environ["COSMOS_CONTAINER"])
 
-        container.upsert_item(document)
+        get_metadata_container().upsert_item(document)
 
         logging.info("Metadata inserted into Cosmos DB successfully.")
 
@@ -107,3 +41,94 @@ def EventGridTrigger(azeventgrid: func.EventGridEvent):
         raise
 
     return None
+
+
+# The Event Grid trigger gets one event per invocation. For bursts, point
+# a webhook subscription (with max events per batch set) at this endpoint
+# instead: it indexes the whole delivery and writes it in grouped batches.
+@app.route(route="eventgrid/batch", methods=["POST", "OPTIONS"])
+def EventGridBatch(req: func.HttpRequest) -> func.HttpResponse:
+
+    # CloudEvents schema: abuse protection handshake
+    if req.method == "OPTIONS":
+        return func.HttpResponse(
+            status_code=200,
+            headers={"WebHook-Allowed-Origin": req.headers.get("WebHook-Request-Origin", "*")}
+        )
+
+    try:
+        events = req.get_json()
+    except ValueError:
+        return func.HttpResponse("Expected a JSON array of events.", status_code=400)
+    if isinstance(events, dict):
+        events = [events]
+
+    # Event Grid schema: subscription validation handshake
+    for event in events:
+        if event.get("eventType") == "Microsoft.EventGrid.SubscriptionValidationEvent":
+            return func.HttpResponse(
+                json.dumps({"validationResponse": event["data"]["validationCode"]}),
+                mimetype="application/json"
+            )
+
+    start_time = time.perf_counter()
+    # Duplicate deliveries of a blob are indexed once. Event Grid doesn't
+    # order events, so if they carry different ETags none of them is
+    # trusted: build_document compares against the blob's current one.
+    blob_etags = {}
+    for event in events:
+        # eventType in the Event Grid schema, type in CloudEvents
+        if (event.get("eventType") or event.get("type")) != "Microsoft.Storage.BlobCreated":
+            continue
+        data = event.get("data") or {}
+        if not data.get("url"):
+            continue
+        etag = data.get("eTag")
+        if data["url"] in blob_etags and blob_etags[data["url"]] != etag:
+            etag = None
+        blob_etags[data["url"]] = etag
+
+    documents = []
+    failed = unchanged = missing = 0
+    futures = [(url, index_pool.submit(build_document, url, etag)) for url, etag in blob_etags.items()]
+    for blob_url, future in futures:
+        try:
+            document = future.result()
+            if document is None:
+                unchanged += 1
+            else:
+                documents.append(document)
+        except ResourceNotFoundError:
+            # Deleted since the event was sent; retrying won't bring it back
+            missing += 1
+        except Exception as e:
+            failed += 1
+            logging.error(f"Error indexing {blob_url}: {e}")
+    extracted = time.perf_counter()
+
+    groups = 0
+    write_error = None
+    try:
+        groups = upsert_documents(documents, index_pool)
+    except Exception as e:
+        write_error = e
+        logging.error(f"Error writing metadata batch: {e}")
+    finished = time.perf_counter()
+
+    logging.info("MetadataBatch " + json.dumps({
+        "events": len(events),
+        "blobs": len(blob_etags),
+        "documents": len(documents),
+        "unchanged": unchanged,
+        "missing": missing,
+        "failed": failed,
+        "partitionGroups": groups,
+        "extractSeconds": round(extracted - start_time, 3),
+        "writeSeconds": round(finished - extracted, 3),
+        "totalSeconds": round(finished - start_time, 3)
+    }))
+
+    # Event Grid redelivers the whole batch on failure; upserts make that safe
+    if failed or write_error:
+        return func.HttpResponse(f"{failed} blobs failed to index" + (f", write failed: {write_error}" if write_error else ""), status_code=500)
+    return func.HttpResponse(f"Indexed {len(documents)} blobs, {unchanged} unchanged.", status_code=200)
@@ -0,0 +1,232 @@
+"""
+Blob metadata indexing shared by the q3 functions.
+
+The blob and Cosmos clients are created once per worker process and reused
+by every invocation. upsert_documents writes a batch of metadata documents
+grouped by partition key: groups go out as transactional batches of up to
+COSMOS_BATCH_SIZE upserts, single documents as plain upserts, all of them
+concurrently.
+
+Documents record the blob's ETag and Content-MD5. build_document first
+reads the existing document (a point read) and returns None when the blob
+hasn't changed since, so duplicate or no-op events skip the download and
+the upsert.
+"""
+import base64
+import logging
+import os
+import threading
+from datetime import datetime
+from urllib.parse import unquote, urlparse
+from azure.cosmos import CosmosClient
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from azure.storage.blob import BlobServiceClient
+from extractors import find_extractor
+
+# Blobs read whole (text, CSV) are read in ranges of this size, one at a time
+TEXT_CHUNK_SIZE = int(os.getenv("TEXT_CHUNK_SIZE", str(4 * 1024 * 1024)))
+# Blobs read and Cosmos requests sent at once per batch
+INDEX_CONCURRENCY = int(os.getenv("INDEX_CONCURRENCY", "8"))
+# Operations per transactional batch; the service allows up to 100
+COSMOS_BATCH_SIZE = min(100, int(os.getenv("COSMOS_BATCH_SIZE", "100")))
+
+_lock = threading.Lock()
+_blob_service = None
+_metadata_container = None
+_partition_key_paths = None
+
+
+def get_blob_service():
+    global _blob_service
+    with _lock:
+        if _blob_service is None:
+            _blob_service = BlobServiceClient.from_connection_string(
+                os.environ["BLOB_CONN_STR"],
+                max_single_get_size=TEXT_CHUNK_SIZE,
+                max_chunk_get_size=TEXT_CHUNK_SIZE
+            )
+        return _blob_service
+
+
+def get_metadata_container():
+    global _metadata_container
+    with _lock:
+        if _metadata_container is None:
+            cosmos_client = CosmosClient(
+                os.environ["COSMOS_URL"],
+                credential=os.environ["COSMOS_KEY"]
+            )
+            database = cosmos_client.get_database_client(os.environ["COSMOS_DB"])
+            _metadata_container = database.get_container_client(os.environ["COSMOS_CONTAINER"])
+        return _metadata_container
+
+
+def partition_key_paths():
+    """Partition key paths of the metadata container, e.g. ["/id"], read once."""
+    global _partition_key_paths
+    if _partition_key_paths is None:
+        _partition_key_paths = get_metadata_container().read()["partitionKey"]["paths"]
+    return _partition_key_paths
+
+
+def partition_key_of(document):
+    """Partition key value of a document, or None if it lacks one."""
+    values = []
+    for path in partition_key_paths():
+        value = document
+        for part in path.strip("/").split("/"):
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        values.append(value)
+    return values[0] if len(values) == 1 else values
+
+
+def parse_blob_url(blob_url):
+    """(container, blob) of a blob URL, also path-style ones like Azurite's http://127.0.0.1:10000/<account>/..."""
+    url = urlparse(blob_url)
+    path = unquote(url.path).lstrip("/")
+    host = url.hostname or ""
+    if host == "localhost" or "." not in host or host.replace(".", "").isdigit():
+        path = path.split("/", 1)[1]
+    container_name, blob_name = path.split("/", 1)
+    return container_name, blob_name
+
+
+def normalize_etag(etag):
+    # Event Grid sends 0x8D..., the blob API "0x8D..."
+    return etag.strip('"') if etag else None
+
+
+def content_md5_of(props):
+    md5 = props.content_settings.content_md5
+    return base64.b64encode(md5).decode() if md5 else None
+
+
+def read_existing(document):
+    """The stored document with document's id, or None (also if its partition key isn't known yet)."""
+    try:
+        partition_key = partition_key_of(document)
+        if partition_key is None:
+            return None
+        return get_metadata_container().read_item(item=document["id"], partition_key=partition_key)
+    except CosmosResourceNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Could not read the existing document for {document['id']}, indexing anyway: {e}")
+        return None
+
+
+def build_document(blob_url, etag=None, force=False):
+    """
+    Metadata document of a blob: its properties plus what its extractor
+    finds. None if the indexed document is still current: same ETag as
+    etag (from the event) or the blob's properties, or the same Content-MD5
+    and size. force reindexes regardless.
+    """
+    container_name, blob_name = parse_blob_url(blob_url)
+    logging.info(f"Container: {container_name}, Blob: {blob_name}")
+
+    document = {
+        "id": blob_name,
+        "blobName": blob_name,
+        "container": container_name,
+        "url": blob_url
+    }
+    existing = None if force else read_existing(document)
+    if existing and etag and existing.get("etag") == normalize_etag(etag):
+        logging.info(f"{blob_name} unchanged (ETag {existing['etag']}), skipping.")
+        return None
+
+    blob_client = get_blob_service().get_blob_client(container=container_name, blob=blob_name)
+
+    # Blob properties
+    props = blob_client.get_blob_properties()
+
+    size = props.size
+    content_type = props.content_settings.content_type
+    blob_etag = normalize_etag(props.etag)
+    content_md5 = content_md5_of(props)
+
+    if existing:
+        if existing.get("etag") == blob_etag:
+            logging.info(f"{blob_name} unchanged (ETag {blob_etag}), skipping.")
+            return None
+        if content_md5 and existing.get("contentMD5") == content_md5 and existing.get("size") == size:
+            # Overwritten with the same bytes
+            logging.info(f"{blob_name} content unchanged (MD5 {content_md5}), skipping.")
+            return None
+
+    extractor = find_extractor(content_type, blob_name)
+    fields = {}
+    if extractor:
+        try:
+            fields = extract(extractor, blob_client, size)
+        except Exception as e:
+            logging.error(f"Error reading blob content: {e}")
+    else:
+        logging.info("No extractor for this blob type. Skipping content extraction.")
+
+    document = dict(fields, **document)
+    document.update({
+        "size": size,
+        "etag": blob_etag,
+        "contentMD5": content_md5,
+        "contentType": content_type,
+        "extractor": extractor.name if extractor else None,
+        "title": fields.get("title"),
+        "wordCount": fields.get("wordCount"),
+        "uploadedOn": datetime.utcnow().isoformat()
+    })
+    return document
+
+
+def extract(extractor, blob_client, size):
+    """Run extractor on a blob: one ranged GET of its header bytes, or a streamed read."""
+    if extractor.header_bytes is None:
+        # Streamed range by range, in constant memory
+        return extractor.extract(blob_client.download_blob().chunks())
+    length = min(extractor.header_bytes, size)
+    data = blob_client.download_blob(offset=0, length=length).readall() if length else b""
+    return extractor.extract(data)
+
+
+def _upsert_group(container, partition_key, documents):
+    if partition_key is None or len(documents) == 1:
+        for document in documents:
+            container.upsert_item(document)
+        return
+    for start in range(0, len(documents), COSMOS_BATCH_SIZE):
+        chunk = documents[start:start + COSMOS_BATCH_SIZE]
+        try:
+            container.execute_item_batch([("upsert", (document,)) for document in chunk], partition_key=partition_key)
+        except Exception:
+            # A batch is all or nothing; retry one by one so only the bad documents fail
+            logging.exception(f"Batch upsert of {len(chunk)} documents failed, upserting them one by one")
+            for document in chunk:
+                container.upsert_item(document)
+
+
+def upsert_documents(documents, executor):
+    """
+    Upsert documents grouped by partition key, the groups concurrently on
+    executor. Returns the number of groups written; raises the first error
+    after all groups have finished.
+    """
+    container = get_metadata_container()
+    groups = {}
+    for document in documents:
+        partition_key = partition_key_of(document)
+        # Lists (hierarchical keys) aren't hashable
+        key = repr(partition_key) if partition_key is not None else ("single", id(document))
+        # One operation per id and partition: the last document wins, as it would one by one
+        groups.setdefault(key, (partition_key, {}))[1][document["id"]] = document
+
+    futures = [
+        executor.submit(_upsert_group, container, pk, list(docs.values()))
+        for pk, docs in groups.values()
+    ]
+    errors = [future.exception() for future in futures if future.exception()]
+    if errors:
+        raise errors[0]
+    return len(groups)
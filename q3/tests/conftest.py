@@ -0,0 +1,5 @@
+import os
+import sys
+
+# function_app and the CLI import the shared modules by their bare names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
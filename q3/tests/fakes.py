@@ -0,0 +1,171 @@
+"""In-memory stand-ins for the blob and Cosmos clients the indexer uses."""
+import hashlib
+import itertools
+import threading
+from azure.core.exceptions import ResourceNotFoundError
+from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
+
+ACCOUNT_URL = "https://devaccount.blob.core.windows.net"
+_etags = itertools.count(1)
+
+
+class FakeDownload:
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+
+    def readall(self):
+        return self.data
+
+    def chunks(self):
+        return (self.data[i:i + self.chunk_size] for i in range(0, len(self.data), self.chunk_size))
+
+
+class FakeProperties:
+    def __init__(self, data, content_type, etag):
+        self.size = len(data)
+        self.etag = etag
+        self.content_settings = type("ContentSettings", (), {
+            "content_type": content_type,
+            "content_md5": bytearray(hashlib.md5(data).digest())
+        })
+
+
+class FakeBlobClient:
+    def __init__(self, service, container, name):
+        self.service = service
+        self.key = (container, name)
+        self.url = f"{ACCOUNT_URL}/{container}/{name}"
+
+    def _blob(self):
+        if self.key not in self.service.blobs:
+            raise ResourceNotFoundError("BlobNotFound")
+        return self.service.blobs[self.key]
+
+    def get_blob_properties(self):
+        self.service.record("properties", self.key[1])
+        if self.key[1] in self.service.fail_reads:
+            raise Exception("ServerBusy")
+        return FakeProperties(*self._blob())
+
+    def download_blob(self, offset=None, length=None):
+        data = self._blob()[0]
+        self.service.record("download", self.key[1], offset, length)
+        if offset is not None:
+            data = data[offset:offset + length]
+        return FakeDownload(data, self.service.chunk_size)
+
+
+class FakeBlobItem:
+    def __init__(self, name, etag):
+        self.name = name
+        self.etag = etag
+
+
+class FakePages:
+    """ItemPaged.by_page: an iterator of pages with a continuation_token."""
+
+    def __init__(self, names, page_size, continuation_token):
+        self.names = names
+        self.page_size = page_size
+        self.position = int(continuation_token or 0)
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= len(self.names):
+            raise StopIteration
+        page = self.names[self.position:self.position + self.page_size]
+        self.position += len(page)
+        self.continuation_token = str(self.position) if self.position < len(self.names) else None
+        return iter(page)
+
+
+class FakeContainerClient:
+    def __init__(self, service, name):
+        self.service = service
+        self.name = name
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self.service, self.name, blob)
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None):
+        items = [
+            FakeBlobItem(name, etag)
+            for (container, name), (_, _, etag) in sorted(self.service.blobs.items())
+            if container == self.name and name.startswith(name_starts_with or "")
+        ]
+        return type("ItemPaged", (), {
+            "by_page": lambda _, continuation_token=None: FakePages(items, results_per_page, continuation_token)
+        })()
+
+
+class FakeBlobService:
+    def __init__(self, chunk_size=7):
+        self.blobs = {}
+        self.calls = []
+        self.chunk_size = chunk_size
+        # Blob names whose reads raise, like a transient service error
+        self.fail_reads = set()
+        self._lock = threading.Lock()
+
+    def record(self, *call):
+        with self._lock:
+            self.calls.append(call)
+
+    def put(self, container, name, data, content_type="text/plain"):
+        self.blobs[(container, name)] = (data, content_type, f'"0x{next(_etags):X}"')
+        return self.blobs[(container, name)][2]
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(self, container, blob)
+
+    def get_container_client(self, name):
+        return FakeContainerClient(self, name)
+
+    def list_containers(self):
+        return [type("ContainerProperties", (), {"name": name}) for name in sorted({c for c, _ in self.blobs})]
+
+
+class FakeCosmosContainer:
+    def __init__(self, partition_key_path="/id"):
+        self.partition_key_path = partition_key_path
+        self.docs = {}
+        self.calls = []
+        self.fail_batches = False
+        self.fail_ids = set()
+        self._lock = threading.Lock()
+
+    def _record(self, *call):
+        with self._lock:
+            self.calls.append(call)
+
+    def read(self):
+        return {"partitionKey": {"paths": [self.partition_key_path]}}
+
+    def read_item(self, item, partition_key):
+        self._record("read_item", item)
+        if item not in self.docs:
+            raise CosmosResourceNotFoundError(message="NotFound")
+        return self.docs[item]
+
+    def upsert_item(self, document):
+        self._record("upsert_item", document["id"])
+        if document["id"] in self.fail_ids:
+            raise CosmosHttpResponseError(status_code=503, message="ServiceUnavailable")
+        with self._lock:
+            self.docs[document["id"]] = document
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        self._record("execute_item_batch", partition_key, len(batch_operations))
+        if self.fail_batches:
+            raise CosmosHttpResponseError(status_code=413, message="RequestEntityTooLarge")
+        with self._lock:
+            for _, (document,) in batch_operations:
+                self.docs[document["id"]] = document
+        return [{"statusCode": 200}] * len(batch_operations)
+
+    def call_names(self):
+        return [call[0] for call in self.calls]
@@ -0,0 +1,145 @@
+import json
+import pytest
+import backfill
+import indexer
+from indexer import parse_blob_url
+from fakes import FakeBlobService, FakeCosmosContainer
+
+
+@pytest.mark.parametrize("blob_url, expected", [
+    ("https://acct.blob.core.windows.net/docs/2025/notes.md", ("docs", "2025/notes.md")),
+    ("https://acct.blob.core.windows.net/docs/my%20notes%23v2.md", ("docs", "my notes#v2.md")),
+    ("http://127.0.0.1:10000/devstoreaccount1/docs/a/b.txt", ("docs", "a/b.txt")),
+    ("http://localhost:10000/devstoreaccount1/docs/b.txt", ("docs", "b.txt")),
+    ("http://azurite:10000/devstoreaccount1/docs/b.txt", ("docs", "b.txt")),
+])
+def test_parse_blob_url(blob_url, expected):
+    assert parse_blob_url(blob_url) == expected
+
+
+class FlakyContainer(FakeCosmosContainer):
+    """Stops accepting writes once it holds fail_after documents."""
+
+    fail_after = None
+
+    def execute_item_batch(self, batch_operations, partition_key):
+        if self.fail_after is not None and len(self.docs) >= self.fail_after:
+            raise Exception("ServiceUnavailable")
+        return super().execute_item_batch(batch_operations, partition_key)
+
+    def upsert_item(self, document):
+        if self.fail_after is not None and len(self.docs) >= self.fail_after:
+            raise Exception("ServiceUnavailable")
+        super().upsert_item(document)
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    service = FakeBlobService()
+    for i in range(25):
+        service.put("docs", f"d{i:02d}.txt", f"# Doc {i}\nsome words".encode())
+    for i in range(5):
+        service.put("logs", f"l{i}.log", b"one two three")
+    container = FlakyContainer("/container")
+    monkeypatch.setattr(indexer, "_blob_service", service)
+    monkeypatch.setattr(indexer, "_metadata_container", container)
+    monkeypatch.setattr(indexer, "_partition_key_paths", None)
+    monkeypatch.setenv("COSMOS_URL", "https://cosmos.example")
+    return service, container
+
+
+def run(tmp_path, *args):
+    return backfill.main([
+        "--page-size", "10", "--concurrency", "4", "--settings", "",
+        "--checkpoint", str(tmp_path / "checkpoint.json"), *args
+    ])
+
+
+def properties_calls(service):
+    return sum(1 for call in service.calls if call[0] == "properties")
+
+
+def test_interrupted_backfill_resumes_after_the_last_saved_page(store, tmp_path):
+    service, container = store
+    container.fail_after = 20
+    with pytest.raises(Exception, match="ServiceUnavailable"):
+        run(tmp_path)
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert checkpoint["containers"]["docs"] == {"continuation": "20", "done": False, "failed": []}
+
+    container.fail_after = None
+    service.calls.clear()
+    assert run(tmp_path) == 0
+    assert len(container.docs) == 30
+    # Only the third page of docs and the logs container were listed again
+    assert properties_calls(service) == 5 + 5
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert all(state["done"] for state in checkpoint["containers"].values())
+
+
+def test_rerun_skips_unchanged_blobs(store, tmp_path):
+    service, container = store
+    assert run(tmp_path) == 0
+    service.put("logs", "l3.log", b"now four words here")
+    service.calls.clear()
+    container.calls.clear()
+
+    assert run(tmp_path, "--reset") == 0
+    # Listed ETags match the documents: only the changed blob is read
+    assert properties_calls(service) == 1
+    assert container.docs["l3.log"]["wordCount"] == 4
+    assert run(tmp_path) == 0
+
+
+def test_checkpoint_is_tied_to_the_prefix(store, tmp_path):
+    assert run(tmp_path, "--prefix", "d0") == 0
+    with pytest.raises(Exception, match="use --reset"):
+        run(tmp_path, "--prefix", "d1")
+
+
+def test_dry_run_writes_only_the_output_file(store, tmp_path):
+    service, container = store
+    output = tmp_path / "documents.jsonl"
+    assert run(tmp_path, "--dry-run", "--containers", "logs", "--output", str(output)) == 0
+    assert len(output.read_text().splitlines()) == 5
+    assert container.docs == {}
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_failed_blobs_are_retried_on_the_next_run(store, tmp_path):
+    service, container = store
+    service.fail_reads = {"d03.txt", "l2.log"}
+    assert run(tmp_path) == 1
+    assert len(container.docs) == 28
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert checkpoint["containers"]["docs"] == {"continuation": None, "done": True, "failed": ["d03.txt"]}
+
+    # Still failing: kept for the run after
+    service.fail_reads = {"l2.log"}
+    service.calls.clear()
+    assert run(tmp_path) == 1
+    assert sorted(call[1] for call in service.calls if call[0] == "properties") == ["d03.txt", "l2.log"]
+    assert container.docs["d03.txt"]["title"] == "Doc 3"
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert checkpoint["containers"]["logs"]["failed"] == ["l2.log"]
+
+    service.fail_reads = set()
+    assert run(tmp_path) == 0
+    assert len(container.docs) == 30
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert all(state["failed"] == [] for state in checkpoint["containers"].values())
+
+
+def test_blobs_deleted_after_listing_are_not_failures(store, tmp_path):
+    service, container = store
+    real_get = service.get_blob_client
+
+    # Listed, then deleted before it is read
+    def missing_l2(container, blob):
+        client = real_get(container, blob)
+        if blob == "l2.log":
+            service.blobs.pop(client.key, None)
+        return client
+    service.get_blob_client = missing_l2
+    assert run(tmp_path, "--containers", "logs") == 0
+    assert len(container.docs) == 4
@@ -0,0 +1,116 @@
+import io
+import json
+import os
+import pytest
+import extractors
+import indexer
+from extractors import extract_csv, extract_image, extract_json, extract_pdf, find_extractor
+from fakes import FakeBlobService
+
+
+@pytest.fixture
+def image():
+    return pytest.importorskip("PIL.Image")
+
+
+def encode(image, size, image_format, mode="RGB", **options):
+    out = io.BytesIO()
+    image.new(mode, size).save(out, image_format, **options)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("image_format, expected, mode, options", [
+    ("PNG", "png", "RGBA", {}),
+    ("GIF", "gif", "RGB", {}),
+    ("BMP", "bmp", "RGB", {}),
+    # Progressive, and the frame header comes after a 30 kB EXIF segment
+    ("JPEG", "jpeg", "RGB", {"progressive": True, "exif": b"Exif\x00\x00" + os.urandom(30000)}),
+    ("WEBP", "webp", "RGB", {"lossless": True}),
+    ("WEBP", "webp", "RGB", {"quality": 80}),
+    ("WEBP", "webp", "RGBA", {"quality": 80, "exif": b"Exif\x00\x00abc"}),
+])
+def test_image_size_from_header_bytes(image, image_format, expected, mode, options):
+    data = encode(image, (1234, 567), image_format, mode, **options)
+    fields = extract_image(data[:extractors.IMAGE_HEADER_BYTES])
+    assert fields == {"imageFormat": expected, "width": 1234, "height": 567}
+
+
+def test_image_header_too_short_or_unknown():
+    assert extract_image(b"\xff\xd8\xff\xe1\x00\x10Exif") == {"imageFormat": "jpeg"}
+    assert extract_image(b"not an image") == {"imageFormat": None}
+
+
+def test_pdf_version_pages_and_page_size():
+    pdf = (b"%PDF-1.7\n1 0 obj << /Linearized 1 /L 1234 /N 12 /T 999 >> endobj\n"
+           b"3 0 obj << /Type /Page /MediaBox [0 0 612.5 792] >> endobj")
+    assert extract_pdf(pdf) == {"pdfVersion": "1.7", "pageCount": 12, "width": 612.5, "height": 792.0}
+    assert extract_pdf(b"%PDF-1.4\nno linearization dictionary") == {"pdfVersion": "1.4"}
+
+
+def test_csv_rows_are_records_across_chunks():
+    data = 'id,name,notes\n1,"a","multi\nline"\n2,b,c\n\n3,"x,y",z\n'.encode()
+    chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+    assert extract_csv(chunks) == {"columns": ["id", "name", "notes"], "columnCount": 3, "rowCount": 3}
+
+
+def test_csv_dialect_is_sniffed():
+    fields = extract_csv([b"\xef\xbb\xbfa;b\n1;2\n3;4"])
+    assert fields == {"columns": ["a", "b"], "columnCount": 2, "rowCount": 2}
+    assert extract_csv([]) == {"columns": None, "columnCount": 0, "rowCount": 0}
+
+
+def test_json_root_types():
+    assert extract_json(json.dumps({"title": "T", "a": 1}).encode()) == {
+        "jsonType": "object", "keyCount": 2, "keys": ["title", "a"], "title": "T"
+    }
+    assert extract_json(b" [1, 2, 3]") == {"jsonType": "array", "itemCount": 3}
+    assert extract_json(b"42") == {"jsonType": "value"}
+    assert extract_json(b"") == {"jsonType": None}
+
+
+def test_truncated_json_keeps_the_root_type():
+    assert extract_json(b'{"a": [1, 2') == {"jsonType": "object"}
+
+
+@pytest.mark.parametrize("content_type, blob_name, expected", [
+    ("text/plain", "a.dat", "text"),
+    ("text/plain; charset=utf-8", "a", "text"),
+    ("text/html", "page", "text"),
+    ("text/csv", "a", "csv"),
+    ("application/json", "a.txt", "json"),
+    ("application/octet-stream", "README.MD", "markdown"),
+    ("application/pdf", "doc", "pdf"),
+    ("image/heic", "photo", "image"),
+    (None, "x.tsv", "csv"),
+    (None, "x.bin", None),
+])
+def test_find_extractor(content_type, blob_name, expected):
+    extractor = find_extractor(content_type, blob_name)
+    assert (extractor and extractor.name) == expected
+
+
+def test_header_extractors_make_one_ranged_read(image):
+    service = FakeBlobService()
+    data = encode(image, (4000, 3000), "PNG") + os.urandom(200000)
+    service.put("docs", "big.png", data, "image/png")
+    service.put("docs", "empty.json", b"", "application/json")
+    png = service.get_blob_client("docs", "big.png")
+
+    assert indexer.extract(find_extractor("image/png", "big.png"), png, len(data)) == {
+        "imageFormat": "png", "width": 4000, "height": 3000
+    }
+    assert service.calls == [("download", "big.png", 0, extractors.IMAGE_HEADER_BYTES)]
+
+    # Nothing to read: no request at all
+    service.calls.clear()
+    empty = service.get_blob_client("docs", "empty.json")
+    assert indexer.extract(find_extractor("application/json", "empty.json"), empty, 0) == {"jsonType": None}
+    assert service.calls == []
+
+
+def test_streaming_extractors_read_the_whole_blob_in_chunks():
+    service = FakeBlobService(chunk_size=5)
+    service.put("docs", "notes.md", "# Notes\nsome words here".encode(), "application/octet-stream")
+    blob = service.get_blob_client("docs", "notes.md")
+    assert indexer.extract(find_extractor(None, "notes.md"), blob, 23) == {"title": "Notes", "wordCount": 5}
+    assert service.calls == [("download", "notes.md", None, None)]
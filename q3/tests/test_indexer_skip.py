@@ -0,0 +1,99 @@
+import pytest
+import indexer
+from fakes import ACCOUNT_URL, FakeBlobService, FakeCosmosContainer
+
+
+@pytest.fixture
+def blob_service(monkeypatch):
+    service = FakeBlobService()
+    monkeypatch.setattr(indexer, "_blob_service", service)
+    return service
+
+
+@pytest.fixture
+def container(monkeypatch):
+    container = FakeCosmosContainer("/container")
+    monkeypatch.setattr(indexer, "_metadata_container", container)
+    monkeypatch.setattr(indexer, "_partition_key_paths", None)
+    return container
+
+
+URL = f"{ACCOUNT_URL}/docs/notes.md"
+
+
+def index(container, **kwargs):
+    document = indexer.build_document(URL, **kwargs)
+    if document:
+        container.docs[document["id"]] = document
+    return document
+
+
+def downloads(blob_service):
+    return [call for call in blob_service.calls if call[0] == "download"]
+
+
+def test_new_blob_is_indexed(blob_service, container):
+    etag = blob_service.put("docs", "notes.md", b"# Notes\nfirst version")
+    document = index(container, etag=etag)
+    assert document["etag"] == etag.strip('"')
+    assert document["contentMD5"] and document["size"] == 21
+    assert document["title"] == "Notes"
+
+
+def test_event_with_the_indexed_etag_skips_even_the_properties_call(blob_service, container):
+    etag = blob_service.put("docs", "notes.md", b"# Notes")
+    index(container)
+    blob_service.calls.clear()
+
+    # Event Grid sends the ETag without quotes
+    assert index(container, etag=etag.strip('"')) is None
+    assert blob_service.calls == []
+
+
+def test_unchanged_blob_is_skipped_after_the_properties_call(blob_service, container):
+    blob_service.put("docs", "notes.md", b"# Notes")
+    index(container)
+    blob_service.calls.clear()
+
+    assert index(container) is None
+    assert [call[0] for call in blob_service.calls] == ["properties"]
+
+
+def test_overwrite_with_the_same_bytes_is_skipped(blob_service, container):
+    blob_service.put("docs", "notes.md", b"# Notes")
+    index(container)
+    etag = blob_service.put("docs", "notes.md", b"# Notes")
+    blob_service.calls.clear()
+
+    assert index(container, etag=etag) is None
+    assert downloads(blob_service) == []
+
+
+def test_changed_content_is_reindexed(blob_service, container):
+    blob_service.put("docs", "notes.md", b"# Notes")
+    index(container)
+    etag = blob_service.put("docs", "notes.md", b"# Changed notes")
+
+    document = index(container, etag=etag)
+    assert document["title"] == "Changed notes"
+    assert document["etag"] == etag.strip('"')
+
+
+def test_force_reindexes_without_reading_the_document(blob_service, container):
+    etag = blob_service.put("docs", "notes.md", b"# Notes")
+    index(container)
+    container.calls.clear()
+
+    assert index(container, etag=etag, force=True)["title"] == "Notes"
+    assert container.calls == []
+    assert len(downloads(blob_service)) == 2
+
+
+def test_failed_read_of_the_existing_document_still_indexes(blob_service, container, monkeypatch):
+    etag = blob_service.put("docs", "notes.md", b"# Notes")
+    index(container)
+
+    def unavailable(item, partition_key):
+        raise Exception("ServiceUnavailable")
+    monkeypatch.setattr(container, "read_item", unavailable)
+    assert index(container, etag=etag)["title"] == "Notes"
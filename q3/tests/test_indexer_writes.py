@@ -0,0 +1,151 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import azure.functions as func
+import pytest
+import function_app
+import indexer
+from fakes import ACCOUNT_URL, FakeBlobService, FakeCosmosContainer
+
+
+@pytest.fixture
+def blob_service(monkeypatch):
+    service = FakeBlobService()
+    monkeypatch.setattr(indexer, "_blob_service", service)
+    return service
+
+
+@pytest.fixture
+def use_container(monkeypatch):
+    def use(partition_key_path):
+        container = FakeCosmosContainer(partition_key_path)
+        monkeypatch.setattr(indexer, "_metadata_container", container)
+        monkeypatch.setattr(indexer, "_partition_key_paths", None)
+        return container
+    return use
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def documents(*keys):
+    return [{"id": name, "container": container, "n": n} for n, (container, name) in enumerate(keys)]
+
+
+def test_documents_sharing_a_partition_go_out_as_batches(use_container, pool, monkeypatch):
+    container = use_container("/container")
+    monkeypatch.setattr(indexer, "COSMOS_BATCH_SIZE", 3)
+    docs = documents(*[("c0", f"f{i}") for i in range(7)], ("c1", "only"))
+
+    assert indexer.upsert_documents(docs, pool) == 2
+    batches = sorted(call[1:] for call in container.calls if call[0] == "execute_item_batch")
+    assert batches == [("c0", 1), ("c0", 3), ("c0", 3)]
+    # A group of one is a plain upsert
+    assert ("upsert_item", "only") in container.calls
+    assert len(container.docs) == 8
+
+
+def test_partitioning_by_id_means_plain_upserts(use_container, pool):
+    container = use_container("/id")
+    indexer.upsert_documents(documents(("c0", "a"), ("c0", "b")), pool)
+    assert sorted(container.calls) == [("upsert_item", "a"), ("upsert_item", "b")]
+
+
+def test_repeated_ids_are_written_once_last_one_wins(use_container, pool):
+    container = use_container("/container")
+    indexer.upsert_documents(documents(("c0", "a"), ("c0", "b"), ("c0", "a")), pool)
+    assert container.calls == [("execute_item_batch", "c0", 2)]
+    assert container.docs["a"]["n"] == 2
+
+
+def test_a_failed_batch_is_retried_one_by_one(use_container, pool):
+    container = use_container("/container")
+    container.fail_batches = True
+    indexer.upsert_documents(documents(("c0", "a"), ("c0", "b")), pool)
+    assert container.call_names() == ["execute_item_batch", "upsert_item", "upsert_item"]
+    assert set(container.docs) == {"a", "b"}
+
+
+def test_write_errors_are_raised_after_every_group_finished(use_container, pool):
+    container = use_container("/id")
+    container.fail_ids = {"a"}
+    with pytest.raises(Exception, match="ServiceUnavailable"):
+        indexer.upsert_documents(documents(("c0", "a"), ("c0", "b")), pool)
+    assert "b" in container.docs
+
+
+def event_batch(*events, method="POST", headers=None):
+    return func.HttpRequest(method, "/api/eventgrid/batch", body=json.dumps(list(events)).encode(), headers=headers or {})
+
+
+def blob_created(url, etag=None):
+    return {"eventType": "Microsoft.Storage.BlobCreated", "data": {"url": url, "eTag": etag}}
+
+
+def test_batch_endpoint_answers_both_handshakes():
+    response = function_app.EventGridBatch(event_batch(
+        {"eventType": "Microsoft.EventGrid.SubscriptionValidationEvent", "data": {"validationCode": "abc"}}
+    ))
+    assert json.loads(response.get_body()) == {"validationResponse": "abc"}
+
+    response = function_app.EventGridBatch(func.HttpRequest(
+        "OPTIONS", "/api/eventgrid/batch", body=b"", headers={"WebHook-Request-Origin": "eventgrid.azure.net"}
+    ))
+    assert response.status_code == 200
+    assert response.headers["WebHook-Allowed-Origin"] == "eventgrid.azure.net"
+
+
+def test_batch_endpoint_indexes_each_blob_once(blob_service, use_container):
+    container = use_container("/container")
+    for i in range(6):
+        blob_service.put(f"c{i % 2}", f"f{i}.txt", f"# F{i}\nsome words".encode())
+    events = [blob_created(f"{ACCOUNT_URL}/c{i % 2}/f{i}.txt") for i in range(6)]
+    events.append(blob_created(f"{ACCOUNT_URL}/c0/f0.txt"))
+
+    response = function_app.EventGridBatch(event_batch(*events))
+    assert response.status_code == 200
+    assert len(container.docs) == 6
+    assert container.docs["f4.txt"]["title"] == "F4"
+    assert sorted(call[1:] for call in container.calls if call[0] == "execute_item_batch") == [("c0", 3), ("c1", 3)]
+    assert [call for call in blob_service.calls if call[0] == "properties"].count(("properties", "f0.txt")) == 1
+
+
+def test_batch_endpoint_fails_so_event_grid_redelivers(blob_service, use_container):
+    use_container("/container")
+    blob_service.put("c0", "ok.txt", b"fine")
+    blob_service.put("c0", "busy.txt", b"fine")
+    blob_service.fail_reads = {"busy.txt"}
+    response = function_app.EventGridBatch(event_batch(
+        blob_created(f"{ACCOUNT_URL}/c0/ok.txt"), blob_created(f"{ACCOUNT_URL}/c0/busy.txt")
+    ))
+    assert response.status_code == 500
+    assert b"1 blobs failed" in response.get_body()
+
+
+def test_batch_endpoint_indexes_only_created_blobs(blob_service, use_container):
+    container = use_container("/container")
+    blob_service.put("c0", "new.txt", b"# New")
+    response = function_app.EventGridBatch(event_batch(
+        {"eventType": "Microsoft.Storage.BlobDeleted", "data": {"url": f"{ACCOUNT_URL}/c0/gone.txt"}},
+        {"type": "Microsoft.Storage.BlobCreated", "data": {"url": f"{ACCOUNT_URL}/c0/new.txt"}},
+        # Deleted after its BlobCreated event was sent
+        blob_created(f"{ACCOUNT_URL}/c0/deleted.txt"),
+    ))
+    assert response.status_code == 200
+    assert list(container.docs) == ["new.txt"]
+    assert ("properties", "gone.txt") not in blob_service.calls
+
+
+def test_conflicting_event_etags_fall_back_to_the_blobs_own(blob_service, use_container):
+    container = use_container("/container")
+    old_etag = blob_service.put("c0", "f.txt", b"# Old")
+    function_app.EventGridBatch(event_batch(blob_created(f"{ACCOUNT_URL}/c0/f.txt", old_etag)))
+    new_etag = blob_service.put("c0", "f.txt", b"# New")
+
+    # The newer event comes first: trusting the last one would skip the blob
+    function_app.EventGridBatch(event_batch(
+        blob_created(f"{ACCOUNT_URL}/c0/f.txt", new_etag), blob_created(f"{ACCOUNT_URL}/c0/f.txt", old_etag)
+    ))
+    assert container.docs["f.txt"]["title"] == "New"
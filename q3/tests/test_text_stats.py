@@ -0,0 +1,71 @@
+import random
+import pytest
+from text_stats import TextStats, analyze_chunks
+
+
+def whole_text(data):
+    """What the indexer computed before streaming, on the whole blob at once."""
+    text = data.decode("utf-8", errors="ignore")
+    title = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("# "):
+            title = stripped[2:].strip()
+            break
+    if not title:
+        title = text.splitlines()[0].strip() if text else "(empty file)"
+    return title, len(text.split())
+
+
+def split_at(data, cuts):
+    cuts = sorted(cuts)
+    return [data[a:b] for a, b in zip([0] + cuts, cuts + [len(data)])]
+
+
+PIECES = ["word", "é", "日本語", "  ", "\n", "\r\n", "\r", "# ", "#", "Title", "　", "\x1c", " ", "\t", "🙂", "\n# Head ing\n"]
+
+
+def test_any_chunking_matches_the_whole_text():
+    rng = random.Random(1)
+    for _ in range(3000):
+        data = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 40))).encode()
+        if data and rng.random() < 0.2:
+            # Invalid UTF-8 is dropped, as with errors="ignore"
+            k = rng.randrange(len(data))
+            data = data[:k] + bytes([rng.choice([0xff, 0xe6, 0x80])]) + data[k:]
+        cuts = rng.sample(range(len(data) + 1), min(len(data) + 1, rng.randint(0, 6)))
+        assert analyze_chunks(split_at(data, cuts), title_scan_chars=10**9) == whole_text(data), data
+
+
+@pytest.mark.parametrize("cut", range(1, 12))
+def test_words_and_characters_split_across_chunks(cut):
+    data = "# Tïtle\nnaïve words".encode()
+    assert analyze_chunks(split_at(data, [cut])) == ("Tïtle", 4)
+
+
+def test_every_byte_its_own_chunk():
+    data = "intro\n# 日本語 heading\nthree more words".encode()
+    assert analyze_chunks(data[i:i + 1] for i in range(len(data))) == ("日本語 heading", 7)
+
+
+def test_title_is_only_searched_in_the_leading_characters():
+    late = b"intro line\n" + b"a " * 100 + b"\n# late\n"
+    assert analyze_chunks([late], title_scan_chars=50) == ("intro line", 104)
+    assert analyze_chunks([b"# early\n" + b"a " * 100], title_scan_chars=9) == ("early", 102)
+    # A heading line cut off by the limit isn't one
+    assert analyze_chunks([b"# early\n" + b"a " * 100], title_scan_chars=5) == ("# ear", 102)
+    assert analyze_chunks([b"x" * 100], title_scan_chars=10) == ("x" * 10, 1)
+
+
+def test_empty_and_whitespace_only_text():
+    assert analyze_chunks([]) == ("(empty file)", 0)
+    assert analyze_chunks([b"", b""]) == ("(empty file)", 0)
+    assert analyze_chunks([b"  \n", b"\t"]) == ("", 0)
+
+
+def test_the_head_is_dropped_once_closed():
+    stats = TextStats(title_scan_chars=16)
+    for _ in range(1000):
+        stats.feed(b"lorem ipsum dolor sit amet ")
+    assert stats.close() == ("lorem ipsum dolo", 5000)
+    assert stats.chars == 27000
@@ -0,0 +1,88 @@
+"""
+Title and word count of a text blob, computed chunk by chunk.
+
+Bytes are decoded with an incremental UTF-8 decoder, so a character split
+across two chunks is decoded once it is complete, and a word split across
+two chunks is counted once. Only the first TITLE_SCAN_CHARS characters
+are kept for the title; memory stays the same whatever the blob size.
+"""
+import codecs
+import os
+
+# The title is the first "# " heading in this many leading characters,
+# otherwise the first line
+TITLE_SCAN_CHARS = int(os.getenv("TITLE_SCAN_CHARS", "65536"))
+
+
+class TextStats:
+    def __init__(self, title_scan_chars=TITLE_SCAN_CHARS):
+        # Same handling of invalid bytes as bytes.decode("utf-8", errors="ignore")
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._title_scan_chars = title_scan_chars
+        self._head = []
+        self._head_chars = 0
+        self._in_word = False
+        self.chars = 0
+        self.word_count = 0
+        self.title = None
+
+    def feed(self, data):
+        self._add(self._decoder.decode(data))
+
+    def close(self):
+        """Flush the decoder and settle the title. Returns (title, word_count)."""
+        self._add(self._decoder.decode(b"", final=True))
+        if self.title is None:
+            self.title = self._title_from_head(complete=True)
+        self._head = []
+        return self.title, self.word_count
+
+    def _add(self, text):
+        if not text:
+            return
+        self.chars += len(text)
+
+        words = len(text.split())
+        # A word running on from the previous chunk was counted there already
+        if self._in_word and not text[0].isspace():
+            words -= 1
+        self.word_count += words
+        self._in_word = not text[-1].isspace()
+
+        if self.title is None and self._head_chars < self._title_scan_chars:
+            part = text[:self._title_scan_chars - self._head_chars]
+            self._head.append(part)
+            self._head_chars += len(part)
+            self.title = self._heading()
+            if self.title is None and self._head_chars >= self._title_scan_chars:
+                self.title = self._title_from_head(complete=False)
+
+    def _lines(self, complete):
+        lines = "".join(self._head).splitlines(keepends=True)
+        # Unless the text ended, the last line may continue in the next chunk
+        if not complete and lines and lines[-1].splitlines() == [lines[-1]]:
+            lines.pop()
+        return lines
+
+    def _heading(self, complete=False):
+        for line in self._lines(complete):
+            stripped = line.strip()
+            if stripped.startswith("# "):
+                return stripped[2:].strip()
+        return None
+
+    def _title_from_head(self, complete):
+        title = self._heading(complete)
+        if title is not None:
+            return title
+        if not self._head_chars:
+            return "(empty file)"
+        return "".join(self._head).splitlines()[0].strip()
+
+
+def analyze_chunks(chunks, title_scan_chars=TITLE_SCAN_CHARS):
+    """(title, word_count) of a text given as an iterable of byte chunks."""
+    stats = TextStats(title_scan_chars)
+    for chunk in chunks:
+        stats.feed(chunk)
+    return stats.close()
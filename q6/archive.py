@@ -0,0 +1,295 @@
+"""
+SQL side of the Orders archive job: counting, exporting and deleting rows.
+
+Every function takes an open DB-API connection so one job can run on a
+single ODBC connection (opened with autocommit=True, transactions are
+explicit).
+"""
+import datetime
+import json
+import logging
+import time
+
+# Column names - change if your schema differs
+PK_COL = "Id"
+DATE_COL = "OrderDate"
+TABLE_NAME = "Orders"
+
+logger = logging.getLogger("TimerArchiveFunction")
+
+# Same output as json.dumps(row, default=str), without rebuilding the
+# encoder for every row
+_encoder = json.JSONEncoder(default=str)
+
+
+def count_to_archive(conn, cutoff_dt):
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT COUNT(1) FROM {TABLE_NAME} WHERE {DATE_COL} < ?", (cutoff_dt,))
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+
+
+def resolve_columns(description, first_row):
+    """
+    Column names and the indexes of datetime columns, resolved once per query.
+    Drivers that don't report a type (sqlite) are sniffed from the first row.
+    """
+    columns = [d[0] for d in description]
+    datetime_indexes = []
+    for idx, d in enumerate(description):
+        type_code = d[1]
+        if type_code is datetime.datetime or (
+            not isinstance(type_code, type) and isinstance(first_row[idx], datetime.datetime)
+        ):
+            datetime_indexes.append(idx)
+    return columns, datetime_indexes
+
+
+def resolve_column_types(description, first_row):
+    """
+    Column name -> (type, precision, scale) as declared by the driver
+    (pyodbc reports int, Decimal, datetime.datetime, ...). Drivers that
+    don't report a type (sqlite) are sniffed from the first row; a NULL
+    there gives type None.
+    """
+    column_types = {}
+    for idx, d in enumerate(description):
+        type_code = d[1]
+        if not isinstance(type_code, type):
+            type_code = type(first_row[idx]) if first_row[idx] is not None else None
+        column_types.setdefault(d[0], (type_code, d[4], d[5]))
+    return column_types
+
+
+def to_records(rows, columns, datetime_indexes):
+    if not datetime_indexes:
+        return [dict(zip(columns, row)) for row in rows]
+    records = []
+    for row in rows:
+        values = list(row)
+        for idx in datetime_indexes:
+            val = values[idx]
+            if val is not None:
+                values[idx] = val.isoformat()
+        records.append(dict(zip(columns, values)))
+    return records
+
+
+def encode_ndjson(records):
+    """One JSON object per line, encoded as a single bytes chunk."""
+    if not records:
+        return b""
+    return ("\n".join(map(_encoder.encode, records)) + "\n").encode("utf-8")
+
+
+def id_bounds(conn, cutoff_dt):
+    """(MIN, MAX) of PK_COL over the rows older than cutoff_dt."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT MIN({PK_COL}), MAX({PK_COL}) FROM {TABLE_NAME} WHERE {DATE_COL} < ?", (cutoff_dt,))
+        row = cur.fetchone()
+        return row[0], row[1]
+    finally:
+        cur.close()
+
+
+def split_id_range(min_id, max_id, parts):
+    """
+    Split min_id..max_id into up to parts (after, through] ranges of equal Id
+    span. The first range has no lower and the last no upper bound, so
+    together they cover every Id.
+    """
+    span = max_id - min_id + 1
+    parts = max(1, min(parts, span))
+    ranges = []
+    after = None
+    for i in range(1, parts + 1):
+        through = min_id - 1 + span * i // parts if i < parts else None
+        ranges.append((after, through))
+        after = through
+    return ranges
+
+
+def iter_record_batches(conn, cutoff_dt, batch_size=50000, fetch_size=5000, id_spool=None,
+                        iso_datetimes=True, page_ranges=None, start_after=None, end_id=None,
+                        metrics=None, column_types=None):
+    """
+    Yields lists of row dicts (one list per fetchmany call) for all rows
+    older than cutoff_dt with start_after < PK_COL <= end_id (either bound
+    may be None), keyset-paged by PK_COL.
+    If id_spool (an open text file) is given, the ids of yielded rows are
+    written to it. If page_ranges (a list) is given, the (first, last) PK
+    of every yielded page is appended to it, including a partial page when
+    the generator is closed early. Datetimes are turned into ISO strings
+    unless iso_datetimes is False. metrics (a metrics.JobMetrics) gets the
+    query/fetch latencies, round trips and row counts. If column_types (a
+    dict) is given, it is filled with resolve_column_types when the first
+    page arrives, before anything is yielded.
+    """
+    cursor = conn.cursor()
+    cursor.arraysize = fetch_size
+    columns = None
+    datetime_indexes = None
+    last_id = start_after
+    first_id = None
+    try:
+        while True:
+            conditions = [f"{DATE_COL} < ?"]
+            params = [batch_size, cutoff_dt]
+            if last_id is not None:
+                conditions.append(f"{PK_COL} > ?")
+                params.append(last_id)
+            if end_id is not None:
+                conditions.append(f"{PK_COL} <= ?")
+                params.append(end_id)
+            sql = f"""
+            SELECT TOP (?) {PK_COL}, *
+            FROM {TABLE_NAME}
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {PK_COL} ASC
+            """
+
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            if metrics is not None:
+                metrics.observe("sql.query", time.perf_counter() - started)
+                metrics.incr("sql.round_trips")
+            fetched = 0
+            while True:
+                started = time.perf_counter()
+                rows = cursor.fetchmany(fetch_size)
+                if metrics is not None:
+                    metrics.observe("sql.fetch", time.perf_counter() - started)
+                    metrics.incr("sql.round_trips")
+                if not rows:
+                    break
+                if columns is None:
+                    columns, datetime_indexes = resolve_columns(cursor.description, rows[0])
+                    if column_types is not None:
+                        column_types.update(resolve_column_types(cursor.description, rows[0]))
+                    if not iso_datetimes:
+                        datetime_indexes = []
+
+                fetched += len(rows)
+                # first column is PK_COL
+                if first_id is None:
+                    first_id = rows[0][0]
+                last_id = rows[-1][0]
+                if id_spool is not None:
+                    id_spool.write("\n".join(str(row[0]) for row in rows) + "\n")
+                started = time.perf_counter()
+                records = to_records(rows, columns, datetime_indexes)
+                if metrics is not None:
+                    metrics.observe("rows.convert", time.perf_counter() - started)
+                    metrics.incr("rows.exported", len(rows))
+                yield records
+
+            if page_ranges is not None and first_id is not None:
+                page_ranges.append((first_id, last_id))
+            first_id = None
+            if fetched < batch_size:
+                break
+    finally:
+        # Closed mid-page: everything up to last_id was handed out
+        if page_ranges is not None and first_id is not None:
+            page_ranges.append((first_id, last_id))
+        cursor.close()
+
+
+def _delete_batch(cur, batch, metrics=None):
+    placeholders = ",".join("?" for _ in batch)
+    delete_sql = f"DELETE FROM {TABLE_NAME} WHERE {PK_COL} IN ({placeholders})"
+    try:
+        started = time.perf_counter()
+        cur.execute("BEGIN TRAN")
+        cur.execute(delete_sql, batch)
+        deleted = cur.rowcount
+        cur.execute("COMMIT")
+        if metrics is not None:
+            metrics.observe("sql.delete", time.perf_counter() - started)
+            metrics.incr("sql.round_trips", 3)
+            metrics.incr("rows.deleted", deleted)
+        return deleted
+    except Exception:
+        cur.execute("ROLLBACK")
+        logger.exception("Error deleting batch - rolled back")
+        raise
+
+
+def delete_ids_from_file_in_batches(conn, temp_id_file_path, delete_batch_size=1000, metrics=None):
+    """
+    Read IDs from file and delete them from SQL in batches inside transactions.
+    Returns total deleted count.
+    """
+    cur = conn.cursor()
+    total_deleted = 0
+    try:
+        batch = []
+        with open(temp_id_file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                idstr = line.strip()
+                if not idstr:
+                    continue
+                batch.append(idstr)
+                if len(batch) >= delete_batch_size:
+                    total_deleted += _delete_batch(cur, batch, metrics)
+                    batch = []
+
+        if batch:
+            total_deleted += _delete_batch(cur, batch, metrics)
+
+        return total_deleted
+    finally:
+        cur.close()
+
+
+def delete_range_in_batches(conn, first_id, last_id, cutoff_dt, delete_batch_size=4000, metrics=None):
+    """
+    Delete the rows of one exported page, i.e. PK_COL in [first_id, last_id]
+    and older than cutoff_dt, with repeated DELETE TOP (n). Keeping n below
+    SQL Server's 5000-lock escalation threshold keeps each statement on row
+    locks. Each statement commits on its own (autocommit connection).
+    Returns the number of rows deleted.
+    """
+    sql = f"""
+    DELETE TOP (?) FROM {TABLE_NAME}
+    WHERE {PK_COL} >= ? AND {PK_COL} <= ? AND {DATE_COL} < ?
+    """
+    cur = conn.cursor()
+    total_deleted = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            cur.execute(sql, (delete_batch_size, first_id, last_id, cutoff_dt))
+            deleted = cur.rowcount
+            elapsed = time.perf_counter() - started
+            total_deleted += deleted
+            if metrics is not None:
+                metrics.observe("sql.delete", elapsed)
+                metrics.incr("sql.round_trips")
+                metrics.incr("rows.deleted", deleted)
+            logger.debug(
+                f"Deleted {deleted} rows in ({first_id}..{last_id}) in {elapsed:.3f}s "
+                f"({deleted / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+            if deleted < delete_batch_size:
+                return total_deleted
+    finally:
+        cur.close()
+
+
+def delete_ranges_in_batches(conn, page_ranges, cutoff_dt, delete_batch_size=4000, metrics=None):
+    """Delete every exported page range. Returns total deleted count."""
+    total_deleted = 0
+    for first_id, last_id in page_ranges:
+        started = time.perf_counter()
+        deleted = delete_range_in_batches(conn, first_id, last_id, cutoff_dt, delete_batch_size, metrics)
+        elapsed = time.perf_counter() - started
+        total_deleted += deleted
+        logger.info(
+            f"Deleted range {first_id}..{last_id}: {deleted} rows in {elapsed:.2f}s "
+            f"({deleted / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+    return total_deleted
@@ -0,0 +1,284 @@
+"""
+Benchmarks against a SQLite stand-in for the Orders table.
+
+export: compares the original per-row export loop with
+archive.iter_record_batches + encode_ndjson. Only the SQL -> NDJSON + id
+spool path is measured; the output goes to a discarding sink.
+
+    python benchmark.py export --rows 200000
+
+pipeline: runs the whole archive job (function_app.run_archive_job: export,
+upload, manifest, delete) for each row count against Blob Storage,
+by default the Azurite emulator (azurite --silent), and prints the per-phase
+metrics. Job settings come from the same environment variables as the
+function (ARCHIVE_FORMAT, ARCHIVE_MAX_SQL_CONNECTIONS, DELETE_MODE, ...).
+
+    python benchmark.py pipeline --rows 10000 1000000 10000000 --output results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import archive
+from archive import DATE_COL, PK_COL, TABLE_NAME
+
+
+class TSqlCursor:
+    """Rewrites the T-SQL 'SELECT/DELETE TOP (?)' used by archive.py into LIMIT."""
+    TOP = re.compile(r"SELECT\s+TOP\s*\(\?\)", re.IGNORECASE)
+    DELETE_TOP = re.compile(r"DELETE\s+TOP\s*\(\?\)\s+FROM\s+(\w+)\s+WHERE\s+(.*)", re.IGNORECASE | re.DOTALL)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, value):
+        self._cursor.arraysize = value
+
+    def execute(self, sql, params=()):
+        if sql.strip().upper() == "BEGIN TRAN":
+            sql = "BEGIN"
+        delete_top = self.DELETE_TOP.search(sql)
+        if delete_top:
+            table, where = delete_top.groups()
+            sql = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)"
+            params = tuple(params[1:]) + (params[0],)
+        elif self.TOP.search(sql):
+            sql = self.TOP.sub("SELECT", sql) + " LIMIT ?"
+            params = tuple(params[1:]) + (params[0],)
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TSqlConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return TSqlCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+AZURITE_CONNECTION_STRING = "UseDevelopmentStorage=true"
+
+
+def connect_orders(path):
+    """Like the job's ODBC connection: autocommit, explicit transactions."""
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=60)
+    conn.isolation_level = None
+    return TSqlConnection(conn)
+
+
+def create_orders(path, rows):
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.execute(f"""
+        CREATE TABLE {TABLE_NAME} (
+            {PK_COL} INTEGER PRIMARY KEY,
+            CustomerId INTEGER,
+            {DATE_COL} TIMESTAMP,
+            Status TEXT,
+            Amount REAL,
+            Notes TEXT
+        )""")
+    base = datetime.datetime(2024, 1, 1)
+    conn.executemany(
+        f"INSERT INTO {TABLE_NAME} VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (i, i % 997, base + datetime.timedelta(seconds=i), "Shipped", i * 1.25, "order notes " * 4)
+            for i in range(1, rows + 1)
+        )
+    )
+    conn.commit()
+    conn.close()
+    return connect_orders(path)
+
+
+def legacy_export(conn, temp_id_file_path, cutoff_dt, batch_size=1000):
+    """The original q6 rows_generator_and_write_ids loop, on a given connection."""
+    cursor = conn.cursor()
+    last_id = None
+    while True:
+        if last_id is None:
+            sql = f"SELECT TOP (?) {PK_COL}, * FROM {TABLE_NAME} WHERE {DATE_COL} < ? ORDER BY {PK_COL} ASC"
+            params = (batch_size, cutoff_dt)
+        else:
+            sql = f"SELECT TOP (?) {PK_COL}, * FROM {TABLE_NAME} WHERE {DATE_COL} < ? AND {PK_COL} > ? ORDER BY {PK_COL} ASC"
+            params = (batch_size, cutoff_dt, last_id)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            row_dict = {}
+            desc = [d[0] for d in cursor.description]
+            for idx, col in enumerate(desc):
+                val = row[idx]
+                if isinstance(val, datetime.datetime):
+                    val = val.isoformat()
+                row_dict[col] = val
+            with open(temp_id_file_path, "a", encoding="utf-8") as fids:
+                fids.write(str(row_dict[PK_COL]) + "\n")
+            yield (json.dumps(row_dict, default=str) + "\n").encode("utf-8")
+        last_id = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+    cursor.close()
+
+
+def new_export(conn, temp_id_file_path, cutoff_dt, batch_size, fetch_size):
+    with open(temp_id_file_path, "w", encoding="utf-8", buffering=1024 * 1024) as id_spool:
+        for records in archive.iter_record_batches(conn, cutoff_dt, batch_size, fetch_size, id_spool):
+            yield archive.encode_ndjson(records)
+
+
+def drain(chunks):
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+    return total
+
+
+def run_export(args):
+    workdir = tempfile.mkdtemp(prefix="q6_bench_")
+    conn = create_orders(os.path.join(workdir, "orders.db"), args.rows)
+    cutoff = datetime.datetime(2100, 1, 1)
+    ids_path = os.path.join(workdir, "ids.txt")
+
+    runs = [
+        ("legacy", lambda: legacy_export(conn, ids_path, cutoff)),
+        ("batched", lambda: new_export(conn, ids_path, cutoff, args.batch_size, args.fetch_size)),
+    ]
+    baseline = None
+    for name, run in runs:
+        if os.path.exists(ids_path):
+            os.remove(ids_path)
+        started = time.perf_counter()
+        size = drain(run())
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"{name:<8} {args.rows:>9} rows  {size / 1e6:8.1f} MB  {elapsed:7.2f}s  "
+              f"{args.rows / elapsed:10.0f} rows/s  x{baseline / elapsed:.1f}")
+    conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def pipeline_job(function_app, container_client, rows):
+    """Run one archive job over a fresh table of rows rows. Returns the metrics summary."""
+    from metrics import JobMetrics
+
+    workdir = tempfile.mkdtemp(prefix="q6_bench_")
+    db_path = os.path.join(workdir, "orders.db")
+    try:
+        create_orders(db_path, rows).close()
+        # Parallel export workers open their own connections
+        function_app.connect_sql = lambda: connect_orders(db_path)
+        metrics = JobMetrics()
+        conn = connect_orders(db_path)
+        try:
+            checkpoint = function_app.run_archive_job(conn, container_client, metrics=metrics)
+            left = count_rows(conn)
+        finally:
+            conn.close()
+        return metrics.summary(
+            rows=rows,
+            state=checkpoint.state if checkpoint else None,
+            files=len(checkpoint.files) if checkpoint else 0,
+            rowsLeft=left,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def count_rows(conn):
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(1) FROM {TABLE_NAME}")
+    count = cur.fetchone()[0]
+    cur.close()
+    return count
+
+
+def print_summary(summary):
+    phases = summary["phases"]
+    rates = summary["rates"]
+    latencies = summary["latencies"]
+
+    def p95(name):
+        value = latencies.get(name, {}).get("p95Ms")
+        return f"{value:.1f}ms" if value is not None else "-"
+
+    print(
+        f"{summary['rows']:>9} rows  {summary['elapsedSeconds']:8.2f}s total  "
+        f"export {phases.get('export', 0):7.2f}s ({rates['exportRowsPerSecond'] or 0:9.0f} rows/s, "
+        f"{(rates['exportBytesPerSecond'] or 0) / 1e6:6.1f} MB/s)  "
+        f"delete {phases.get('delete', 0):7.2f}s ({rates['deleteRowsPerSecond'] or 0:9.0f} rows/s)  "
+        f"p95 fetch {p95('sql.fetch')} encode {p95('encode')} stage {p95('blob.stage_block')} "
+        f"delete {p95('sql.delete')}  round trips {summary['counters'].get('sql.round_trips', 0)}  "
+        f"left {summary['rowsLeft']}"
+    )
+
+
+def run_pipeline(args):
+    os.environ["AZURE_STORAGE_CONNECTION_STRING"] = args.connection_string
+    # Only needs to be set; connections go to the SQLite file
+    os.environ.setdefault("SQL_ODBC_CONNECTION", "sqlite")
+    if args.connections:
+        os.environ["ARCHIVE_MAX_SQL_CONNECTIONS"] = str(args.connections)
+    from azure.storage.blob import BlobServiceClient
+    import function_app
+
+    blob_service = BlobServiceClient.from_connection_string(args.connection_string)
+    results = []
+    for rows in args.rows:
+        container_client = blob_service.get_container_client(f"q6bench-{rows}-{int(time.time())}")
+        container_client.create_container()
+        try:
+            summary = pipeline_job(function_app, container_client, rows)
+        finally:
+            if not args.keep:
+                container_client.delete_container()
+        print_summary(summary)
+        results.append(summary)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="per-row vs batched SQL -> NDJSON export")
+    export.add_argument("--rows", type=int, default=200000)
+    export.add_argument("--batch-size", type=int, default=50000)
+    export.add_argument("--fetch-size", type=int, default=5000)
+    export.set_defaults(run=run_export)
+
+    pipeline = commands.add_parser("pipeline", help="full archive job against Blob Storage/Azurite")
+    pipeline.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    pipeline.add_argument("--connection-string", default=AZURITE_CONNECTION_STRING)
+    pipeline.add_argument("--connections", type=int, help="ARCHIVE_MAX_SQL_CONNECTIONS")
+    pipeline.add_argument("--output", help="write the metrics summaries to this JSON file")
+    pipeline.add_argument("--keep", action="store_true", help="keep the benchmark containers")
+    pipeline.set_defaults(run=run_pipeline)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
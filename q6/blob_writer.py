@@ -0,0 +1,334 @@
+"""
+Parallel block upload for archive blobs.
+
+Bytes written to BlockBlobWriter are cut into fixed-size blocks that are
+staged with stage_block on a thread pool, so SQL fetching and encoding keep
+running while earlier blocks are on the wire. close() commits the block
+list in order.
+
+ArchiveSink spreads one export over several such blobs (per OrderDate day
+and/or a size cap) in a chosen format; write_manifest lists them.
+"""
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+from archive import DATE_COL, PK_COL
+
+logger = logging.getLogger("TimerArchiveFunction")
+
+
+def make_block_id(index, data):
+    # Block ids must all have the same length within a blob. The content
+    # digest lets a rerun recognise blocks that a failed run already staged.
+    digest = hashlib.md5(data).hexdigest()[:24]
+    return base64.b64encode(f"{index:08d}-{digest}".encode("ascii")).decode("ascii")
+
+
+class BlockBlobWriter:
+    def __init__(self, blob_client, block_size=8 * 1024 * 1024, max_in_flight=4,
+                 resume=False, content_settings=None, executor=None, metrics=None):
+        self.blob_client = blob_client
+        self.metrics = metrics
+        self.block_size = block_size
+        self.max_in_flight = max_in_flight
+        self.content_settings = content_settings
+        self.block_ids = []
+        self.bytes_written = 0
+        self.blocks_reused = 0
+        # Time spent blocked on in-flight uploads (backpressure)
+        self.wait_seconds = 0.0
+        self._buffer = bytearray()
+        self._pending = deque()
+        # A shared executor is owned (and shut down) by the caller
+        self._owns_pool = executor is None
+        self._pool = executor or ThreadPoolExecutor(max_workers=max_in_flight)
+        self._staged = self._uncommitted_blocks() if resume else {}
+
+    def _uncommitted_blocks(self):
+        try:
+            _, uncommitted = self.blob_client.get_block_list("uncommitted")
+        except ResourceNotFoundError:
+            return {}
+        if uncommitted:
+            logger.info(f"Found {len(uncommitted)} staged blocks to resume from")
+        return {block.id: block.size for block in uncommitted}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, data):
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._stage(block)
+
+    def _stage(self, block):
+        block_id = make_block_id(len(self.block_ids), block)
+        self.block_ids.append(block_id)
+        if self._staged.get(block_id) == len(block):
+            self.blocks_reused += 1
+            return
+
+        self._pending.append(self._pool.submit(self._stage_block, block_id, block))
+        # Bound memory: at most max_in_flight blocks buffered or uploading
+        self._wait_for(self.max_in_flight - 1)
+
+    def _stage_block(self, block_id, block):
+        started = time.perf_counter()
+        self.blob_client.stage_block(block_id, block)
+        if self.metrics is not None:
+            self.metrics.observe("blob.stage_block", time.perf_counter() - started)
+            self.metrics.incr("blob.blocks_staged")
+            self.metrics.incr("blob.bytes_staged", len(block))
+
+    def _wait_for(self, max_pending):
+        if len(self._pending) <= max_pending:
+            return
+        started = time.perf_counter()
+        while len(self._pending) > max_pending:
+            self._pending.popleft().result()
+        waited = time.perf_counter() - started
+        self.wait_seconds += waited
+        if self.metrics is not None:
+            self.metrics.observe("blob.wait", waited)
+
+    def close(self):
+        """Stage the remaining bytes and commit the block list."""
+        try:
+            if self._buffer:
+                block = bytes(self._buffer)
+                self._buffer.clear()
+                self._stage(block)
+            self._wait_for(0)
+            started = time.perf_counter()
+            self.blob_client.commit_block_list(self.block_ids, content_settings=self.content_settings)
+            if self.metrics is not None:
+                self.metrics.observe("blob.commit", time.perf_counter() - started)
+                self.metrics.incr("blob.bytes_written", self.bytes_written)
+        finally:
+            if self._owns_pool:
+                self._pool.shutdown(wait=True)
+        if self.blocks_reused:
+            logger.info(f"Reused {self.blocks_reused} of {len(self.block_ids)} blocks from a previous run")
+
+    def abort(self):
+        """Stop uploading. Staged blocks stay uncommitted and can be resumed."""
+        for future in self._pending:
+            future.cancel()
+        if self._owns_pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        self._buffer.clear()
+
+
+class _ArchivePart:
+    def __init__(self, blob_client, encoder_cls, writer_options, day=None, column_types=None):
+        self.blob_client = blob_client
+        self.day = day
+        self.rows = 0
+        self.min_id = self.max_id = None
+        self.min_date = self.max_date = None
+        self.writer = BlockBlobWriter(
+            blob_client,
+            content_settings=ContentSettings(content_type=encoder_cls.content_type),
+            **writer_options
+        )
+        self.encoder = encoder_cls(self.writer, column_types)
+
+    def _encode(self, encode, *args):
+        started = time.perf_counter()
+        waited = self.writer.wait_seconds
+        encode(*args)
+        metrics = self.writer.metrics
+        if metrics is not None:
+            # Encoding time only, without waiting for block uploads
+            metrics.observe("encode", time.perf_counter() - started - (self.writer.wait_seconds - waited))
+
+    def write(self, records):
+        self._encode(self.encoder.write, records)
+        self.rows += len(records)
+        # Batches arrive in PK order
+        if self.min_id is None:
+            self.min_id = records[0][PK_COL]
+        self.max_id = records[-1][PK_COL]
+        dates = [r[DATE_COL] for r in records if r[DATE_COL] is not None]
+        if dates:
+            low, high = min(dates), max(dates)
+            if self.min_date is None or low < self.min_date:
+                self.min_date = low
+            if self.max_date is None or high > self.max_date:
+                self.max_date = high
+
+    def close(self):
+        self._encode(self.encoder.close)
+        self.writer.close()
+
+    def describe(self):
+        return {
+            "blob": self.blob_client.blob_name,
+            "url": self.blob_client.url,
+            "day": self.day,
+            "rows": self.rows,
+            "bytes": self.writer.bytes_written,
+            "minId": self.min_id,
+            "maxId": self.max_id,
+            "minOrderDate": self.min_date,
+            "maxOrderDate": self.max_date,
+        }
+
+
+def _day_of(value):
+    # isoformat strings and datetime/date objects both start with YYYY-MM-DD
+    return str(value)[:10] if value is not None else "unknown"
+
+
+class ArchiveSink:
+    """
+    Writes record batches to one or more archive blobs named after
+    base_name. close() returns the file list for the manifest.
+
+    split_by_day routes rows to one part per OrderDate day; at most
+    max_open_parts stay open, the least recently used is committed first
+    (a day seen again later gets a new part). max_part_bytes starts a new
+    part once a part has grown past it. column_types (filled in by
+    iter_record_batches) go to every part's encoder.
+    """
+
+    def __init__(self, container_client, base_name, encoder_cls, split_by_day=False,
+                 max_part_bytes=0, max_open_parts=8, block_size=8 * 1024 * 1024,
+                 max_in_flight=4, resume=False, metrics=None, column_types=None):
+        self.container_client = container_client
+        self.base_name = base_name
+        self.encoder_cls = encoder_cls
+        self.split_by_day = split_by_day
+        self.column_types = column_types
+        self.max_part_bytes = max_part_bytes
+        self.max_open_parts = max_open_parts
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight * (max_open_parts if split_by_day else 1))
+        self._writer_options = {
+            "block_size": block_size,
+            "max_in_flight": max_in_flight,
+            "resume": resume,
+            "executor": self._pool,
+            "metrics": metrics,
+        }
+        self._open = {}
+        self._closed = []
+        self._part_count = 0
+        self.files = []
+
+    @property
+    def partitioned(self):
+        return self.split_by_day or self.max_part_bytes > 0
+
+    def _new_part(self, day):
+        self._part_count += 1
+        if not self.partitioned:
+            name = f"{self.base_name}.{self.encoder_cls.extension}"
+        elif day is not None:
+            name = f"{self.base_name}-{day.replace('-', '')}-{self._part_count:05d}.{self.encoder_cls.extension}"
+        else:
+            name = f"{self.base_name}-{self._part_count:05d}.{self.encoder_cls.extension}"
+        return _ArchivePart(
+            self.container_client.get_blob_client(name),
+            self.encoder_cls,
+            self._writer_options,
+            day,
+            self.column_types
+        )
+
+    def _close_part(self, key):
+        part = self._open.pop(key)
+        part.close()
+        self._closed.append(part)
+
+    def _part_for(self, key):
+        part = self._open.get(key)
+        if part is None:
+            if len(self._open) >= self.max_open_parts:
+                # dicts keep insertion order; _part_for re-inserts on use
+                self._close_part(next(iter(self._open)))
+            part = self._new_part(key)
+        else:
+            del self._open[key]
+        self._open[key] = part
+        return part
+
+    def write(self, records):
+        if not records:
+            return
+        if self.split_by_day:
+            groups = {}
+            for record in records:
+                groups.setdefault(_day_of(record[DATE_COL]), []).append(record)
+        else:
+            groups = {None: records}
+
+        for key, group in groups.items():
+            part = self._part_for(key)
+            part.write(group)
+            if self.max_part_bytes and part.writer.bytes_written >= self.max_part_bytes:
+                self._close_part(key)
+
+    def close(self):
+        """Commit every part. Returns their descriptions for the manifest."""
+        try:
+            for key in list(self._open):
+                self._close_part(key)
+        finally:
+            self._pool.shutdown(wait=True)
+        self.files = sorted((p.describe() for p in self._closed), key=lambda f: f["blob"])
+        return self.files
+
+    def abort(self):
+        for part in self._open.values():
+            part.writer.abort()
+        self._open.clear()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_manifest(container_client, name, archive_format, files, extra=None):
+    """
+    Upload the manifest listing every archive file with its row count and
+    min/max keys, so downstream readers can prune files.
+    """
+    manifest = dict(extra or {})
+    manifest.update({
+        "format": archive_format.extension,
+        "createdOn": datetime.datetime.utcnow().isoformat(),
+        "totalRows": sum(f["rows"] for f in files),
+        "files": files,
+    })
+    blob_client = container_client.get_blob_client(name)
+    blob_client.upload_blob(
+        json.dumps(manifest, default=str, indent=2),
+        overwrite=True,
+        content_settings=ContentSettings(content_type="application/json")
+    )
+    return blob_client.url
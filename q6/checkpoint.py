@@ -0,0 +1,127 @@
+"""
+Persistent state of an archive job, stored as a JSON blob.
+
+A job is created with a fixed cutoff and blob base name and moves through
+"exporting" -> "deleting" -> "done". Each timer run loads the checkpoint
+and continues where the previous run stopped:
+
+- ranges: the Id ranges exported in parallel, each (after, through] with
+  its own last_id: every row of the range with Id <= last_id (and older
+  than the cutoff) is in a committed archive blob listed in files
+- pending_ranges: exported Id ranges not deleted yet; deleted_ranges: done
+- pending_id_blobs: uploaded id spools not yet used for IN-list deletes
+
+Saves are conditional on the blob ETag, so two runs can't both advance
+the same job.
+"""
+import datetime
+import json
+import uuid
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+EXPORTING = "exporting"
+DELETING = "deleting"
+DONE = "done"
+
+
+def new_range(after, through, last_id=None, segments=0):
+    return {"after": after, "through": through, "lastId": last_id, "segments": segments, "done": False}
+
+
+class JobCheckpoint:
+    def __init__(self, blob_client, data, etag=None):
+        self.blob_client = blob_client
+        self.etag = etag
+        self.job_id = data["jobId"]
+        self.state = data["state"]
+        self.cutoff = datetime.datetime.fromisoformat(data["cutoff"])
+        self.base_name = data["baseName"]
+        # Checkpoints written before the export was split into ranges
+        # describe a single unbounded range
+        self.ranges = data.get("ranges") or [new_range(None, None, data.get("lastId"), data.get("segments", 0))]
+        self.files = data.get("files", [])
+        self.pending_ranges = [tuple(r) for r in data.get("pendingRanges", [])]
+        self.deleted_ranges = [tuple(r) for r in data.get("deletedRanges", [])]
+        self.pending_id_blobs = data.get("pendingIdBlobs", [])
+        self.exported_rows = data.get("exportedRows", 0)
+        self.deleted_rows = data.get("deletedRows", 0)
+        self.created_on = data.get("createdOn")
+
+    @classmethod
+    def load(cls, container_client, name):
+        """Returns the stored checkpoint, or None if there is none yet."""
+        blob_client = container_client.get_blob_client(name)
+        try:
+            downloader = blob_client.download_blob()
+        except ResourceNotFoundError:
+            return None
+        data = json.loads(downloader.readall())
+        return cls(blob_client, data, etag=downloader.properties.etag)
+
+    @classmethod
+    def new(cls, container_client, name, cutoff_dt, base_name, id_ranges=None, previous=None):
+        """
+        Start a job over id_ranges, a list of (after, through) bounds (one
+        unbounded range by default). previous is the finished checkpoint it
+        replaces.
+        """
+        data = {
+            "jobId": str(uuid.uuid4()),
+            "state": EXPORTING,
+            "cutoff": cutoff_dt.isoformat(),
+            "baseName": base_name,
+            "ranges": [new_range(after, through) for after, through in id_ranges or [(None, None)]],
+            "createdOn": datetime.datetime.utcnow().isoformat(),
+        }
+        etag = previous.etag if previous is not None else None
+        return cls(container_client.get_blob_client(name), data, etag=etag)
+
+    def to_dict(self):
+        return {
+            "jobId": self.job_id,
+            "state": self.state,
+            "cutoff": self.cutoff.isoformat(),
+            "baseName": self.base_name,
+            "ranges": self.ranges,
+            "files": self.files,
+            "pendingRanges": self.pending_ranges,
+            "deletedRanges": self.deleted_ranges,
+            "pendingIdBlobs": self.pending_id_blobs,
+            "exportedRows": self.exported_rows,
+            "deletedRows": self.deleted_rows,
+            "createdOn": self.created_on,
+            "updatedOn": datetime.datetime.utcnow().isoformat(),
+        }
+
+    @property
+    def manifest_name(self):
+        return f"{self.base_name}.manifest.json"
+
+    @property
+    def export_done(self):
+        return all(r["done"] for r in self.ranges)
+
+    def segment_base_name(self, index):
+        """Blob base name for the next export segment of range index (one per timer run)."""
+        name = self.base_name
+        if len(self.ranges) > 1:
+            name = f"{name}-r{index:03d}"
+        segments = self.ranges[index]["segments"]
+        if segments:
+            name = f"{name}-{segments:03d}"
+        return name
+
+    def save(self):
+        if self.etag:
+            conditions = {"etag": self.etag, "match_condition": MatchConditions.IfNotModified}
+        else:
+            conditions = {"match_condition": MatchConditions.IfMissing}
+        result = self.blob_client.upload_blob(
+            json.dumps(self.to_dict(), default=str, indent=2),
+            overwrite=True,
+            content_settings=ContentSettings(content_type="application/json"),
+            **conditions
+        )
+        self.etag = result["etag"]
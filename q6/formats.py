@@ -0,0 +1,188 @@
+"""
+Archive output formats.
+
+An encoder wraps a writable file (anything with write()) and receives
+record batches from archive.iter_record_batches. column_types are the
+export's archive.resolve_column_types, filled in before the first batch.
+close() flushes trailers but never closes the underlying file.
+
+zstd needs the zstandard package and parquet needs pyarrow; both are only
+imported when the format is selected.
+"""
+import datetime
+import decimal
+import zlib
+from archive import encode_ndjson
+
+
+class NdjsonEncoder:
+    extension = "ndjson"
+    content_type = "application/x-ndjson"
+    iso_datetimes = True
+
+    def __init__(self, fileobj, column_types=None):
+        self.fileobj = fileobj
+
+    def write(self, records):
+        self.fileobj.write(encode_ndjson(records))
+
+    def close(self):
+        pass
+
+
+class GzipNdjsonEncoder(NdjsonEncoder):
+    extension = "ndjson.gz"
+    content_type = "application/gzip"
+    level = 6
+
+    def __init__(self, fileobj, column_types=None):
+        super().__init__(fileobj)
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def write(self, records):
+        self.fileobj.write(self._compressor.compress(encode_ndjson(records)))
+
+    def close(self):
+        self.fileobj.write(self._compressor.flush())
+
+
+class ZstdNdjsonEncoder(NdjsonEncoder):
+    extension = "ndjson.zst"
+    content_type = "application/zstd"
+    level = 3
+
+    def __init__(self, fileobj, column_types=None):
+        import zstandard
+        super().__init__(fileobj)
+        self._compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def write(self, records):
+        self.fileobj.write(self._compressor.compress(encode_ndjson(records)))
+
+    def close(self):
+        self.fileobj.write(self._compressor.flush())
+
+
+class _UnclosableFile:
+    """File adapter for pyarrow: tracks position, leaves closing to us."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.fileobj.write(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _arrow_type(pa, type_code, precision, scale):
+    """Arrow type for a column of type_code, or None to store it as strings."""
+    if type_code is bool:
+        return pa.bool_()
+    if type_code is int:
+        return pa.int64()
+    if type_code is float:
+        return pa.float64()
+    if type_code is decimal.Decimal and precision and precision <= 38:
+        return pa.decimal128(precision, scale or 0)
+    if type_code is str:
+        return pa.string()
+    if type_code in (bytes, bytearray):
+        return pa.binary()
+    if type_code is datetime.datetime:
+        return pa.timestamp("us")
+    if type_code is datetime.date:
+        return pa.date32()
+    if type_code is datetime.time:
+        return pa.time64("us")
+    return None
+
+
+class ParquetEncoder:
+    """
+    Writes one Parquet row group per row_group_size buffered records. The
+    schema comes from the column types, not from the data, so a column
+    that is NULL throughout the first row group keeps its type. Columns of
+    other types (UUIDs, unsized decimals, unknown) are stored as strings.
+    """
+    extension = "parquet"
+    content_type = "application/vnd.apache.parquet"
+    # Let pyarrow store datetimes as timestamp columns
+    iso_datetimes = False
+    row_group_size = 100000
+
+    def __init__(self, fileobj, column_types=None):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._file = _UnclosableFile(fileobj)
+        self._column_types = column_types
+        self._writer = None
+        self._schema = None
+        self._string_columns = []
+        self._pending = []
+
+    def _build_schema(self):
+        if not self._column_types:
+            raise Exception("Parquet output needs the column types of the export")
+        fields = []
+        for name, (type_code, precision, scale) in self._column_types.items():
+            arrow_type = _arrow_type(self._pa, type_code, precision, scale)
+            if arrow_type is None:
+                arrow_type = self._pa.string()
+                self._string_columns.append(name)
+            fields.append(self._pa.field(name, arrow_type))
+        return self._pa.schema(fields)
+
+    def write(self, records):
+        self._pending.extend(records)
+        if len(self._pending) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        if self._writer is None:
+            self._schema = self._build_schema()
+            self._writer = self._pq.ParquetWriter(self._file, self._schema, compression="snappy")
+        if self._string_columns:
+            for record in self._pending:
+                for name in self._string_columns:
+                    if record[name] is not None:
+                        record[name] = str(record[name])
+        table = self._pa.Table.from_pylist(self._pending, schema=self._schema)
+        self._writer.write_table(table, row_group_size=len(self._pending))
+        self._pending = []
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+FORMATS = {
+    "ndjson": NdjsonEncoder,
+    "ndjson.gz": GzipNdjsonEncoder,
+    "ndjson.zst": ZstdNdjsonEncoder,
+    "parquet": ParquetEncoder,
+}
+
+
+def get_format(name):
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise Exception(f"Unknown ARCHIVE_FORMAT '{name}', expected one of {', '.join(FORMATS)}")
@@ -1,31 +1,68 @@
 import os
 import logging
-import json
 import tempfile
+import contextlib
 import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dateutil import tz
 import pyodbc
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.storage.blob import BlobServiceClient
 import azure.functions as func
+from archive import (
+    count_to_archive,
+    delete_ids_from_file_in_batches,
+    delete_ranges_in_batches,
+    id_bounds,
+    iter_record_batches,
+    split_id_range
+)
+from blob_writer import ArchiveSink, write_manifest
+from checkpoint import DELETING, DONE, EXPORTING, JobCheckpoint
+from formats import get_format
+from metrics import JobMetrics
 
 # Config from environment
 STORAGE_CONN_STR = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 BLOB_CONTAINER = os.getenv("AZURE_BLOB_CONTAINER", "archive")
 SQL_CONN = os.getenv("SQL_ODBC_CONNECTION")
-ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "50000"))
+ARCHIVE_FETCH_SIZE = int(os.getenv("ARCHIVE_FETCH_SIZE", "5000"))
 DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+# "range" deletes each exported page by (Id range, OrderDate < cutoff) with
+# DELETE TOP (n) loops; "ids" deletes IN-lists read back from the id spool
+DELETE_MODE = os.getenv("DELETE_MODE", "range").lower()
+DELETE_RANGE_BATCH_SIZE = int(os.getenv("DELETE_RANGE_BATCH_SIZE", "4000"))
+# Keep the archived ids and upload them next to the manifest for audit
+ARCHIVE_AUDIT_IDS = os.getenv("ARCHIVE_AUDIT_IDS", "false").lower() == "true"
 TIME_WINDOW_DAYS = int(os.getenv("TIME_WINDOW_DAYS", "30"))
-
-# Column names - change if your schema differs
-PK_COL = "Id"
-DATE_COL = "OrderDate"
-TABLE_NAME = "Orders"
+# Archive upload: block size and blocks staged concurrently
+ARCHIVE_BLOCK_SIZE = int(os.getenv("ARCHIVE_BLOCK_SIZE_MB", "8")) * 1024 * 1024
+ARCHIVE_MAX_IN_FLIGHT = int(os.getenv("ARCHIVE_MAX_IN_FLIGHT", "4"))
+# Job checkpoint blob, and how long one run may work before it checkpoints
+# and leaves the rest to the next run (0 = no limit)
+ARCHIVE_CHECKPOINT_BLOB = os.getenv("ARCHIVE_CHECKPOINT_BLOB", "archive/orders/_checkpoint.json")
+ARCHIVE_TIME_BUDGET_SECONDS = int(os.getenv("ARCHIVE_TIME_BUDGET_SECONDS", "0"))
+# Output: ndjson, ndjson.gz, ndjson.zst or parquet; optionally split into one
+# blob per OrderDate day and/or at a size cap (0 = no cap)
+ARCHIVE_FORMAT = get_format(os.getenv("ARCHIVE_FORMAT", "ndjson"))
+ARCHIVE_SPLIT_BY_DAY = os.getenv("ARCHIVE_SPLIT_BY_DAY", "false").lower() == "true"
+ARCHIVE_MAX_BLOB_BYTES = int(os.getenv("ARCHIVE_MAX_BLOB_MB", "0")) * 1024 * 1024
+ARCHIVE_MAX_OPEN_PARTS = int(os.getenv("ARCHIVE_MAX_OPEN_PARTS", "8"))
+# Parallel export: the Id range of a job is split into ARCHIVE_EXPORT_RANGES
+# ranges, exported by at most ARCHIVE_MAX_SQL_CONNECTIONS concurrent
+# connections (1 = sequentially on the job's connection)
+ARCHIVE_MAX_SQL_CONNECTIONS = int(os.getenv("ARCHIVE_MAX_SQL_CONNECTIONS", "1"))
+ARCHIVE_EXPORT_RANGES = int(os.getenv("ARCHIVE_EXPORT_RANGES", str(ARCHIVE_MAX_SQL_CONNECTIONS)))
 
 if not STORAGE_CONN_STR:
     raise Exception("AZURE_STORAGE_CONNECTION_STRING is required")
 if not SQL_CONN:
     raise Exception("SQL_ODBC_CONNECTION is required")
+if DELETE_MODE not in ("range", "ids"):
+    raise Exception("DELETE_MODE must be 'range' or 'ids'")
+if ARCHIVE_MAX_SQL_CONNECTIONS < 1 or ARCHIVE_EXPORT_RANGES < 1:
+    raise Exception("ARCHIVE_MAX_SQL_CONNECTIONS and ARCHIVE_EXPORT_RANGES must be at least 1")
 
 logger = logging.getLogger("TimerArchiveFunction")
 logger.setLevel(logging.INFO)
@@ -37,220 +74,342 @@ def get_cutoff_datetime_utc(days):
     return cutoff
 
 
-def rows_generator_and_write_ids(temp_id_file_path, cutoff_dt, batch_size=1000):
-    """
-    Generator that yields NDJSON bytes for upload_blob.
-    It pulls rows from SQL in batches and writes their IDs to a temp file.
-    """
-    conn = pyodbc.connect(SQL_CONN, autocommit=False)
-    cursor = conn.cursor()
-
-    # We'll page using PK order. This requires PK is sortable.
-    last_id = None
-    more = True
+def remove_temp_file(path):
+    if not path:
+        return
     try:
-        while more:
-            # Build query to fetch a batch; adjust WHERE to use DATE_COL and PK ordering
-            # Use parameterized query
-            if last_id is None:
-                sql = f"""
-                SELECT TOP (?) {PK_COL}, * 
-                FROM {TABLE_NAME}
-                WHERE {DATE_COL} < ?
-                ORDER BY {PK_COL} ASC
-                """
-                params = (batch_size, cutoff_dt)
-            else:
-                sql = f"""
-                SELECT TOP (?) {PK_COL}, *
-                FROM {TABLE_NAME}
-                WHERE {DATE_COL} < ?
-                  AND {PK_COL} > ?
-                ORDER BY {PK_COL} ASC
-                """
-                params = (batch_size, cutoff_dt, last_id)
-
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
-            if not rows:
-                more = False
-                break
+        os.remove(path)
+    except Exception:
+        pass
 
-            # For each row, convert to JSON line and yield
-            for row in rows:
-                # pyodbc.Row behaves like tuple with .cursor_description for columns
-                # Build dict dynamically
-                row_dict = {}
-                desc = [d[0] for d in cursor.description]
-                for idx, col in enumerate(desc):
-                    val = row[idx]
-                    # convert datetimes to ISO strings
-                    if isinstance(val, datetime.datetime):
-                        val = val.isoformat()
-                    row_dict[col] = val
-
-                # Write id to temp file for later deletion
-                with open(temp_id_file_path, "a", encoding="utf-8") as fids:
-                    fids.write(str(row_dict[PK_COL]) + "\n")
-
-                # yield bytes line
-                ndjson_line = json.dumps(row_dict, default=str) + "\n"
-                yield ndjson_line.encode("utf-8")
-
-            # set last_id for next page
-            last_id = getattr(rows[-1], 0)  # first column is PK_COL
-            # If returned rows < batch_size then done next iteration will stop
-            if len(rows) < batch_size:
-                more = False
 
-    finally:
-        cursor.close()
-        conn.close()
+def build_blob_path(now_utc):
+    y = now_utc.strftime("%Y")
+    m = now_utc.strftime("%m")
+    d = now_utc.strftime("%d")
+    ts = now_utc.strftime("%Y%m%dT%H%M%SZ")
+    # File extension (and part suffix) are added by ArchiveSink
+    blob_name = f"archive/orders/{y}/{m}/{d}/orders{ts}"
+    return blob_name
+
+
+def main(mytimer: func.TimerRequest) -> None:
+    start_time = time.time()
+    logger.info("TimerArchiveFunction started")
+    deadline = start_time + ARCHIVE_TIME_BUDGET_SECONDS if ARCHIVE_TIME_BUDGET_SECONDS else None
 
+    blob_service = BlobServiceClient.from_connection_string(STORAGE_CONN_STR)
+    container_client = blob_service.get_container_client(BLOB_CONTAINER)
+    try:
+        container_client.create_container()
+    except Exception:
+        # ignore if exists or not allowed
+        pass
 
-def count_to_archive(cutoff_dt):
-    conn = pyodbc.connect(SQL_CONN, autocommit=True)
-    cur = conn.cursor()
+    metrics = JobMetrics()
+    # One connection for the whole run; deletes manage their own transactions
+    conn = connect_sql()
     try:
-        cur.execute(f"SELECT COUNT(1) FROM {TABLE_NAME} WHERE {DATE_COL} < ?", (cutoff_dt,))
-        cnt = cur.fetchone()[0]
-        return cnt
+        checkpoint = run_archive_job(conn, container_client, deadline, metrics)
     finally:
-        cur.close()
         conn.close()
+        metrics.emit(logger, function="TimerArchiveFunction")
 
+    elapsed = time.time() - start_time
+    logger.info(f"TimerArchiveFunction finished in {elapsed:.2f}s"
+                + (f" (job {checkpoint.job_id}: {checkpoint.state})" if checkpoint else ""))
 
-def delete_ids_from_file_in_batches(temp_id_file_path, delete_batch_size=1000):
-    """
-    Read IDs from file and delete them from SQL in batches inside transactions.
-    Returns total deleted count.
-    """
-    conn = pyodbc.connect(SQL_CONN, autocommit=False)
-    cur = conn.cursor()
-    total_deleted = 0
-    try:
-        # Read IDs in streaming fashion
-        def id_stream():
-            with open(temp_id_file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    l = line.strip()
-                    if l:
-                        yield l
-
-        batch = []
-        for idstr in id_stream():
-            batch.append(idstr)
-            if len(batch) >= delete_batch_size:
-                # delete these in a transaction
-                placeholders = ",".join("?" for _ in batch)
-                delete_sql = f"DELETE FROM {TABLE_NAME} WHERE {PK_COL} IN ({placeholders})"
-                try:
-                    cur.execute("BEGIN TRAN")
-                    cur.execute(delete_sql, batch)
-                    deleted = cur.rowcount
-                    cur.execute("COMMIT")
-                    total_deleted += deleted
-                except Exception as e:
-                    cur.execute("ROLLBACK")
-                    logger.exception("Error deleting batch - rolled back")
-                    raise
-                batch = []
-
-        # delete remainder
-        if batch:
-            placeholders = ",".join("?" for _ in batch)
-            delete_sql = f"DELETE FROM {TABLE_NAME} WHERE {PK_COL} IN ({placeholders})"
-            try:
-                cur.execute("BEGIN TRAN")
-                cur.execute(delete_sql, batch)
-                deleted = cur.rowcount
-                cur.execute("COMMIT")
-                total_deleted += deleted
-            except Exception as e:
-                cur.execute("ROLLBACK")
-                logger.exception("Error deleting final batch - rolled back")
-                raise
 
-        return total_deleted
+def connect_sql():
+    return pyodbc.connect(SQL_CONN, autocommit=True)
 
-    finally:
-        cur.close()
-        conn.close()
 
+def past_deadline(deadline):
+    return deadline is not None and time.time() >= deadline
 
-def build_blob_path(now_utc):
-    y = now_utc.strftime("%Y")
-    m = now_utc.strftime("%m")
-    d = now_utc.strftime("%d")
-    ts = now_utc.strftime("%Y%m%dT%H%M%SZ")
-    blob_name = f"archive/orders/{y}/{m}/{d}/orders{ts}.ndjson"
-    return blob_name
 
-
-def main(mytimer: func.TimerRequest) -> None:
-    start_time = time.time()
-    logger.info("TimerArchiveFunction started")
+def start_job(conn, container_client, previous, metrics=None):
+    metrics = metrics or JobMetrics()
     cutoff_dt = get_cutoff_datetime_utc(TIME_WINDOW_DAYS)
     logger.info(f"Cutoff datetime (UTC) for archiving rows older than {TIME_WINDOW_DAYS} days: {cutoff_dt.isoformat()}")
 
     # Count how many rows to archive
     try:
-        total_to_archive = count_to_archive(cutoff_dt)
+        with metrics.phase("count"):
+            total_to_archive = count_to_archive(conn, cutoff_dt)
         if total_to_archive == 0:
             logger.info("No rows to archive. Exiting.")
-            return
+            return None
         logger.info(f"Rows to archive: {total_to_archive}")
     except Exception:
         logger.exception("Failed to count rows to archive")
         raise
 
-    # Create temp file to collect IDs
-    temp_ids_fd, temp_ids_path = tempfile.mkstemp(prefix="archived_ids_", text=True)
-    os.close(temp_ids_fd)  # we'll open normally by name
+    id_ranges = None
+    if ARCHIVE_EXPORT_RANGES > 1:
+        with metrics.phase("split"):
+            min_id, max_id = id_bounds(conn, cutoff_dt)
+        id_ranges = split_id_range(min_id, max_id, ARCHIVE_EXPORT_RANGES)
+        logger.info(f"Split Ids {min_id}..{max_id} into {len(id_ranges)} export ranges")
+
+    checkpoint = JobCheckpoint.new(
+        container_client,
+        ARCHIVE_CHECKPOINT_BLOB,
+        cutoff_dt,
+        build_blob_path(datetime.datetime.utcnow()),
+        id_ranges=id_ranges,
+        previous=previous
+    )
+    checkpoint.save()
+    logger.info(f"Started archive job {checkpoint.job_id}")
+    return checkpoint
+
+
+def run_archive_job(conn, container_client, deadline=None, metrics=None):
+    """Advance the current archive job (or start one). Returns its checkpoint."""
+    metrics = metrics or JobMetrics()
+    checkpoint = JobCheckpoint.load(container_client, ARCHIVE_CHECKPOINT_BLOB)
+    if checkpoint is None or checkpoint.state == DONE:
+        checkpoint = start_job(conn, container_client, checkpoint, metrics)
+        if checkpoint is None:
+            return None
+    else:
+        logger.info(
+            f"Resuming archive job {checkpoint.job_id} ({checkpoint.state}), "
+            f"{sum(not r['done'] for r in checkpoint.ranges)} of {len(checkpoint.ranges)} Id ranges "
+            f"left to export, cutoff {checkpoint.cutoff.isoformat()}"
+        )
+
+    if checkpoint.state == EXPORTING:
+        with metrics.phase("export"):
+            finished = export_ranges(conn, container_client, checkpoint, deadline, metrics)
+        if not finished:
+            logger.info("Time budget reached during export; the next run resumes")
+            return checkpoint
+        # Ranges finish in any order; list the files in Id order
+        checkpoint.files.sort(key=lambda f: (f["minId"], f["blob"]))
+        with metrics.phase("manifest"):
+            write_manifest(
+                container_client,
+                checkpoint.manifest_name,
+                ARCHIVE_FORMAT,
+                checkpoint.files,
+                extra={
+                    "jobId": checkpoint.job_id,
+                    "cutoff": checkpoint.cutoff.isoformat(),
+                    "ranges": [[r["after"], r["through"]] for r in checkpoint.ranges],
+                }
+            )
+        logger.info(f"Export complete: {len(checkpoint.files)} files, {checkpoint.exported_rows} rows")
+        # Rows are only deleted once the manifest marks the archive complete
+        checkpoint.state = DELETING
+        checkpoint.save()
+
+    if checkpoint.state == DELETING:
+        try:
+            with metrics.phase("delete"):
+                finished = delete_archived(conn, container_client, checkpoint, deadline, metrics)
+            if not finished:
+                logger.info("Time budget reached during delete; the next run resumes")
+                return checkpoint
+        except Exception:
+            logger.exception("Failed to delete archived rows after upload. The next run retries from the checkpoint.")
+            raise
+        checkpoint.state = DONE
+        checkpoint.save()
+        # Log success: number of archived rows and manifest URL
+        manifest_url = container_client.get_blob_client(checkpoint.manifest_name).url
+        logger.info(f"Archived rows: {checkpoint.deleted_rows}; Archive manifest: {manifest_url}")
+    return checkpoint
 
-    # Build blob name
-    now_utc = datetime.datetime.utcnow()
-    blob_name = build_blob_path(now_utc)
 
-    blob_service = BlobServiceClient.from_connection_string(STORAGE_CONN_STR)
-    container_client = blob_service.get_container_client(BLOB_CONTAINER)
+def export_ranges(conn, container_client, checkpoint, deadline=None, metrics=None):
+    """
+    Export every unfinished Id range of the job. With more than one
+    ARCHIVE_MAX_SQL_CONNECTIONS the ranges run on a thread pool, each on its
+    own connection and into its own blobs; this thread merges the results
+    into the checkpoint as ranges finish. Returns True when the export is
+    complete.
+    """
+    pending = [i for i, r in enumerate(checkpoint.ranges) if not r["done"]]
+    workers = min(ARCHIVE_MAX_SQL_CONNECTIONS, len(pending))
+    if workers <= 1:
+        for index in pending:
+            if past_deadline(deadline):
+                break
+            apply_export_result(checkpoint, export_range(conn, container_client, checkpoint, index, deadline, metrics))
+        return checkpoint.export_done
+
+    logger.info(f"Exporting {len(pending)} Id ranges on {workers} connections")
+    error = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive-export") as pool:
+        futures = [
+            pool.submit(export_range_on_own_connection, container_client, checkpoint, index, deadline, metrics)
+            for index in pending
+        ]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Keep merging the ranges that did finish; the rest are retried
+                error = error or e
+                continue
+            apply_export_result(checkpoint, result)
+    if error is not None:
+        raise error
+    return checkpoint.export_done
+
+
+def export_range_on_own_connection(container_client, checkpoint, index, deadline=None, metrics=None):
+    if past_deadline(deadline):
+        return None
+    conn = connect_sql()
     try:
-        container_client.create_container()
-    except Exception:
-        # ignore if exists or not allowed
-        pass
-
-    blob_client = container_client.get_blob_client(blob_name)
+        return export_range(conn, container_client, checkpoint, index, deadline, metrics)
+    finally:
+        conn.close()
 
-    # Upload NDJSON by streaming generator
-    try:
-        gen = rows_generator_and_write_ids(temp_ids_path, cutoff_dt, batch_size=ARCHIVE_BATCH_SIZE)
-        logger.info(f"Starting upload to blob: {blob_name}")
-        # Stream upload - upload_blob accepts generator of bytes
-        blob_client.upload_blob(gen, overwrite=True, content_settings=ContentSettings(content_type="application/x-ndjson"))
-        logger.info("Upload complete")
-    except Exception:
-        logger.exception("Failed to upload archive blob. Will cleanup temp file and exit without deleting SQL rows.")
-        try:
-            os.remove(temp_ids_path)
-        except Exception:
-            pass
-        raise
 
-    # After successful upload, delete rows by ids recorded in temp file
+def export_range(conn, container_client, checkpoint, index, deadline=None, metrics=None):
+    """
+    Export the rows of range index after its last_id into a new segment of
+    archive blobs until done or out of time, and commit them. Only reads
+    the checkpoint; apply_export_result advances it. A crash before that
+    leaves the checkpoint where it was; the rerun exports the same rows to
+    the same blob names and reuses staged blocks.
+    """
+    id_range = checkpoint.ranges[index]
+    segment_name = checkpoint.segment_base_name(index)
+    start_after = id_range["lastId"] if id_range["lastId"] is not None else id_range["after"]
+
+    # Temp file to collect IDs, only needed for IN-list deletes or audit
+    temp_ids_path = None
+    if DELETE_MODE == "ids" or ARCHIVE_AUDIT_IDS:
+        temp_ids_fd, temp_ids_path = tempfile.mkstemp(prefix="archived_ids_", text=True)
+        os.close(temp_ids_fd)  # we'll open normally by name
+
+    page_ranges = []
+    # Column types from the cursor, for the Parquet schema
+    column_types = {}
+    finished = True
     try:
-        deleted = delete_ids_from_file_in_batches(temp_ids_path, delete_batch_size=DELETE_BATCH_SIZE)
-        # Log success: number of archived rows and blob URL
-        blob_url = blob_client.url
-        logger.info(f"Archived rows: {deleted}; Archive blob: {blob_url}")
+        if temp_ids_path:
+            spool = open(temp_ids_path, "w", encoding="utf-8", buffering=1024 * 1024)
+        else:
+            spool = contextlib.nullcontext()
+        with spool as id_spool:
+            batches = iter_record_batches(
+                conn,
+                checkpoint.cutoff,
+                batch_size=ARCHIVE_BATCH_SIZE,
+                fetch_size=ARCHIVE_FETCH_SIZE,
+                id_spool=id_spool,
+                iso_datetimes=ARCHIVE_FORMAT.iso_datetimes,
+                page_ranges=page_ranges,
+                start_after=start_after,
+                end_id=id_range["through"],
+                metrics=metrics,
+                column_types=column_types
+            )
+            logger.info(f"Starting upload to blob: {segment_name}")
+            # Each fetchmany chunk is encoded into the archive sink, which
+            # stages full blocks in the background while the next page is fetched
+            with ArchiveSink(
+                container_client,
+                segment_name,
+                ARCHIVE_FORMAT,
+                split_by_day=ARCHIVE_SPLIT_BY_DAY,
+                max_part_bytes=ARCHIVE_MAX_BLOB_BYTES,
+                max_open_parts=ARCHIVE_MAX_OPEN_PARTS,
+                block_size=ARCHIVE_BLOCK_SIZE,
+                max_in_flight=ARCHIVE_MAX_IN_FLIGHT,
+                resume=True,
+                metrics=metrics,
+                column_types=column_types
+            ) as sink:
+                for records in batches:
+                    sink.write(records)
+                    if past_deadline(deadline):
+                        finished = False
+                        break
+                # Records the range of a partially exported page
+                batches.close()
+
+        id_blob_name = None
+        if temp_ids_path and page_ranges:
+            id_blob_name = f"{segment_name}.ids.txt"
+            with open(temp_ids_path, "rb") as ids_file:
+                container_client.get_blob_client(id_blob_name).upload_blob(ids_file, overwrite=True)
     except Exception:
-        logger.exception("Failed to delete archived rows after upload. Manual intervention may be required.")
+        logger.exception(f"Failed to upload archive blob {segment_name}. No SQL rows of this range are deleted.")
         raise
     finally:
-        try:
-            os.remove(temp_ids_path)
-        except Exception:
-            pass
-
-    elapsed = time.time() - start_time
-    logger.info(f"TimerArchiveFunction finished in {elapsed:.2f}s")
+        remove_temp_file(temp_ids_path)
+
+    return {
+        "index": index,
+        "segment": segment_name,
+        "files": sink.files,
+        "pageRanges": page_ranges,
+        "idBlob": id_blob_name,
+        "finished": finished,
+    }
+
+
+def apply_export_result(checkpoint, result):
+    if result is None:
+        return
+    id_range = checkpoint.ranges[result["index"]]
+    page_ranges = result["pageRanges"]
+    if page_ranges:
+        checkpoint.files.extend(result["files"])
+        checkpoint.pending_ranges.extend(page_ranges)
+        id_range["lastId"] = page_ranges[-1][1]
+        id_range["segments"] += 1
+        checkpoint.exported_rows += sum(f["rows"] for f in result["files"])
+        if result["idBlob"] and DELETE_MODE == "ids":
+            checkpoint.pending_id_blobs.append(result["idBlob"])
+    id_range["done"] = result["finished"]
+    if page_ranges or result["finished"]:
+        checkpoint.save()
+    if page_ranges:
+        logger.info(
+            f"Committed segment {result['segment']}: {len(result['files'])} files, up to Id {id_range['lastId']}"
+        )
+
+
+def delete_archived(conn, container_client, checkpoint, deadline=None, metrics=None):
+    """
+    Delete exported rows range by range (or id spool by id spool), saving
+    the checkpoint after each so a rerun never repeats finished work.
+    Returns True when everything is deleted.
+    """
+    if DELETE_MODE == "ids":
+        while checkpoint.pending_id_blobs:
+            if past_deadline(deadline):
+                return False
+            temp_ids_fd, temp_ids_path = tempfile.mkstemp(prefix="archived_ids_")
+            try:
+                with os.fdopen(temp_ids_fd, "wb") as ids_file:
+                    container_client.get_blob_client(checkpoint.pending_id_blobs[0]).download_blob().readinto(ids_file)
+                checkpoint.deleted_rows += delete_ids_from_file_in_batches(
+                    conn, temp_ids_path, delete_batch_size=DELETE_BATCH_SIZE, metrics=metrics
+                )
+            finally:
+                remove_temp_file(temp_ids_path)
+            checkpoint.pending_id_blobs.pop(0)
+            checkpoint.save()
+        checkpoint.deleted_ranges.extend(checkpoint.pending_ranges)
+        checkpoint.pending_ranges = []
+        return True
+
+    while checkpoint.pending_ranges:
+        if past_deadline(deadline):
+            return False
+        page_range = checkpoint.pending_ranges[0]
+        checkpoint.deleted_rows += delete_ranges_in_batches(
+            conn, [page_range], checkpoint.cutoff, delete_batch_size=DELETE_RANGE_BATCH_SIZE, metrics=metrics
+        )
+        checkpoint.deleted_ranges.append(checkpoint.pending_ranges.pop(0))
+        checkpoint.save()
+    return True
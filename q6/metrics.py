@@ -0,0 +1,170 @@
+"""
+Per-run metrics for the archive job.
+
+JobMetrics collects phase wall times, counters (rows, bytes, ODBC round
+trips, blocks) and latency histograms from every thread of a run.
+emit() logs one JSON summary line and, when the opentelemetry API is
+installed (e.g. with azure-monitor-opentelemetry exporting to Application
+Insights), records the same numbers as custom metrics.
+"""
+import bisect
+import contextlib
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, capped at max."""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                bound = self.buckets_ms[idx] if idx < len(self.buckets_ms) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def _labels(self):
+        return [f"le{b}" for b in self.buckets_ms] + ["inf"]
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "totalMs": round(self.total, 1),
+            "meanMs": round(self.total / self.count, 2),
+            "minMs": round(self.min, 2),
+            "p50Ms": round(self.percentile(50), 2),
+            "p95Ms": round(self.percentile(95), 2),
+            "p99Ms": round(self.percentile(99), 2),
+            "maxMs": round(self.max, 2),
+            "buckets": {label: n for label, n in zip(self._labels(), self.counts) if n},
+        }
+
+
+class JobMetrics:
+    """
+    Thread-safe metrics of one archive run. Names are dotted, e.g.
+    phase "export", counter "rows.exported", latency "sql.fetch".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.latencies = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.latencies.get(name)
+            if histogram is None:
+                histogram = self.latencies[name] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def summary(self, **extra):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            phases = dict(self.phases)
+            counters = dict(self.counters)
+            latencies = {name: h.summary() for name, h in self.latencies.items()}
+
+        def rate(value, seconds):
+            return round(value / seconds, 1) if value and seconds else None
+
+        summary = dict(extra)
+        summary.update({
+            "elapsedSeconds": round(elapsed, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in phases.items()},
+            "counters": counters,
+            "rates": {
+                "exportRowsPerSecond": rate(counters.get("rows.exported"), phases.get("export")),
+                "exportBytesPerSecond": rate(counters.get("blob.bytes_staged"), phases.get("export")),
+                "deleteRowsPerSecond": rate(counters.get("rows.deleted"), phases.get("delete")),
+            },
+            "latencies": latencies,
+        })
+        return summary
+
+    def emit(self, logger, **extra):
+        summary = self.summary(**extra)
+        logger.info("ArchiveMetrics " + json.dumps(summary, default=str))
+        record_custom_metrics(summary)
+        return summary
+
+
+_instruments = None
+
+
+def _get_instruments():
+    global _instruments
+    if _instruments is None:
+        try:
+            from opentelemetry import metrics as otel_metrics
+        except ImportError:
+            _instruments = {}
+            return _instruments
+        meter = otel_metrics.get_meter("q6.archive")
+        _instruments = {
+            "phase": meter.create_histogram("archive.phase.duration", unit="s"),
+            "counter": meter.create_counter("archive.count"),
+            "rate": meter.create_histogram("archive.throughput", unit="1/s"),
+            "latency": meter.create_histogram("archive.latency", unit="ms"),
+        }
+    return _instruments
+
+
+def record_custom_metrics(summary):
+    """No-op unless the opentelemetry API is installed."""
+    instruments = _get_instruments()
+    if not instruments:
+        return
+    for name, seconds in summary["phases"].items():
+        instruments["phase"].record(seconds, {"phase": name})
+    for name, value in summary["counters"].items():
+        instruments["counter"].add(value, {"name": name})
+    for name, value in summary["rates"].items():
+        if value is not None:
+            instruments["rate"].record(value, {"name": name})
+    for name, histogram in summary["latencies"].items():
+        if histogram["count"]:
+            instruments["latency"].record(histogram["meanMs"], {"name": name, "stat": "mean"})
+            instruments["latency"].record(histogram["p95Ms"], {"name": name, "stat": "p95"})
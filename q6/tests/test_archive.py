@@ -0,0 +1,98 @@
+import datetime
+import pytest
+from archive import delete_range_in_batches, delete_ranges_in_batches, encode_ndjson, iter_record_batches, split_id_range
+from benchmark import count_rows, create_orders
+from metrics import JobMetrics
+
+CUTOFF = datetime.datetime(2100, 1, 1)
+
+
+@pytest.mark.parametrize("min_id, max_id, parts", [(1, 100, 4), (1, 10, 3), (5, 5, 4), (1, 3, 8), (-20, 1000003, 7)])
+def test_split_id_range_covers_every_id_once(min_id, max_id, parts):
+    ranges = split_id_range(min_id, max_id, parts)
+    assert 1 <= len(ranges) <= parts
+    assert ranges[0][0] is None and ranges[-1][1] is None
+    # Each range starts where the previous one ended
+    for (_, through), (after, _) in zip(ranges, ranges[1:]):
+        assert after == through
+
+    ids = range(min_id, min(max_id, min_id + 5000) + 1)
+    for id in ids:
+        owners = [r for r in ranges if (r[0] is None or id > r[0]) and (r[1] is None or id <= r[1])]
+        assert len(owners) == 1
+
+
+def test_split_id_range_spans_are_even():
+    ranges = split_id_range(1, 100, 4)
+    assert ranges == [(None, 25), (25, 50), (50, 75), (75, None)]
+
+
+@pytest.fixture
+def orders(tmp_path):
+    conn = create_orders(str(tmp_path / "orders.db"), 1000)
+    yield conn
+    conn.close()
+
+
+def test_ranges_export_every_row_once(orders):
+    exported = []
+    for after, through in split_id_range(1, 1000, 3):
+        for records in iter_record_batches(orders, CUTOFF, batch_size=128, fetch_size=50, start_after=after, end_id=through):
+            exported.extend(r["Id"] for r in records)
+    assert exported == list(range(1, 1001))
+
+
+def test_page_ranges_include_a_page_closed_early(orders):
+    page_ranges = []
+    batches = iter_record_batches(orders, CUTOFF, batch_size=100, fetch_size=40, page_ranges=page_ranges)
+    for records in batches:
+        if records[-1]["Id"] >= 240:
+            break
+    batches.close()
+    assert page_ranges == [(1, 100), (101, 200), (201, 240)]
+
+
+def test_records_keep_datetimes_as_iso_strings(orders):
+    records = next(iter_record_batches(orders, CUTOFF, batch_size=10, fetch_size=10))
+    assert records[0]["OrderDate"] == "2024-01-01T00:00:01"
+    assert encode_ndjson(records[:1]).endswith(b"}\n")
+    assert encode_ndjson([]) == b""
+
+
+def remaining_ids(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT Id FROM Orders ORDER BY Id")
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def test_delete_range_repeats_until_a_short_batch(orders):
+    # Order i is dated 2024-01-01 plus i seconds: ids below 500 are older
+    cutoff = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=500)
+    metrics = JobMetrics()
+    deleted = delete_range_in_batches(orders, 101, 700, cutoff, delete_batch_size=64, metrics=metrics)
+
+    assert deleted == 399
+    # 6 full batches of 64, then 15 rows
+    assert metrics.counters["sql.round_trips"] == 7
+    assert metrics.counters["rows.deleted"] == 399
+    # Newer than the cutoff, or outside the range: kept
+    assert remaining_ids(orders) == list(range(1, 101)) + list(range(500, 1001))
+
+
+def test_delete_range_stops_on_an_empty_batch_after_an_exact_multiple(orders):
+    metrics = JobMetrics()
+    assert delete_range_in_batches(orders, 1, 128, CUTOFF, delete_batch_size=64, metrics=metrics) == 128
+    assert metrics.counters["sql.round_trips"] == 3
+    assert delete_range_in_batches(orders, 1, 128, CUTOFF, delete_batch_size=64) == 0
+
+
+def test_delete_ranges_deletes_every_exported_page(orders):
+    page_ranges = []
+    for _ in iter_record_batches(orders, CUTOFF, batch_size=300, fetch_size=100, end_id=900, page_ranges=page_ranges):
+        pass
+    assert delete_ranges_in_batches(orders, page_ranges, CUTOFF, delete_batch_size=128) == 900
+    assert remaining_ids(orders) == list(range(901, 1001))
+    assert count_rows(orders) == 100
@@ -0,0 +1,126 @@
+import base64
+import threading
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from blob_writer import BlockBlobWriter, make_block_id
+
+
+class FakeBlock:
+    def __init__(self, id, size):
+        self.id = id
+        self.size = size
+
+
+class FakeBlockBlobClient:
+    """Keeps staged blocks like the service: uncommitted until commit_block_list."""
+
+    def __init__(self, gate=None, fail_at=None):
+        self.staged = {}
+        self.committed = None
+        self.stage_calls = []
+        self.gate = gate
+        self.fail_at = fail_at
+        self._lock = threading.Lock()
+
+    def get_block_list(self, block_list_type):
+        if not self.staged and self.committed is None:
+            raise ResourceNotFoundError("BlobNotFound")
+        return [], [FakeBlock(id, len(data)) for id, data in self.staged.items()]
+
+    def stage_block(self, block_id, data):
+        if self.gate is not None:
+            self.gate.wait()
+        with self._lock:
+            self.stage_calls.append(block_id)
+            if len(self.stage_calls) == self.fail_at:
+                raise Exception("ServerBusy")
+            self.staged[block_id] = data
+
+    def commit_block_list(self, block_ids, content_settings=None):
+        self.committed = b"".join(self.staged[id] for id in block_ids)
+        self.staged = {}
+        return block_ids
+
+
+DATA = bytes(range(256)) * 10
+
+
+def test_block_ids_are_stable_and_equally_long():
+    first = make_block_id(0, b"abc")
+    assert first == make_block_id(0, b"abc")
+    assert first != make_block_id(0, b"abd")
+    assert first != make_block_id(1, b"abc")
+    assert len({len(make_block_id(i, DATA[:i])) for i in (0, 7, 12345678)}) == 1
+    assert base64.b64decode(first).startswith(b"00000000-")
+
+
+def test_blocks_are_committed_in_order():
+    client = FakeBlockBlobClient()
+    with BlockBlobWriter(client, block_size=100, max_in_flight=3) as writer:
+        for start in range(0, len(DATA), 33):
+            writer.write(DATA[start:start + 33])
+    assert client.committed == DATA
+    assert len(writer.block_ids) == 26
+    assert writer.bytes_written == len(DATA)
+
+
+def test_resume_reuses_blocks_a_failed_run_staged():
+    client = FakeBlockBlobClient(fail_at=4)
+    with pytest.raises(Exception, match="ServerBusy"):
+        with BlockBlobWriter(client, block_size=256, max_in_flight=1) as writer:
+            writer.write(DATA)
+    # abort() leaves the staged blocks for the next run
+    assert client.committed is None
+    assert len(client.staged) == 3
+
+    client.fail_at = None
+    client.stage_calls.clear()
+    with BlockBlobWriter(client, block_size=256, max_in_flight=2, resume=True) as writer:
+        writer.write(DATA)
+    assert writer.blocks_reused == 3
+    assert client.stage_calls == writer.block_ids[3:]
+    assert client.committed == DATA
+
+
+def test_resume_stages_blocks_whose_content_changed():
+    client = FakeBlockBlobClient()
+    with pytest.raises(Exception, match="stopped"):
+        with BlockBlobWriter(client, block_size=256, max_in_flight=1) as writer:
+            writer.write(DATA[:512])
+            raise Exception("stopped")
+
+    changed = DATA[:256] + bytes(256) + DATA[512:]
+    client.stage_calls.clear()
+    with BlockBlobWriter(client, block_size=256, resume=True) as writer:
+        writer.write(changed)
+    assert writer.blocks_reused == 1
+    assert len(client.stage_calls) == 9
+    assert client.committed == changed
+
+
+def test_resume_without_a_blob_stages_everything():
+    client = FakeBlockBlobClient()
+    with BlockBlobWriter(client, block_size=1024, resume=True) as writer:
+        writer.write(DATA)
+    assert writer.blocks_reused == 0
+    assert client.committed == DATA
+
+
+def test_write_blocks_once_max_in_flight_blocks_are_pending():
+    gate = threading.Event()
+    client = FakeBlockBlobClient(gate=gate)
+    writer = BlockBlobWriter(client, block_size=10, max_in_flight=2)
+
+    # The first block is uploading; a second one has to wait for it
+    writer.write(DATA[:10])
+    second = threading.Thread(target=writer.write, args=(DATA[10:20],))
+    second.start()
+    second.join(0.2)
+    assert second.is_alive()
+
+    gate.set()
+    second.join(5)
+    assert not second.is_alive()
+    writer.close()
+    assert client.committed == DATA[:20]
+    assert writer.wait_seconds > 0
@@ -0,0 +1,137 @@
+import datetime
+import itertools
+import json
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from checkpoint import DELETING, DONE, EXPORTING, JobCheckpoint
+
+CUTOFF = datetime.datetime(2025, 1, 1, 12, 0)
+NAME = "archive/orders/_checkpoint.json"
+
+
+class FakeDownloader:
+    def __init__(self, data, etag):
+        self.data = data
+        self.properties = type("Properties", (), {"etag": etag})
+
+    def readall(self):
+        return self.data
+
+
+class FakeBlobClient:
+    """Stores one blob and enforces upload_blob's ETag conditions like the service."""
+    etags = itertools.count(1)
+
+    def __init__(self, blobs, name):
+        self.blobs = blobs
+        self.name = name
+
+    def download_blob(self):
+        if self.name not in self.blobs:
+            raise ResourceNotFoundError("BlobNotFound")
+        data, etag = self.blobs[self.name]
+        return FakeDownloader(data, etag)
+
+    def upload_blob(self, data, overwrite=False, content_settings=None, etag=None, match_condition=None):
+        current = self.blobs.get(self.name)
+        if match_condition == MatchConditions.IfMissing and current is not None:
+            raise ResourceExistsError("BlobAlreadyExists")
+        if match_condition == MatchConditions.IfNotModified and (current is None or current[1] != etag):
+            raise ResourceModifiedError("ConditionNotMet")
+        new_etag = f'"0x{next(self.etags)}"'
+        self.blobs[self.name] = (data.encode(), new_etag)
+        return {"etag": new_etag}
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.blobs = {}
+
+    def get_blob_client(self, name):
+        return FakeBlobClient(self.blobs, name)
+
+
+def test_load_returns_none_without_a_checkpoint():
+    assert JobCheckpoint.load(FakeContainerClient(), NAME) is None
+
+
+def test_new_job_round_trips_through_save_and_load():
+    container = FakeContainerClient()
+    checkpoint = JobCheckpoint.new(container, NAME, CUTOFF, "archive/orders/orders20250131", id_ranges=[(None, 50), (50, None)])
+    checkpoint.save()
+
+    loaded = JobCheckpoint.load(container, NAME)
+    assert loaded.job_id == checkpoint.job_id
+    assert loaded.state == EXPORTING
+    assert loaded.cutoff == CUTOFF
+    assert [(r["after"], r["through"]) for r in loaded.ranges] == [(None, 50), (50, None)]
+    assert not loaded.export_done
+    assert loaded.etag == checkpoint.etag
+
+
+def test_state_moves_from_exporting_to_done():
+    container = FakeContainerClient()
+    checkpoint = JobCheckpoint.new(container, NAME, CUTOFF, "orders")
+    checkpoint.save()
+
+    checkpoint.ranges[0].update(lastId=99, segments=1, done=True)
+    checkpoint.pending_ranges.append((1, 99))
+    checkpoint.exported_rows = 99
+    checkpoint.state = DELETING
+    checkpoint.save()
+
+    loaded = JobCheckpoint.load(container, NAME)
+    assert loaded.export_done
+    assert loaded.state == DELETING
+    assert loaded.pending_ranges == [(1, 99)]
+
+    loaded.deleted_ranges.append(loaded.pending_ranges.pop(0))
+    loaded.deleted_rows = 99
+    loaded.state = DONE
+    loaded.save()
+    assert JobCheckpoint.load(container, NAME).state == DONE
+    assert json.loads(container.blobs[NAME][0])["deletedRanges"] == [[1, 99]]
+
+
+def test_a_stale_run_cannot_overwrite_the_checkpoint():
+    container = FakeContainerClient()
+    JobCheckpoint.new(container, NAME, CUTOFF, "orders").save()
+    first = JobCheckpoint.load(container, NAME)
+    second = JobCheckpoint.load(container, NAME)
+
+    first.state = DELETING
+    first.save()
+    second.state = DONE
+    with pytest.raises(ResourceModifiedError):
+        second.save()
+    assert JobCheckpoint.load(container, NAME).state == DELETING
+
+
+def test_a_new_job_replaces_only_the_checkpoint_it_was_started_from():
+    container = FakeContainerClient()
+    JobCheckpoint.new(container, NAME, CUTOFF, "orders").save()
+    # Without the previous checkpoint's ETag, a second job can't be created
+    with pytest.raises(ResourceExistsError):
+        JobCheckpoint.new(container, NAME, CUTOFF, "orders-2").save()
+
+    previous = JobCheckpoint.load(container, NAME)
+    JobCheckpoint.new(container, NAME, CUTOFF, "orders-2", previous=previous).save()
+    assert JobCheckpoint.load(container, NAME).base_name == "orders-2"
+
+
+def test_checkpoints_without_ranges_are_one_unbounded_range():
+    container = FakeContainerClient()
+    legacy = {"jobId": "j", "state": EXPORTING, "cutoff": CUTOFF.isoformat(), "baseName": "orders", "lastId": 42, "segments": 2}
+    container.blobs[NAME] = (json.dumps(legacy).encode(), '"0x0"')
+
+    checkpoint = JobCheckpoint.load(container, NAME)
+    assert checkpoint.ranges == [{"after": None, "through": None, "lastId": 42, "segments": 2, "done": False}]
+    assert checkpoint.segment_base_name(0) == "orders-002"
+
+
+def test_segment_names_are_unique_per_range_and_run():
+    checkpoint = JobCheckpoint.new(FakeContainerClient(), NAME, CUTOFF, "orders", id_ranges=[(None, 10), (10, None)])
+    assert checkpoint.segment_base_name(0) == "orders-r000"
+    checkpoint.ranges[1]["segments"] = 3
+    assert checkpoint.segment_base_name(1) == "orders-r001-003"
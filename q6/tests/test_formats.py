@@ -0,0 +1,93 @@
+import datetime
+import decimal
+import gzip
+import io
+import uuid
+import pytest
+from archive import resolve_column_types
+from formats import GzipNdjsonEncoder, ParquetEncoder, get_format
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+# As pyodbc reports them: (name, type_code, display_size, internal_size, precision, scale, null_ok)
+DESCRIPTION = [
+    ("Id", int, None, 10, 10, 0, False),
+    ("Id", int, None, 10, 10, 0, False),
+    ("OrderDate", datetime.datetime, None, 27, 27, 7, False),
+    ("Notes", str, None, 200, 200, 0, True),
+    ("Amount", decimal.Decimal, None, 10, 10, 2, True),
+    ("Shipped", bool, None, 1, 1, 0, True),
+    ("TrackingId", uuid.UUID, None, 16, 16, 0, True),
+]
+
+
+def make_record(i, nulls):
+    return {
+        "Id": i,
+        "OrderDate": datetime.datetime(2024, 1, 1) + datetime.timedelta(hours=i),
+        "Notes": None if nulls else f"note {i}",
+        "Amount": None if nulls else decimal.Decimal(f"{i}.25"),
+        "Shipped": None if nulls else i % 2 == 0,
+        "TrackingId": None if nulls else uuid.UUID(int=i),
+    }
+
+
+def test_resolve_column_types_uses_driver_types():
+    column_types = resolve_column_types(DESCRIPTION, (1, 1, None, None, None, None, None))
+    assert list(column_types) == ["Id", "OrderDate", "Notes", "Amount", "Shipped", "TrackingId"]
+    assert column_types["Amount"] == (decimal.Decimal, 10, 2)
+    assert column_types["Notes"] == (str, 200, 0)
+
+
+def test_resolve_column_types_sniffs_untyped_drivers():
+    description = [("Id", None, None, None, None, None, None), ("Notes", None, None, None, None, None, None)]
+    column_types = resolve_column_types(description, (1, None))
+    assert column_types == {"Id": (int, None, None), "Notes": (None, None, None)}
+
+
+def test_parquet_keeps_column_types_when_first_row_group_is_null(monkeypatch):
+    monkeypatch.setattr(ParquetEncoder, "row_group_size", 3)
+    column_types = resolve_column_types(DESCRIPTION, (1,) * len(DESCRIPTION))
+    out = io.BytesIO()
+    encoder = ParquetEncoder(out, column_types)
+    for start in range(1, 10, 2):
+        encoder.write([make_record(i, nulls=i <= 4) for i in (start, start + 1)])
+    encoder.close()
+
+    parquet = pq.ParquetFile(io.BytesIO(out.getvalue()))
+    assert parquet.num_row_groups == 3
+    table = parquet.read()
+    assert table.schema.field("Notes").type == pa.string()
+    assert table.schema.field("Amount").type == pa.decimal128(10, 2)
+    assert table.schema.field("Shipped").type == pa.bool_()
+    assert table.schema.field("OrderDate").type == pa.timestamp("us")
+    # No Arrow type for UUIDs: stored as strings
+    assert table.schema.field("TrackingId").type == pa.string()
+
+    assert table.column("Id").to_pylist() == list(range(1, 11))
+    assert table.column("Notes").to_pylist()[3:5] == [None, "note 5"]
+    assert table.column("Amount").to_pylist()[-1] == decimal.Decimal("10.25")
+    assert table.column("TrackingId").to_pylist()[-1] == str(uuid.UUID(int=10))
+
+
+def test_parquet_needs_column_types():
+    encoder = ParquetEncoder(io.BytesIO())
+    encoder.write([make_record(1, nulls=False)])
+    with pytest.raises(Exception, match="column types"):
+        encoder.close()
+
+
+def test_gzip_ndjson_is_one_gzip_stream():
+    out = io.BytesIO()
+    encoder = GzipNdjsonEncoder(out)
+    encoder.write([{"Id": 1}, {"Id": 2}])
+    encoder.write([{"Id": 3}])
+    encoder.close()
+    assert gzip.decompress(out.getvalue()) == b'{"Id": 1}\n{"Id": 2}\n{"Id": 3}\n'
+
+
+def test_get_format_rejects_unknown_names():
+    assert get_format("parquet") is ParquetEncoder
+    with pytest.raises(Exception, match="Unknown ARCHIVE_FORMAT"):
+        get_format("csv")
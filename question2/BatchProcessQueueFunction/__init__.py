@@ -0,0 +1,176 @@
+"""
+Batch mode for the image resizer.
+
+Every minute this pulls image-jobs messages in batches and runs them
+through a pipeline: download and upload on threads, decode + resize on a
+process pool with one worker per core, so several messages are in
+different stages at once. Each message is deleted when done or made
+visible again for a retry; after MAX_DEQUEUE_COUNT attempts it goes to
+image-jobs-poison, like with the queue trigger.
+
+Run either this or ProcessQueueFunction, e.g. set
+AzureWebJobs.ProcessQueueFunction.Disabled=true to use batch mode.
+"""
+import azure.functions as func
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from image_resizer import render_renditions
+from resize_job import run_job
+from storage_clients import get_blob_service, get_queue_client
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+QUEUE_NAME = os.getenv("IMAGE_JOBS_QUEUE", "image-jobs")
+# The queue service returns at most 32 messages per request
+RECEIVE_BATCH_SIZE = min(32, int(os.getenv("RESIZE_BATCH_SIZE", "32")))
+RESIZE_WORKERS = int(os.getenv("RESIZE_WORKERS", "0")) or os.cpu_count() or 1
+# Messages in flight (downloading, resizing or uploading) at once
+PIPELINE_DEPTH = int(os.getenv("RESIZE_PIPELINE_DEPTH", "0")) or RESIZE_WORKERS * 3
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+VISIBILITY_TIMEOUT = int(os.getenv("RESIZE_VISIBILITY_TIMEOUT", "300"))
+RETRY_DELAY = int(os.getenv("RESIZE_RETRY_DELAY", "30"))
+MAX_DEQUEUE_COUNT = 5
+# Stop taking new messages after this long, within the function timeout
+RUN_SECONDS = int(os.getenv("RESIZE_BATCH_RUN_SECONDS", "240"))
+
+pipeline_pool = ThreadPoolExecutor(max_workers=PIPELINE_DEPTH, thread_name_prefix="pipeline")
+upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="upload")
+_resize_pool = None
+_resize_pool_lock = threading.Lock()
+
+
+def get_resize_pool():
+    global _resize_pool
+    with _resize_pool_lock:
+        if _resize_pool is None:
+            # spawn: forking the threaded worker process isn't safe
+            _resize_pool = ProcessPoolExecutor(
+                max_workers=RESIZE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _resize_pool
+
+
+def reset_resize_pool(pool):
+    global _resize_pool
+    with _resize_pool_lock:
+        if _resize_pool is pool:
+            _resize_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main(mytimer: func.TimerRequest) -> None:
+    start_time = time.time()
+    deadline = start_time + RUN_SECONDS
+    queue = get_queue_client(QUEUE_NAME)
+
+    in_flight = set()
+    succeeded = failed = 0
+
+    def collect(done):
+        nonlocal succeeded, failed
+        for future in done:
+            in_flight.discard(future)
+            if future.result():
+                succeeded += 1
+            else:
+                failed += 1
+
+    while time.time() < deadline:
+        capacity = PIPELINE_DEPTH - len(in_flight)
+        if capacity <= 0:
+            collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            continue
+
+        count = min(RECEIVE_BATCH_SIZE, capacity)
+        messages = list(queue.receive_messages(
+            messages_per_page=count,
+            max_messages=count,
+            visibility_timeout=VISIBILITY_TIMEOUT
+        ))
+        if not messages:
+            if not in_flight:
+                break
+            collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            continue
+
+        for message in messages:
+            in_flight.add(pipeline_pool.submit(handle_message, queue, message))
+
+    collect(wait(in_flight).done)
+
+    elapsed = time.time() - start_time
+    total = succeeded + failed
+    logging.info(
+        f"Batch resize: {succeeded} succeeded, {failed} failed in {elapsed:.2f}s "
+        f"({total / elapsed if elapsed else 0:.1f} messages/s, {RESIZE_WORKERS} resize workers)"
+    )
+
+
+def handle_message(queue, message):
+    """Process one message end to end. Returns True if it succeeded."""
+    blob_service = get_blob_service("AZURE_STORAGE_CONNECTION")
+    blob_url = None
+
+    try:
+        job = json.loads(message.content)
+        blob_url = job["blobUrl"]
+        write_log(blob_service, run_job(blob_service, job, resize_in_pool, upload_pool))
+        queue.delete_message(message)
+        return True
+
+    except Exception as e:
+        logging.exception(f"Failed to process message {message.id} (attempt {message.dequeue_count})")
+        try:
+            if message.dequeue_count >= MAX_DEQUEUE_COUNT:
+                write_log(blob_service, {
+                    "original": blob_url,
+                    "error": str(e),
+                    "status": "failed after retries"
+                })
+                send_to_poison(message)
+                queue.delete_message(message)
+            else:
+                # Retry sooner than the full visibility timeout
+                queue.update_message(message, visibility_timeout=RETRY_DELAY)
+        except Exception:
+            # The message reappears after its visibility timeout anyway
+            logging.exception(f"Failed to release message {message.id}")
+        return False
+
+
+def resize_in_pool(data, sizes, formats, skip):
+    pool = get_resize_pool()
+    try:
+        return pool.submit(render_renditions, data, sizes, formats, skip).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a new pool for the next messages
+        reset_resize_pool(pool)
+        raise
+
+
+def send_to_poison(message):
+    poison = get_queue_client(f"{QUEUE_NAME}-poison")
+    try:
+        poison.send_message(message.content)
+    except ResourceNotFoundError:
+        try:
+            poison.create_queue()
+        except ResourceExistsError:
+            pass
+        poison.send_message(message.content)
+
+
+def write_log(blob_service, log_data):
+    log_blob = blob_service.get_blob_client(
+        container="function-logs",
+        blob=f"ImageResizer/{datetime.date.today()}/{uuid.uuid4()}.json"
+    )
+    log_blob.upload_blob(json.dumps(log_data), overwrite=True)
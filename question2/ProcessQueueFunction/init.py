@@ -1,62 +1,27 @@
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
-from urllib.parse import unquote
-from PIL import Image
-import io
+from concurrent.futures import ThreadPoolExecutor
+from image_resizer import iter_renditions
+from resize_job import run_job
+from storage_clients import get_blob_service
 import json
 import uuid
 import datetime
 import os
-import time
 
-def main(msg: func.QueueMessage):
-    start_time = time.time()
-
-    conn_str = os.getenv("AZURE_STORAGE_CONNECTION")
+# Rendition uploads and existence checks
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="upload")
 
-    blob_service = BlobServiceClient.from_connection_string(conn_str)
+def main(msg: func.QueueMessage):
+    blob_service = get_blob_service("AZURE_STORAGE_CONNECTION")
 
     message = msg.get_json()
     blob_url = message["blobUrl"]
-    sizes = message["sizes"]
 
     try:
-        
-        filename = unquote(blob_url.split("/")[-1])
-
-    
-        original_blob = blob_service.get_blob_client(
-            container="uploads",
-            blob=filename
-        )
-
-        image_bytes = original_blob.download_blob().readall()
-        image = Image.open(io.BytesIO(image_bytes))
-
-        resized_urls = []
-
-        for size in sizes:
-            img_copy = image.copy()
-            img_copy.thumbnail((size, size))
-
-            buffer = io.BytesIO()
-            img_copy.save(buffer, format="JPEG")
-            buffer.seek(0)
-
-            resized_blob = blob_service.get_blob_client(
-                container="resized",
-                blob=f"{size}/{uuid.uuid4()}.jpg"
-            )
-
-            resized_blob.upload_blob(buffer, overwrite=True)
-            resized_urls.append(resized_blob.url)
-
-        log_data = {
-            "original": blob_url,
-            "resized": resized_urls,
-            "processing_time": time.time() - start_time,
-            "status": "success"
-        }
+        # One reduced-resolution decode for the missing renditions, uploaded
+        # while the next size is resized
+        log_data = run_job(blob_service, message, iter_renditions, upload_pool)
 
         log_blob = blob_service.get_blob_client(
             container="function-logs",
@@ -0,0 +1,145 @@
+"""
+Resize benchmark on a synthetic 24MP JPEG.
+
+Compares the original ProcessQueueFunction loop (full decode, copy +
+thumbnail per size) with image_resizer.iter_resized. Each method runs in
+its own process so peak RSS is measured separately.
+
+--workers additionally measures images/s of render_renditions on a process
+pool of each size, the way BatchProcessQueueFunction runs it.
+
+    python benchmark_resize.py --sizes 1024 320 --runs 5 --workers 1 2 4
+"""
+import argparse
+import io
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from image_resizer import iter_resized, render_renditions
+
+
+def make_jpeg(width=6000, height=4000, quality=90):
+    """A photo-like test image: gradients, shapes and some noise."""
+    image = Image.merge("RGB", (
+        Image.linear_gradient("L").resize((width, height)),
+        Image.radial_gradient("L").resize((width, height)),
+        Image.effect_noise((width, height), 40),
+    ))
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, 150):
+        draw.ellipse((i, (i * 7) % height, i + 400, (i * 7) % height + 300), outline=(i % 255, 80, 200), width=12)
+    image = image.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def legacy_resize(data, sizes):
+    """The original loop: full-resolution decode, copy + thumbnail per size."""
+    image = Image.open(io.BytesIO(data))
+    outputs = {}
+    for size in sizes:
+        img_copy = image.copy()
+        img_copy.thumbnail((size, size))
+        buffer = io.BytesIO()
+        img_copy.save(buffer, format="JPEG")
+        outputs[size] = buffer.getvalue()
+    return outputs
+
+
+def engine_resize(data, sizes):
+    outputs = {}
+    for size, resized in iter_resized(data, sizes):
+        buffer = io.BytesIO()
+        resized.save(buffer, format="JPEG")
+        outputs[size] = buffer.getvalue()
+    return outputs
+
+
+METHODS = {"legacy": legacy_resize, "engine": engine_resize}
+
+
+def max_rss_mb():
+    # VmHWM is this process's own peak; on Linux ru_maxrss also carries the
+    # parent's peak over exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_method(name, data, sizes, runs, results):
+    baseline = max_rss_mb()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        outputs = METHODS[name](data, sizes)
+        timings.append(time.perf_counter() - started)
+    results[name] = {
+        "best": min(timings),
+        "mean": sum(timings) / len(timings),
+        "peak_mb": max_rss_mb() - baseline,
+        "bytes": {size: len(out) for size, out in outputs.items()},
+    }
+
+
+def pool_throughput(data, sizes, workers, images):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        # Start the workers before timing
+        list(pool.map(render_renditions, [data] * workers, [sizes] * workers))
+        started = time.perf_counter()
+        list(pool.map(render_renditions, [data] * images, [sizes] * images))
+        return images / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 1024])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="*", default=[], help="process pool sizes to measure")
+    args = parser.parse_args()
+
+    data = make_jpeg(args.width, args.height)
+    print(f"input {args.width}x{args.height} ({args.width * args.height / 1e6:.0f}MP), "
+          f"{len(data) / 1e6:.1f} MB JPEG, sizes {args.sizes}")
+
+    # Fresh process per method; the input is passed in, so it is not counted
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        for name in METHODS:
+            proc = ctx.Process(target=run_method, args=(name, data, args.sizes, args.runs, results))
+            proc.start()
+            proc.join()
+        results = dict(results)
+
+    legacy = results["legacy"]
+    for name, result in results.items():
+        print(f"{name:<7} best {result['best'] * 1000:8.1f}ms  mean {result['mean'] * 1000:8.1f}ms  "
+              f"peak +{result['peak_mb']:7.1f} MB  x{legacy['best'] / result['best']:.1f} faster  "
+              f"x{legacy['peak_mb'] / max(result['peak_mb'], 0.1):.1f} less memory  "
+              f"output {result['bytes']}")
+
+    baseline = None
+    for workers in args.workers:
+        rate = pool_throughput(data, args.sizes, workers, images=workers * 8)
+        baseline = baseline or rate / workers
+        print(f"pool    {workers:>2} workers  {rate:6.1f} images/s  x{rate / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Resize engine shared by the resizer functions.
+
+The original is decoded once, at the lowest resolution the largest
+requested size allows: JPEG draft mode lets libjpeg scale by 1/2, 1/4 or
+1/8 while decoding, other formats are box-reduced right after loading.
+Sizes are then produced largest first, each from the previous output
+rather than from the original, and every intermediate image is closed as
+soon as the next one is made.
+
+Each size is encoded with a rendition profile: output formats (jpeg,
+webp, avif, png), quality, progressive/optimize and metadata stripping.
+Defaults can be overridden per size with the RENDITION_PROFILES app
+setting, e.g.
+
+    {"default": {"formats": ["webp", "jpeg"]},
+     "320": {"quality": {"jpeg": 70, "webp": 65}}}
+"""
+import collections
+import hashlib
+import io
+import json
+import os
+from PIL import Image, ImageOps
+
+# Draft/reduce only down to REDUCING_GAP times a target size and resample
+# the rest, like Image.thumbnail (same defaults, so output quality is
+# unchanged). Lower is faster, 1.0 lets draft/reduce do all it can.
+REDUCING_GAP = float(os.getenv("IMAGE_REDUCING_GAP", "2.0"))
+RESAMPLE = Image.Resampling.BICUBIC
+
+OutputFormat = collections.namedtuple("OutputFormat", "pil_format extension content_type alpha")
+
+OUTPUT_FORMATS = {
+    "jpeg": OutputFormat("JPEG", "jpg", "image/jpeg", False),
+    "webp": OutputFormat("WEBP", "webp", "image/webp", True),
+    "avif": OutputFormat("AVIF", "avif", "image/avif", True),
+    "png": OutputFormat("PNG", "png", "image/png", True),
+}
+
+DEFAULT_QUALITY = {"jpeg": 75, "webp": 75, "avif": 55}
+
+DEFAULT_PROFILE = {
+    "formats": ["jpeg"],
+    # A number, or per format: {"jpeg": 80, "webp": 75}
+    "quality": DEFAULT_QUALITY,
+    "progressive": True,
+    "optimize": True,
+    # Drop EXIF (camera, GPS, ...); the ICC colour profile is always kept
+    "strip_metadata": True,
+    # JPEG has no alpha channel; transparent pixels are flattened onto this
+    "background": "#ffffff",
+}
+
+RENDITION_PROFILES = json.loads(os.getenv("RENDITION_PROFILES") or "{}")
+
+# An encoded rendition, plain data so it can come back from a process pool
+Rendition = collections.namedtuple("Rendition", "size format extension content_type data")
+
+
+def fit_within(image_size, box):
+    """Size of image_size scaled down (never up) to fit in a box x box square."""
+    width, height = image_size
+    if width <= box and height <= box:
+        return width, height
+    scale = box / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def open_for_size(data, max_size):
+    """Open and decode image bytes at the lowest resolution that still covers max_size."""
+    image = Image.open(io.BytesIO(data))
+    target = fit_within(image.size, max_size)
+    # Only JPEG honours draft(); for other formats this is a no-op
+    image.draft(None, (int(target[0] * REDUCING_GAP), int(target[1] * REDUCING_GAP)))
+    image.load()
+    if image.mode in ("1", "P"):
+        # Palette images would otherwise be resized with NEAREST
+        image = _replace(image, image.convert("RGBA" if _has_alpha(image) else "RGB"))
+    factor = int(min(image.width / target[0], image.height / target[1]) / REDUCING_GAP)
+    if factor > 1:
+        image = _replace(image, image.reduce(factor))
+    # Bake the EXIF orientation into the pixels, as the tag may be stripped
+    ImageOps.exif_transpose(image, in_place=True)
+    return image
+
+
+def _replace(old, new):
+    if new is not old:
+        old.close()
+    return new
+
+
+def _has_alpha(image):
+    return image.mode in ("RGBA", "LA", "PA", "RGBa", "La") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def iter_resized(data, sizes):
+    """
+    Yields (size, image) for each distinct size, largest first, where image
+    fits in a size x size box. A yielded image is closed once the next size
+    has been made from it, so use (encode) it inside the loop.
+    """
+    ordered = sorted({int(size) for size in sizes}, reverse=True)
+    if not ordered:
+        return
+    current = open_for_size(data, ordered[0])
+    try:
+        for size in ordered:
+            target = fit_within(current.size, size)
+            if target != current.size:
+                resized = current.resize(target, RESAMPLE, reducing_gap=REDUCING_GAP)
+                current.close()
+                current = resized
+            yield size, current
+    finally:
+        current.close()
+
+
+def profile_for(size):
+    """Rendition profile of a size: defaults < RENDITION_PROFILES "default" < RENDITION_PROFILES "<size>"."""
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(RENDITION_PROFILES.get("default", {}))
+    profile.update(RENDITION_PROFILES.get(str(size), {}))
+    return profile
+
+
+def get_output_format(name):
+    fmt = OUTPUT_FORMATS.get(str(name).lower())
+    if fmt is None:
+        raise Exception(f"Unsupported rendition format '{name}', expected one of {', '.join(OUTPUT_FORMATS)}")
+    if fmt.pil_format not in Image.SAVE:
+        Image.init()
+        if fmt.pil_format not in Image.SAVE:
+            raise Exception(f"This Pillow build can't write {fmt.pil_format}")
+    return fmt
+
+
+def _prepare(image, fmt, profile):
+    """Image in a mode the format can store; a new image if it had to convert."""
+    if _has_alpha(image):
+        if fmt.alpha:
+            return image if image.mode == "RGBA" else image.convert("RGBA")
+        rgba = image if image.mode == "RGBA" else image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, profile["background"])
+        flattened.paste(rgba, mask=rgba.getchannel("A"))
+        flattened.info = dict(image.info)
+        if rgba is not image:
+            rgba.close()
+        return flattened
+    if image.mode in ("RGB", "L") or (image.mode == "CMYK" and fmt.pil_format == "JPEG"):
+        return image
+    return image.convert("RGB")
+
+
+def _quality(name, profile):
+    quality = profile["quality"]
+    if isinstance(quality, dict):
+        quality = quality.get(name, DEFAULT_QUALITY.get(name))
+    if quality is None or name not in DEFAULT_QUALITY:
+        return None
+    return int(quality)
+
+
+def _save_options(name, fmt, profile, image):
+    options = {}
+    quality = _quality(name, profile)
+    if quality is not None:
+        options["quality"] = quality
+    if name == "jpeg":
+        options["progressive"] = bool(profile["progressive"])
+        options["optimize"] = bool(profile["optimize"])
+    elif name == "png":
+        options["optimize"] = bool(profile["optimize"])
+    elif name == "webp":
+        # 0 (fast) .. 6 (smallest)
+        options["method"] = 6 if profile["optimize"] else 4
+    icc_profile = image.info.get("icc_profile")
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    exif = image.info.get("exif")
+    if exif and not profile["strip_metadata"]:
+        options["exif"] = exif
+    return options
+
+
+def encode_rendition(image, size, format_name, profile):
+    name = str(format_name).lower()
+    fmt = get_output_format(name)
+    prepared = _prepare(image, fmt, profile)
+    try:
+        buffer = io.BytesIO()
+        prepared.save(buffer, format=fmt.pil_format, **_save_options(name, fmt, profile, prepared))
+    finally:
+        if prepared is not image:
+            prepared.close()
+    return Rendition(size, name, fmt.extension, fmt.content_type, buffer.getvalue())
+
+
+def plan_renditions(sizes, formats=None):
+    """[(size, format)] that iter_renditions would produce, without decoding anything."""
+    for name in formats or []:
+        get_output_format(name)
+    plan = []
+    for size in sorted({int(size) for size in sizes}, reverse=True):
+        for name in formats or profile_for(size)["formats"]:
+            plan.append((size, str(name).lower()))
+    return plan
+
+
+def rendition_name(content_hash, size, format_name):
+    """
+    Blob name of a rendition: the source's content hash plus a short digest
+    of the encoder settings, so identical sources share renditions and a
+    changed profile never reuses a stale (immutable-cached) one.
+    """
+    name = str(format_name).lower()
+    profile = profile_for(size)
+    settings = {
+        "quality": _quality(name, profile),
+        "progressive": profile["progressive"],
+        "optimize": profile["optimize"],
+        "strip_metadata": profile["strip_metadata"],
+        "background": profile["background"],
+        "reducing_gap": REDUCING_GAP,
+    }
+    tag = hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"{size}/{content_hash}-{tag}.{get_output_format(name).extension}"
+
+
+def iter_renditions(data, sizes, formats=None, skip=()):
+    """
+    Yields a Rendition per size and format, largest size first. formats
+    (e.g. from the job message) replaces the profiles' format lists.
+    (size, format) pairs in skip are not made; sizes with nothing left to
+    make are not even resized.
+    """
+    wanted = {}
+    for size, name in plan_renditions(sizes, formats):
+        if (size, name) not in skip:
+            wanted.setdefault(size, []).append(name)
+    for size, resized in iter_resized(data, wanted):
+        profile = profile_for(size)
+        for name in wanted[size]:
+            yield encode_rendition(resized, size, name, profile)
+
+
+def render_renditions(data, sizes, formats=None, skip=()):
+    """All renditions as a list; takes and returns plain data so it can run in a process pool."""
+    return list(iter_renditions(data, sizes, formats, skip))
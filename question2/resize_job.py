@@ -0,0 +1,100 @@
+"""
+One image-jobs message, shared by the queue-triggered and batch resizers.
+
+Renditions are named after the source's SHA-256 (sent by uploadFunction,
+or computed after download), so a duplicate or retried job first checks
+which renditions already exist with HEAD requests and only downloads,
+decodes and encodes the missing ones.
+
+Jobs from upload-complete carry the ETag of the blob whose size it
+checked. The blob is only downloaded at that ETag; if the client
+overwrote it through the still valid SAS, the job is rejected.
+"""
+import hashlib
+import re
+import time
+from urllib.parse import unquote
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+from image_resizer import plan_renditions, rendition_name
+from storage_clients import existing_blobs, upload_rendition
+
+UPLOADS_CONTAINER = "uploads"
+RESIZED_CONTAINER = "resized"
+
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+
+def find_existing(blob_service, content_hash, plan, executor):
+    names = {pair: rendition_name(content_hash, *pair) for pair in plan}
+    found = existing_blobs(blob_service, RESIZED_CONTAINER, names.values(), executor)
+    return {pair for pair, name in names.items() if name in found}
+
+
+def run_job(blob_service, job, render, executor):
+    """
+    Make and store the job's missing renditions. render(data, sizes,
+    formats, skip) returns image_resizer.Renditions; uploads and HEAD
+    checks run on executor. Returns the success log entry.
+    """
+    start_time = time.time()
+    blob_url = job["blobUrl"]
+    sizes = job["sizes"]
+    # Optional, e.g. ["avif", "webp", "jpeg"]; otherwise the size profiles decide
+    formats = job.get("formats")
+    content_hash = job.get("sha256")
+    if not (isinstance(content_hash, str) and SHA256_HEX.match(content_hash)):
+        content_hash = None
+
+    plan = plan_renditions(sizes, formats)
+    existing = find_existing(blob_service, content_hash, plan, executor) if content_hash else set()
+
+    uploads = []
+    if len(existing) < len(plan):
+        filename = unquote(blob_url.split("/")[-1])
+        original_blob = blob_service.get_blob_client(container=UPLOADS_CONTAINER, blob=filename)
+        etag = job.get("etag")
+        try:
+            if etag:
+                download = original_blob.download_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+            else:
+                download = original_blob.download_blob()
+            image_bytes = download.readall()
+        except ResourceModifiedError:
+            # Retrying can't help; upload-complete must check the new version
+            return {
+                "original": blob_url,
+                "error": f"Blob changed after its size was checked (ETag {etag})",
+                "status": "rejected"
+            }
+        if content_hash is None:
+            content_hash = hashlib.sha256(image_bytes).hexdigest()
+            existing = find_existing(blob_service, content_hash, plan, executor)
+
+        for rendition in render(image_bytes, sizes, formats, existing):
+            name = rendition_name(content_hash, rendition.size, rendition.format)
+            entry = {"size": rendition.size, "format": rendition.format, "bytes": len(rendition.data)}
+            uploads.append((entry, executor.submit(upload_rendition, blob_service, name, rendition, RESIZED_CONTAINER)))
+
+    # The log is only written once every rendition is stored
+    renditions = [dict(entry, url=upload.result()) for entry, upload in uploads]
+    for size, name in existing:
+        url = blob_service.get_blob_client(
+            container=RESIZED_CONTAINER,
+            blob=rendition_name(content_hash, size, name)
+        ).url
+        renditions.append({"size": size, "format": name, "url": url, "existing": True})
+    # Message size order, then format order
+    size_order = {int(size): i for i, size in enumerate(sizes)}
+    plan_order = {pair: i for i, pair in enumerate(plan)}
+    renditions.sort(key=lambda r: (size_order[r["size"]], plan_order[(r["size"], r["format"])]))
+
+    return {
+        "original": blob_url,
+        "sha256": content_hash,
+        "resized": [r["url"] for r in renditions],
+        "renditions": renditions,
+        "skipped": len(existing),
+        "processing_time": time.time() - start_time,
+        "status": "success"
+    }
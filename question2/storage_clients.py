@@ -0,0 +1,125 @@
+"""
+Storage clients shared by every invocation in the worker process.
+
+All clients send through one requests.Session whose connection pool is
+large enough for the concurrent uploads, so connections (and their TLS
+sessions) are kept alive and reused instead of being set up per message.
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.storage.queue import BinaryBase64DecodePolicy, BinaryBase64EncodePolicy, QueueClient
+
+# Keep-alive connections kept per host; should cover UPLOAD_CONCURRENCY
+BLOB_POOL_SIZE = int(os.getenv("BLOB_POOL_SIZE", "32"))
+BLOB_CONNECTION_TIMEOUT = int(os.getenv("BLOB_CONNECTION_TIMEOUT", "10"))
+BLOB_READ_TIMEOUT = int(os.getenv("BLOB_READ_TIMEOUT", "120"))
+# Uploads larger than this are sent as blocks of BLOB_MAX_BLOCK_SIZE,
+# several at a time with max_concurrency
+BLOB_MAX_SINGLE_PUT_SIZE = int(os.getenv("BLOB_MAX_SINGLE_PUT_SIZE", str(8 * 1024 * 1024)))
+BLOB_MAX_BLOCK_SIZE = int(os.getenv("BLOB_MAX_BLOCK_SIZE", str(4 * 1024 * 1024)))
+# Rendition names are content addressed (see image_resizer.rendition_name),
+# so CDNs and browsers may cache them for good
+RENDITION_CACHE_CONTROL = os.getenv("RENDITION_CACHE_CONTROL", "public, max-age=31536000, immutable")
+
+# Re-entrant: clients are created under it, and get_session takes it again
+_lock = threading.RLock()
+_session = None
+_blob_services = {}
+_queue_clients = {}
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            # azure-core's retry policy handles retries
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BLOB_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _connection_string(setting):
+    conn_str = os.getenv(setting)
+    if not conn_str:
+        raise Exception(f"{setting} is required")
+    return conn_str
+
+
+def _transport():
+    return RequestsTransport(
+        session=get_session(),
+        session_owner=False,
+        connection_timeout=BLOB_CONNECTION_TIMEOUT,
+        read_timeout=BLOB_READ_TIMEOUT
+    )
+
+
+def get_blob_service(setting="AZURE_STORAGE_CONNECTION"):
+    """BlobServiceClient for the connection string in app setting `setting`, created once."""
+    client = _blob_services.get(setting)
+    if client is not None:
+        return client
+
+    conn_str = _connection_string(setting)
+    with _lock:
+        if setting not in _blob_services:
+            _blob_services[setting] = BlobServiceClient.from_connection_string(
+                conn_str,
+                transport=_transport(),
+                max_single_put_size=BLOB_MAX_SINGLE_PUT_SIZE,
+                max_block_size=BLOB_MAX_BLOCK_SIZE
+            )
+        return _blob_services[setting]
+
+
+def get_queue_client(queue_name, setting="AzureWebJobsStorage"):
+    """
+    QueueClient for queue_name, created once. Messages are base64 like the
+    Functions queue bindings write and read them; content comes back as bytes.
+    """
+    key = (setting, queue_name)
+    client = _queue_clients.get(key)
+    if client is not None:
+        return client
+
+    conn_str = _connection_string(setting)
+    with _lock:
+        if key not in _queue_clients:
+            _queue_clients[key] = QueueClient.from_connection_string(
+                conn_str,
+                queue_name,
+                message_encode_policy=BinaryBase64EncodePolicy(),
+                message_decode_policy=BinaryBase64DecodePolicy(),
+                transport=_transport()
+            )
+        return _queue_clients[key]
+
+
+def existing_blobs(blob_service, container, names, executor):
+    """The subset of names that exist in container, checked with concurrent HEAD requests."""
+    checks = {
+        name: executor.submit(blob_service.get_blob_client(container=container, blob=name).exists)
+        for name in names
+    }
+    return {name for name, check in checks.items() if check.result()}
+
+
+def upload_rendition(blob_service, name, rendition, container="resized"):
+    """Store an image_resizer.Rendition with its Content-Type and Cache-Control. Returns the blob URL."""
+    blob_client = blob_service.get_blob_client(container=container, blob=name)
+    blob_client.upload_blob(
+        rendition.data,
+        overwrite=True,
+        content_settings=ContentSettings(
+            content_type=rendition.content_type,
+            cache_control=RENDITION_CACHE_CONTROL
+        )
+    )
+    return blob_client.url
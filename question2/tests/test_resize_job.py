@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+from resize_job import run_job
+
+
+class FakeDownload:
+    def __init__(self, data):
+        self.data = data
+
+    def readall(self):
+        return self.data
+
+
+class FakeBlob:
+    def __init__(self, store, container, name):
+        self.store = store
+        self.key = (container, name)
+        self.url = f"https://devaccount.blob.core.windows.net/{container}/{name}"
+
+    def exists(self):
+        return self.key in self.store.blobs
+
+    def download_blob(self, etag=None, match_condition=None):
+        data, current_etag = self.store.blobs[self.key]
+        if match_condition == MatchConditions.IfNotModified and etag != current_etag:
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        self.store.downloads += 1
+        return FakeDownload(data)
+
+
+class FakeBlobService:
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = 0
+
+    def get_blob_client(self, container, blob):
+        return FakeBlob(self, container, blob)
+
+
+def render_nothing(data, sizes, formats, skip):
+    return []
+
+
+def test_job_downloads_the_checked_version():
+    blob_service = FakeBlobService()
+    blob_service.blobs[("uploads", "a.jpg")] = (b"image", '"0x1"')
+    job = {"blobUrl": "https://devaccount.blob.core.windows.net/uploads/a.jpg", "etag": '"0x1"', "sizes": [320]}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        log = run_job(blob_service, job, render_nothing, executor)
+    assert log["status"] == "success"
+    assert blob_service.downloads == 1
+
+
+def test_job_rejects_a_blob_overwritten_after_the_check():
+    blob_service = FakeBlobService()
+    blob_service.blobs[("uploads", "a.jpg")] = (b"much larger image", '"0x2"')
+    job = {"blobUrl": "https://devaccount.blob.core.windows.net/uploads/a.jpg", "etag": '"0x1"', "sizes": [320]}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        log = run_job(blob_service, job, render_nothing, executor)
+    assert log["status"] == "rejected"
+    assert blob_service.downloads == 0
@@ -0,0 +1,43 @@
+import threading
+import pytest
+import storage_clients
+
+CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=https;AccountName=devaccount;"
+    "AccountKey=ZGV2LWtleS1ub3QtYS1yZWFsLWtleQ==;EndpointSuffix=core.windows.net"
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setenv("AZURE_STORAGE_CONNECTION", CONNECTION_STRING)
+    monkeypatch.setenv("AzureWebJobsStorage", CONNECTION_STRING)
+    monkeypatch.setattr(storage_clients, "_session", None)
+    monkeypatch.setattr(storage_clients, "_blob_services", {})
+    monkeypatch.setattr(storage_clients, "_queue_clients", {})
+
+
+def call_with_timeout(function, timeout=10):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=function()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "client creation did not return (deadlock?)"
+    return result["value"]
+
+
+def test_clients_are_created_once_without_deadlocking():
+    # Creating a client takes the module lock, and so does get_session
+    blob_service = call_with_timeout(storage_clients.get_blob_service)
+    queue = call_with_timeout(lambda: storage_clients.get_queue_client("image-jobs"))
+    assert blob_service.account_name == "devaccount"
+    assert queue.queue_name == "image-jobs"
+
+    assert storage_clients.get_blob_service() is blob_service
+    assert storage_clients.get_queue_client("image-jobs") is queue
+
+
+def test_missing_setting_is_reported(monkeypatch):
+    monkeypatch.delenv("AZURE_STORAGE_CONNECTION")
+    with pytest.raises(Exception, match="AZURE_STORAGE_CONNECTION is required"):
+        storage_clients.get_blob_service()
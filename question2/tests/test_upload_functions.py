@@ -0,0 +1,28 @@
+import json
+import azure.functions as func
+import uploadUrlFunction
+from uploadFunction import init as uploadFunction
+
+
+class FakeOut:
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+def test_upload_url_rejects_a_size_that_is_not_a_number():
+    req = func.HttpRequest("POST", "/api/upload-url", body=json.dumps({"filename": "a.jpg", "size": "big"}).encode())
+    response = uploadUrlFunction.main(req)
+    assert response.status_code == 400
+
+
+def test_upload_rejects_an_invalid_content_length():
+    req = func.HttpRequest(
+        "POST", "/api/upload", body=b"image", headers={"Content-Length": "five"}, params={"filename": "a.jpg"}
+    )
+    msg = FakeOut()
+    response = uploadFunction.main(req, msg)
+    assert response.status_code == 400
+    assert msg.value is None
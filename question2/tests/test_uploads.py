@@ -0,0 +1,48 @@
+import datetime
+from urllib.parse import parse_qs, urlparse
+from azure.storage.blob import BlobServiceClient
+from uploads import (
+    DIRECT_UPLOAD_NAME, UPLOAD_MAX_BYTES, blob_name_for, direct_upload_name, file_extension,
+    parse_size, too_large, upload_sas_url
+)
+
+CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=https;AccountName=devaccount;"
+    "AccountKey=ZGV2LWtleS1ub3QtYS1yZWFsLWtleQ==;EndpointSuffix=core.windows.net"
+)
+
+
+def test_parse_size_accepts_only_byte_counts():
+    assert parse_size("1024") == 1024
+    assert parse_size(2048) == 2048
+    assert parse_size("0") == 0
+    for value in ("abc", "", "1e3", None, [], "-1", -5):
+        assert parse_size(value) is None
+
+
+def test_too_large():
+    assert not too_large(None)
+    assert not too_large(UPLOAD_MAX_BYTES)
+    assert too_large(UPLOAD_MAX_BYTES + 1)
+
+
+def test_blob_names_keep_only_safe_extensions():
+    assert file_extension("Photo.JPG") == ".jpg"
+    assert file_extension("archive.tar.gz") == ".gz"
+    assert file_extension("evil.j/pg") == ""
+    assert file_extension(None) == ""
+    assert blob_name_for("ab" * 32, "x.png") == "ab" * 32 + ".png"
+    assert DIRECT_UPLOAD_NAME.match(direct_upload_name("photo.webp"))
+    assert not DIRECT_UPLOAD_NAME.match("../" + direct_upload_name("photo.webp"))
+
+
+def test_upload_sas_url_only_grants_create_and_write():
+    blob_service = BlobServiceClient.from_connection_string(CONNECTION_STRING)
+    url, expiry = upload_sas_url(blob_service, "0" * 32 + ".jpg", minutes=10)
+
+    parsed = urlparse(url)
+    assert parsed.path == "/uploads/" + "0" * 32 + ".jpg"
+    query = parse_qs(parsed.query)
+    assert query["sp"] == ["cw"]
+    assert query["sr"] == ["b"]
+    assert datetime.timedelta(minutes=9) < expiry - datetime.datetime.now(datetime.timezone.utc) <= datetime.timedelta(minutes=10)
@@ -0,0 +1,53 @@
+"""
+Last step of a direct upload: POST /api/upload-complete with
+{"blobName": "..."} once the PUT to the upload URL has finished. Checks
+the blob and queues the resize job. The SAS can't limit the size, so an
+oversized blob is deleted here instead of being resized. The SAS stays
+writable until it expires, so the job carries the ETag of the checked
+blob and the resizer only reads that version.
+"""
+import azure.functions as func
+from azure.core.exceptions import ResourceNotFoundError
+from storage_clients import get_blob_service
+from uploads import DEFAULT_SIZES, DIRECT_UPLOAD_NAME, UPLOAD_MAX_BYTES, UPLOADS_CONTAINER, too_large
+import json
+
+
+def main(req: func.HttpRequest, msg: func.Out[str]) -> func.HttpResponse:
+    try:
+        try:
+            body = req.get_json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            body = {}
+
+        blob_name = body.get("blobName")
+        # Only blobs handed out by upload-url, not any blob in the container
+        if not isinstance(blob_name, str) or not DIRECT_UPLOAD_NAME.match(blob_name):
+            return func.HttpResponse("blobName from /api/upload-url is required.", status_code=400)
+
+        blob_client = get_blob_service("AzureWebJobsStorage").get_blob_client(
+            container=UPLOADS_CONTAINER, blob=blob_name
+        )
+        try:
+            properties = blob_client.get_blob_properties()
+        except ResourceNotFoundError:
+            return func.HttpResponse("Upload not found; PUT the file to the upload URL first.", status_code=404)
+
+        if too_large(properties.size):
+            blob_client.delete_blob()
+            return func.HttpResponse(f"File too large, the limit is {UPLOAD_MAX_BYTES} bytes.", status_code=413)
+
+        # No sha256: the resizer hashes the file after downloading it
+        job = {
+            "blobUrl": blob_client.url,
+            "etag": properties.etag,
+            "sizes": DEFAULT_SIZES
+        }
+        msg.set(json.dumps(job))
+
+        return func.HttpResponse(f"Queued successfully: {blob_client.url}", status_code=202)
+
+    except Exception as e:
+        return func.HttpResponse(str(e), status_code=500)
@@ -1,29 +1,86 @@
 import azure.functions as func
-from azure.storage.blob import BlobServiceClient
-import os
+from azure.storage.blob import ContentSettings
+from storage_clients import get_blob_service
+from uploads import (
+    DEFAULT_SIZES, UPLOAD_MAX_BYTES, UPLOAD_MAX_CONCURRENCY, UPLOADS_CONTAINER,
+    blob_name_for, content_sha256, parse_size, too_large
+)
+from urllib.parse import quote
+import io
 import json
 
-def main(req: func.HttpRequest, msg: func.Out[str]) -> func.HttpResponse:
-    try:
 
+def read_upload(req):
+    """
+    (stream, filename, content_type) of the posted file: a multipart "file"
+    field, or the raw request body with ?filename=... The raw body is used
+    as is, without the copies multipart parsing makes.
+    """
+    content_type = req.headers.get("Content-Type", "")
+    if content_type.startswith("multipart/form-data"):
         file = req.files.get('file')
         if not file:
+            return None
+        return file.stream, file.filename, file.content_type
+
+    body = req.get_body()
+    if not body:
+        return None
+    return io.BytesIO(body), req.params.get("filename"), content_type or "application/octet-stream"
+
+
+def too_large_response():
+    return func.HttpResponse(
+        f"File too large, the limit is {UPLOAD_MAX_BYTES} bytes; use /api/upload-url for large files.",
+        status_code=413
+    )
+
+
+def main(req: func.HttpRequest, msg: func.Out[str]) -> func.HttpResponse:
+    try:
+        # Refuse big uploads before the body is parsed
+        content_length = req.headers.get("Content-Length")
+        if content_length:
+            content_length = parse_size(content_length)
+            if content_length is None:
+                return func.HttpResponse("Invalid Content-Length header.", status_code=400)
+            if too_large(content_length):
+                return too_large_response()
+
+        upload = read_upload(req)
+        if not upload:
             return func.HttpResponse("No file uploaded.", status_code=400)
+        stream, filename, content_type = upload
 
-        blob_service = BlobServiceClient.from_connection_string(
-            os.environ["AzureWebJobsStorage"]
-        )
+        size = stream.seek(0, io.SEEK_END)
+        stream.seek(0)
+        if too_large(size):
+            return too_large_response()
 
-        uploads_container = blob_service.get_container_client("uploads")
+        blob_service = get_blob_service("AzureWebJobsStorage")
+        uploads_container = blob_service.get_container_client(UPLOADS_CONTAINER)
 
-        blob_client = uploads_container.get_blob_client(file.filename)
-        blob_client.upload_blob(file.stream, overwrite=True)
+        content_hash = content_sha256(stream)
+        blob_client = uploads_container.get_blob_client(blob_name_for(content_hash, filename))
+        # Same content already stored: skip the upload, the job still runs
+        # (and finds its renditions with HEAD requests)
+        if not blob_client.exists():
+            # Large files go up as blocks, UPLOAD_MAX_CONCURRENCY at a time
+            blob_client.upload_blob(
+                stream,
+                length=size,
+                overwrite=True,
+                max_concurrency=UPLOAD_MAX_CONCURRENCY,
+                metadata={"sha256": content_hash, "filename": quote(filename or "")},
+                content_settings=ContentSettings(content_type=content_type)
+            )
 
         blob_url = blob_client.url
 
         job = {
             "blobUrl": blob_url,
-            "sizes": [320, 1024]
+            "sha256": content_hash,
+            "sizes": DEFAULT_SIZES
         }
         msg.set(json.dumps(job))
 
@@ -32,4 +89,4 @@ def main(req: func.HttpRequest, msg: func.Out[str]) -> func.HttpResponse:
         )
 
     except Exception as e:
-        return func.HttpResponse(str(e), status_code=500)
\ No newline at end of file
+        return func.HttpResponse(str(e), status_code=500)
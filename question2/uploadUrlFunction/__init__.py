@@ -0,0 +1,50 @@
+"""
+First step of a direct upload: POST /api/upload-url with
+{"filename": "photo.jpg", "size": 123456} returns a short-lived SAS URL.
+The client PUTs the file to it (with the returned headers), then calls
+/api/upload-complete with the blobName.
+"""
+import azure.functions as func
+from storage_clients import get_blob_service
+from uploads import UPLOAD_MAX_BYTES, direct_upload_name, parse_size, too_large, upload_sas_url
+import json
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        try:
+            body = req.get_json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            body = {}
+
+        size = body.get("size")
+        if size is not None:
+            size = parse_size(size)
+            if size is None:
+                return func.HttpResponse("size must be a byte count.", status_code=400)
+            if too_large(size):
+                return func.HttpResponse(f"File too large, the limit is {UPLOAD_MAX_BYTES} bytes.", status_code=413)
+
+        blob_name = direct_upload_name(body.get("filename"))
+        upload_url, expiry = upload_sas_url(get_blob_service("AzureWebJobsStorage"), blob_name)
+
+        headers = {"x-ms-blob-type": "BlockBlob"}
+        if body.get("contentType"):
+            headers["x-ms-blob-content-type"] = body["contentType"]
+
+        return func.HttpResponse(
+            json.dumps({
+                "blobName": blob_name,
+                "uploadUrl": upload_url,
+                "headers": headers,
+                "expiresOn": expiry.isoformat(),
+                "maxBytes": UPLOAD_MAX_BYTES
+            }),
+            status_code=200,
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        return func.HttpResponse(str(e), status_code=500)
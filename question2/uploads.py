@@ -0,0 +1,93 @@
+"""
+Helpers shared by the upload endpoints.
+
+Small files can be posted to uploadFunction (multipart, or the raw bytes
+as the request body). Larger files go straight to blob storage: upload-url
+hands out a short-lived write-only SAS URL for a new blob in uploads, the
+client PUTs the file there, and upload-complete checks the blob and
+enqueues the resize job, so the function never holds the file.
+"""
+import datetime
+import hashlib
+import os
+import re
+import uuid
+from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+UPLOADS_CONTAINER = "uploads"
+DEFAULT_SIZES = [320, 1024]
+# Larger uploads are refused (413), through the function and the SAS flow
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Parallel block uploads per file posted to uploadFunction
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4"))
+UPLOAD_SAS_MINUTES = int(os.getenv("UPLOAD_SAS_MINUTES", "10"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Blobs named by upload-url: 32 hex characters plus the file's extension
+DIRECT_UPLOAD_NAME = re.compile(r"^[0-9a-f]{32}(\.[a-z0-9]{1,10})?$")
+
+
+def content_sha256(stream):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def file_extension(filename):
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,10}", extension) else ""
+
+
+def blob_name_for(content_hash, filename):
+    """Content-addressed name; identical files share one blob whatever they were called."""
+    return f"{content_hash}{file_extension(filename)}"
+
+
+def direct_upload_name(filename):
+    """Name for a direct upload; its hash isn't known until the resizer downloads it."""
+    return f"{uuid.uuid4().hex}{file_extension(filename)}"
+
+
+def parse_size(value):
+    """A byte count from a header or JSON field, or None if it isn't a non-negative integer."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return None
+    return size if size >= 0 else None
+
+
+def too_large(size):
+    return size is not None and size > UPLOAD_MAX_BYTES
+
+
+def upload_sas_url(blob_service, blob_name, minutes=UPLOAD_SAS_MINUTES):
+    """
+    URL that lets the holder create and write blob_name in uploads (nothing
+    else) for `minutes`. Signed with the account key, or with a user
+    delegation key when the client uses an Azure AD credential.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # Allow for clock skew between the client and storage
+    start = now - datetime.timedelta(minutes=5)
+    expiry = now + datetime.timedelta(minutes=minutes)
+
+    account_key = getattr(blob_service.credential, "account_key", None)
+    delegation_key = None
+    if not account_key:
+        delegation_key = blob_service.get_user_delegation_key(start, expiry)
+
+    sas = generate_blob_sas(
+        account_name=blob_service.account_name,
+        container_name=UPLOADS_CONTAINER,
+        blob_name=blob_name,
+        account_key=account_key,
+        user_delegation_key=delegation_key,
+        permission=BlobSasPermissions(create=True, write=True),
+        start=start,
+        expiry=expiry
+    )
+    blob_url = blob_service.get_blob_client(container=UPLOADS_CONTAINER, blob=blob_name).url
+    return f"{blob_url}?{sas}", expiry